@@ -0,0 +1,127 @@
+/* This Source Code Form is subject to the terms of the Mozilla Public
+ * License, v. 2.0. If a copy of the MPL was not distributed with this
+ * file, You can obtain one at https://mozilla.org/MPL/2.0/.
+ */
+
+
+#ifndef SHM_EXPORT_H
+#define SHM_EXPORT_H
+
+#include <stdint.h>
+#include <stdio.h>
+#include <string.h>
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+// Exportación de columnas a memoria compartida (CONFIG EXPORT) para procesos externos.
+//
+// Región (shm_open + mmap):
+//   [0, 64)              cabecera: "EFXP" u32 versión, u64 layout_hash, u64 slot_bytes,
+//                        u64 data_offset, u64 published
+//   data_offset + k * slot_bytes, k = 0, 1: dos slots con
+//     [0, 64)            u64 seq (impar mientras se escribe), u64 frame
+//     resto              columnas y _active de cada entidad, en los offsets del descriptor JSON
+//
+// Doble buffer con seqlock: el frame se escribe en el slot que no tiene el último publicado
+// (published & 1) y después se incrementa published. El lector usa el slot
+// (published - 1) & 1 sin copiarlo: el motor no vuelve a escribir en él hasta el frame
+// siguiente. Si seq ha cambiado al terminar de leer, el frame no es consistente.
+
+#define SHM_EXPORT_MAGIC 0x50584645u  /* "EFXP" */
+#define SHM_EXPORT_VERSION 1
+#define SHM_EXPORT_SLOTS 2
+
+typedef struct {
+    uint32_t magic;
+    uint32_t version;
+    uint64_t layout_hash;  // Del descriptor JSON: el lector comprueba que es el mismo
+    uint64_t slot_bytes;
+    uint64_t data_offset;
+    uint64_t published;    // Frames publicados
+    uint8_t pad[24];
+} ShmExportHeader;
+
+typedef struct {
+    uint64_t seq;
+    uint64_t frame;
+    uint8_t pad[48];
+} ShmExportSlot;
+
+typedef struct {
+    char name[256];
+    ShmExportHeader* header;
+    size_t size;
+    uint8_t* slot;  // Slot en escritura (entre begin y end)
+} ShmExport;
+
+static inline int shm_export_open(ShmExport* x, const char* name, uint64_t layout_hash,
+                                  uint64_t slot_bytes, uint64_t data_offset) {
+    memset(x, 0, sizeof(*x));
+    snprintf(x->name, sizeof(x->name), "%s", name);
+    x->size = (size_t)(data_offset + SHM_EXPORT_SLOTS * slot_bytes);
+
+    const int fd = shm_open(name, O_CREAT | O_RDWR, 0644);
+    if (fd < 0) {
+        fprintf(stderr, "[EXPORT] No se pudo crear %s\n", name);
+        return -1;
+    }
+    if (ftruncate(fd, (off_t)x->size) != 0) {
+        fprintf(stderr, "[EXPORT] No se pudo reservar %zu bytes en %s\n", x->size, name);
+        close(fd);
+        shm_unlink(name);
+        return -1;
+    }
+    void* p = mmap(NULL, x->size, PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+    close(fd);
+    if (p == MAP_FAILED) {
+        fprintf(stderr, "[EXPORT] No se pudo mapear %s\n", name);
+        shm_unlink(name);
+        return -1;
+    }
+    x->header = (ShmExportHeader*)p;
+    // Un lector que abra una región reutilizada no debe aceptar los datos anteriores
+    __atomic_store_n(&x->header->magic, 0u, __ATOMIC_RELAXED);
+    x->header->version = SHM_EXPORT_VERSION;
+    x->header->layout_hash = layout_hash;
+    x->header->slot_bytes = slot_bytes;
+    x->header->data_offset = data_offset;
+    __atomic_store_n(&x->header->published, 0, __ATOMIC_RELAXED);
+    for (int k = 0; k < SHM_EXPORT_SLOTS; k++) {
+        ShmExportSlot* s = (ShmExportSlot*)((uint8_t*)p + data_offset + (uint64_t)k * slot_bytes);
+        __atomic_store_n(&s->seq, 0, __ATOMIC_RELAXED);
+    }
+    __atomic_store_n(&x->header->magic, SHM_EXPORT_MAGIC, __ATOMIC_RELEASE);
+    return 0;
+}
+
+// Slot en el que escribir este frame (NULL si la región no está abierta)
+static inline uint8_t* shm_export_begin(ShmExport* x) {
+    if (!x->header) return NULL;
+    const uint64_t k = __atomic_load_n(&x->header->published, __ATOMIC_RELAXED) & 1;
+    x->slot = (uint8_t*)x->header + x->header->data_offset + k * x->header->slot_bytes;
+    ShmExportSlot* s = (ShmExportSlot*)x->slot;
+    __atomic_store_n(&s->seq, s->seq + 1, __ATOMIC_RELAXED);
+    __atomic_thread_fence(__ATOMIC_RELEASE);
+    return x->slot;
+}
+
+static inline void shm_export_end(ShmExport* x, uint64_t frame) {
+    if (!x->slot) return;
+    ShmExportSlot* s = (ShmExportSlot*)x->slot;
+    s->frame = frame;
+    __atomic_store_n(&s->seq, s->seq + 1, __ATOMIC_RELEASE);
+    __atomic_fetch_add(&x->header->published, 1, __ATOMIC_RELEASE);
+    x->slot = NULL;
+}
+
+// Los lectores que ya la tienen mapeada la conservan hasta que la desmapean
+static inline void shm_export_close(ShmExport* x) {
+    if (!x->header) return;
+    munmap(x->header, x->size);
+    shm_unlink(x->name);
+    x->header = NULL;
+}
+
+#endif
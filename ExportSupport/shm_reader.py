@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+
+# Lector de CONFIG EXPORT: las columnas del motor como arrays NumPy sin copiarlas.
+#
+#   reader = ExportReader("engine_world.layout.json")
+#   frame = reader.wait()
+#   y = frame["Cube.position_y"]          # vista de solo lectura, frame.active("Cube") elementos
+#   ...
+#   if not frame.consistent(): ...        # el motor ya ha reescrito el slot: descartar
+#
+# La región la crea el motor con shm_open; en Linux está en /dev/shm/<nombre>.
+# El formato está descrito en ExportSupport/shm_export.h.
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+MAGIC = 0x50584645  # "EFXP"
+VERSION = 1
+HEADER = struct.Struct("<IIQQQQ")  # magic, versión, layout_hash, slot_bytes, data_offset, published
+SLOT = struct.Struct("<QQ")        # seq, frame
+PUBLISHED_OFFSET = 32
+
+class ExportError(RuntimeError):
+    pass
+
+class Frame:
+    # Un frame publicado. Las vistas valen hasta que el motor vuelve a escribir en su slot,
+    # dos publicaciones después; consistent() dice si eso ya ha pasado.
+
+    def __init__(self, reader, base, seq, frame):
+        self._reader = reader
+        self._base = base
+        self._seq = seq
+        self.frame = frame
+
+    def active(self, entity):
+        offset = self._reader.layout["entities"][entity]["active_offset"]
+        return struct.unpack_from("<q", self._reader.mm, self._base + offset)[0]
+
+    def __getitem__(self, name):
+        col = self._reader.columns.get(name)
+        if col is None:
+            raise KeyError(f"'{name}' no está en el descriptor ({', '.join(self._reader.columns)})")
+        return np.frombuffer(self._reader.mm, dtype=col["dtype"], count=self.active(col["entity"]),
+                             offset=self._base + col["offset"])
+
+    def consistent(self):
+        return SLOT.unpack_from(self._reader.mm, self._base)[0] == self._seq
+
+    def copy(self):
+        # Todas las columnas copiadas; None si el motor reescribió el slot mientras tanto
+        data = {name: self[name].copy() for name in self._reader.columns}
+        return data if self.consistent() else None
+
+class ExportReader:
+    def __init__(self, layout_path, shm_dir="/dev/shm"):
+        with open(layout_path) as f:
+            self.layout = json.load(f)
+        self.columns = {c["name"]: c for c in self.layout["columns"]}
+        size = self.layout["data_offset"] + self.layout["slots"] * self.layout["slot_bytes"]
+
+        path = os.path.join(shm_dir, self.layout["shm"].lstrip("/"))
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError as e:
+            raise ExportError(f"No se pudo abrir {path}: {e.strerror} (¿está el motor en marcha?)") from None
+        try:
+            if os.fstat(fd).st_size < size:
+                raise ExportError(f"{path} es más pequeña que el layout ({size} bytes)")
+            self.mm = mmap.mmap(fd, size, prot=mmap.PROT_READ)
+        finally:
+            os.close(fd)
+
+        magic, version, layout_hash, slot_bytes, data_offset, _ = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ExportError(f"{path} no es una región de CONFIG EXPORT (o el motor no ha terminado de crearla)")
+        if version != VERSION:
+            raise ExportError(f"Versión {version} de la región, el lector entiende la {VERSION}")
+        if f"{layout_hash:016x}" != self.layout["layout_hash"] or slot_bytes != self.layout["slot_bytes"] \
+                or data_offset != self.layout["data_offset"]:
+            raise ExportError(f"{layout_path} no corresponde a la región {path}: recompila o usa el descriptor del build")
+
+    def published(self):
+        return struct.unpack_from("<Q", self.mm, PUBLISHED_OFFSET)[0]
+
+    def latest(self):
+        # Último frame completo, o None si aún no se ha publicado ninguno
+        for _ in range(100):
+            published = self.published()
+            if published == 0:
+                return None
+            base = self.layout["data_offset"] + ((published - 1) & 1) * self.layout["slot_bytes"]
+            seq, frame = SLOT.unpack_from(self.mm, base)
+            if seq % 2 == 0 and self.published() == published:
+                return Frame(self, base, seq, frame)
+        raise ExportError("El motor publica más rápido de lo que se puede leer la cabecera")
+
+    def wait(self, after=0, timeout=None, poll=0.001):
+        # Primer frame con número mayor que after
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            frame = self.latest()
+            if frame is not None and frame.frame > after:
+                return frame
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"Ningún frame posterior al {after} en {timeout} s")
+            time.sleep(poll)
+
+    def snapshot(self, retries=10):
+        # Copia consistente del último frame: (frame, {columna: array})
+        for _ in range(retries):
+            frame = self.wait()
+            data = frame.copy()
+            if data is not None:
+                return frame.frame, data
+        raise ExportError(f"Sin una copia consistente en {retries} intentos")
+
+    def close(self):
+        # Las vistas de NumPy mantienen el mapeo vivo: se libera cuando desaparecen
+        try:
+            self.mm.close()
+        except BufferError:
+            pass
+
+def main():
+    ap = argparse.ArgumentParser(description="Muestra las columnas exportadas por CONFIG EXPORT")
+    ap.add_argument("layout", help="descriptor <nombre>.layout.json generado por builder.py")
+    ap.add_argument("--every", type=float, default=1.0, help="segundos entre muestras")
+    ap.add_argument("--count", type=int, default=0, help="muestras (0 = hasta Ctrl+C)")
+    args = ap.parse_args()
+
+    try:
+        reader = ExportReader(args.layout)
+    except ExportError as e:
+        print(f"[EXPORT ERROR] {e}", file=sys.stderr)
+        sys.exit(1)
+
+    last, n = 0, 0
+    try:
+        while args.count == 0 or n < args.count:
+            frame = reader.wait(after=last)
+            stats = []
+            for name in reader.columns:
+                col = frame[name]
+                if col.size:
+                    stats.append(f"{name} min={float(col.min()):.6g} mean={float(col.mean()):.6g} max={float(col.max()):.6g}")
+            if frame.consistent():
+                actives = " ".join(f"{e}={frame.active(e)}" for e in reader.layout["entities"])
+                print(f"[EXPORT] frame={frame.frame} {actives}")
+                for line in stats:
+                    print(f"  {line}")
+            last, n = frame.frame, n + 1
+            time.sleep(args.every)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__": main()
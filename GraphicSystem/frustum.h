@@ -0,0 +1,73 @@
+/* This Source Code Form is subject to the terms of the Mozilla Public
+ * License, v. 2.0. If a copy of the MPL was not distributed with this
+ * file, You can obtain one at https://mozilla.org/MPL/2.0/.
+ */
+
+
+#ifndef FRUSTUM_H
+#define FRUSTUM_H
+
+#include "graphics_types.h"
+#include <math.h>
+
+// Frustum de una cámara en perspectiva (misma convención que Camera3D de raylib:
+// fovy vertical en grados). No depende de raylib, así que sirve también en headless.
+//
+// Cada plano es n·p + d >= 0 para los puntos del lado de dentro.
+
+typedef struct {
+    float nx, ny, nz, d;
+} FrustumPlane;
+
+typedef struct {
+    FrustumPlane p[6];   // near, far, left, right, bottom, top
+} Frustum;
+
+static inline Vector3 frustum_v3(float x, float y, float z) { Vector3 v = { x, y, z }; return v; }
+static inline Vector3 frustum_sub(Vector3 a, Vector3 b) { return frustum_v3(a.x - b.x, a.y - b.y, a.z - b.z); }
+static inline float frustum_dot(Vector3 a, Vector3 b) { return a.x * b.x + a.y * b.y + a.z * b.z; }
+static inline Vector3 frustum_cross(Vector3 a, Vector3 b) {
+    return frustum_v3(a.y * b.z - a.z * b.y, a.z * b.x - a.x * b.z, a.x * b.y - a.y * b.x);
+}
+static inline Vector3 frustum_normalize(Vector3 v) {
+    const float len = sqrtf(frustum_dot(v, v));
+    return len > 0.0f ? frustum_v3(v.x / len, v.y / len, v.z / len) : v;
+}
+
+// Plano con normal n (hacia dentro, se normaliza) que pasa por p
+static inline FrustumPlane frustum_plane(Vector3 n, Vector3 p) {
+    n = frustum_normalize(n);
+    FrustumPlane pl = { n.x, n.y, n.z, -frustum_dot(n, p) };
+    return pl;
+}
+
+static inline void frustum_from_camera(Frustum* f, Vector3 position, Vector3 target, Vector3 up,
+                                       float fovy_deg, float aspect, float znear, float zfar) {
+    const Vector3 fw = frustum_normalize(frustum_sub(target, position));
+    const Vector3 r = frustum_normalize(frustum_cross(fw, up));
+    const Vector3 u = frustum_cross(r, fw);
+    const float th = tanf(fovy_deg * 0.5f * 3.14159265358979f / 180.0f);
+    const float tw = th * aspect;
+
+    f->p[0] = frustum_plane(fw, frustum_v3(position.x + fw.x * znear, position.y + fw.y * znear, position.z + fw.z * znear));
+    f->p[1] = frustum_plane(frustum_v3(-fw.x, -fw.y, -fw.z), frustum_v3(position.x + fw.x * zfar, position.y + fw.y * zfar, position.z + fw.z * zfar));
+    // Laterales: pasan por la cámara, inclinados tw (o th) respecto al eje de visión
+    f->p[2] = frustum_plane(frustum_v3(fw.x * tw + r.x, fw.y * tw + r.y, fw.z * tw + r.z), position);
+    f->p[3] = frustum_plane(frustum_v3(fw.x * tw - r.x, fw.y * tw - r.y, fw.z * tw - r.z), position);
+    f->p[4] = frustum_plane(frustum_v3(fw.x * th + u.x, fw.y * th + u.y, fw.z * th + u.z), position);
+    f->p[5] = frustum_plane(frustum_v3(fw.x * th - u.x, fw.y * th - u.y, fw.z * th - u.z), position);
+}
+
+// Caja alineada con los ejes (centro c, semiejes h). Conservador: puede dar visible
+// una caja fuera cerca de una esquina del frustum, nunca al revés
+static inline bool frustum_test_aabb(const Frustum* f, float cx, float cy, float cz, float hx, float hy, float hz) {
+    for (int k = 0; k < 6; k++) {
+        const FrustumPlane* p = &f->p[k];
+        const float dist = p->nx * cx + p->ny * cy + p->nz * cz + p->d;
+        const float radius = fabsf(p->nx) * hx + fabsf(p->ny) * hy + fabsf(p->nz) * hz;
+        if (dist < -radius) return false;
+    }
+    return true;
+}
+
+#endif
@@ -0,0 +1,127 @@
+/* This Source Code Form is subject to the terms of the Mozilla Public
+ * License, v. 2.0. If a copy of the MPL was not distributed with this
+ * file, You can obtain one at https://mozilla.org/MPL/2.0/.
+ */
+
+
+#ifndef RENDER_PIPELINE_H
+#define RENDER_PIPELINE_H
+
+#include "graphics_types.h"
+#include "scene_sync_state.h"
+#include <pthread.h>
+
+// Simulación y render en paralelo (CONFIG PIPELINE ON).
+//
+// Dos SceneData: la simulación sincroniza el frame N+1 en el de atrás mientras el
+// hilo de render presenta (sube y dibuja) el frame N desde el de delante. En
+// render_pipeline_submit está la valla: espera a que el render termine el frame
+// anterior, intercambia los buffers y despierta al render. Hay como mucho un
+// frame en vuelo, así que la imagen va un frame por detrás de la simulación.
+//
+// El buffer de atrás conserva el contenido de hace dos frames y el sync marca sucio
+// respecto a él. La GPU tiene el frame anterior, así que al presentar se sube la
+// unión de los rangos sucios de los dos últimos frames.
+
+typedef void (*RenderPresentFn)(const SceneData* s, const SceneSyncState* ss, void* user);
+
+typedef struct {
+    SceneData scene[2];
+    SceneSyncState sync[2];
+    int back;               // Buffer en el que escribe la simulación
+    SceneSyncState last;    // Rango sucio del frame enviado anterior
+
+    RenderPresentFn present;
+    void* user;
+    pthread_t thread;
+    pthread_mutex_t lock;
+    pthread_cond_t cond;
+    bool pending;           // Hay un frame enviado que el render no ha terminado
+    bool quit;
+    bool running;           // Hilo de render creado
+} RenderPipeline;
+
+static void* render_pipeline_thread(void* arg) {
+    RenderPipeline* p = (RenderPipeline*)arg;
+    pthread_mutex_lock(&p->lock);
+    for (;;) {
+        while (!p->pending && !p->quit) pthread_cond_wait(&p->cond, &p->lock);
+        if (!p->pending) break;
+        const int front = 1 - p->back;
+        pthread_mutex_unlock(&p->lock);
+
+        p->present(&p->scene[front], &p->sync[front], p->user);
+
+        pthread_mutex_lock(&p->lock);
+        p->pending = false;
+        pthread_cond_broadcast(&p->cond);
+    }
+    pthread_mutex_unlock(&p->lock);
+    return NULL;
+}
+
+static inline int render_pipeline_init(RenderPipeline* p, uint32_t initial_capacity, RenderPresentFn present, void* user) {
+    memset(p, 0, sizeof(*p));
+    scene_init(&p->scene[0], initial_capacity);
+    scene_init(&p->scene[1], initial_capacity);
+    scene_sync_reset(&p->sync[0]);
+    scene_sync_reset(&p->sync[1]);
+    scene_sync_reset(&p->last);
+    p->present = present;
+    p->user = user;
+    pthread_mutex_init(&p->lock, NULL);
+    pthread_cond_init(&p->cond, NULL);
+    p->running = pthread_create(&p->thread, NULL, render_pipeline_thread, p) == 0;
+    return p->running ? 0 : -1;
+}
+
+// Buffer y estado de sync en los que la simulación escribe este frame
+static inline SceneData* render_pipeline_scene(RenderPipeline* p) { return &p->scene[p->back]; }
+static inline SceneSyncState* render_pipeline_sync(RenderPipeline* p) { return &p->sync[p->back]; }
+
+// Valla: el render ya no usa el buffer de delante (tampoco lo reserva ni lo libera)
+static inline void render_pipeline_wait(RenderPipeline* p) {
+    pthread_mutex_lock(&p->lock);
+    while (p->pending) pthread_cond_wait(&p->cond, &p->lock);
+    pthread_mutex_unlock(&p->lock);
+}
+
+// Envía el buffer de atrás al render. Al volver, la simulación escribe en el otro,
+// que ya tiene su rango sucio reiniciado
+static inline void render_pipeline_submit(RenderPipeline* p) {
+    render_pipeline_wait(p);
+
+    SceneSyncState* ss = &p->sync[p->back];
+    const SceneSyncState current = *ss;
+    scene_sync_merge(ss, &p->last);
+    p->last = current;
+
+    if (!p->running) {
+        // Sin hilo de render: se presenta en el mismo hilo
+        p->present(&p->scene[p->back], ss, p->user);
+    } else {
+        pthread_mutex_lock(&p->lock);
+        p->back = 1 - p->back;
+        p->pending = true;
+        pthread_cond_broadcast(&p->cond);
+        pthread_mutex_unlock(&p->lock);
+    }
+    scene_sync_reset(&p->sync[p->back]);
+}
+
+static inline void render_pipeline_shutdown(RenderPipeline* p) {
+    if (p->running) {
+        pthread_mutex_lock(&p->lock);
+        p->quit = true;
+        pthread_cond_broadcast(&p->cond);
+        pthread_mutex_unlock(&p->lock);
+        pthread_join(p->thread, NULL);
+        p->running = false;
+    }
+    pthread_mutex_destroy(&p->lock);
+    pthread_cond_destroy(&p->cond);
+    scene_free(&p->scene[0]);
+    scene_free(&p->scene[1]);
+}
+
+#endif
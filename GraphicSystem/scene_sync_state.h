@@ -31,6 +31,57 @@ static inline void scene_sync_mark(SceneSyncState* ss, uint32_t index) {
     if (index > ss->dirty_max) ss->dirty_max = index;
 }
 
+// Añade a dst el rango sucio de src
+static inline void scene_sync_merge(SceneSyncState* dst, const SceneSyncState* src) {
+    if (!src->dirty) return;
+    scene_sync_mark(dst, src->dirty_min);
+    scene_sync_mark(dst, src->dirty_max);
+}
+
+// Marca [lo, hi] desde varios hilos a la vez (un rango de parallel_run cada uno)
+static inline void scene_sync_mark_range_atomic(SceneSyncState* ss, uint32_t lo, uint32_t hi) {
+    uint32_t cur = __atomic_load_n(&ss->dirty_min, __ATOMIC_RELAXED);
+    while (lo < cur && !__atomic_compare_exchange_n(&ss->dirty_min, &cur, lo, true, __ATOMIC_RELAXED, __ATOMIC_RELAXED)) {}
+    cur = __atomic_load_n(&ss->dirty_max, __ATOMIC_RELAXED);
+    while (hi > cur && !__atomic_compare_exchange_n(&ss->dirty_max, &cur, hi, true, __ATOMIC_RELAXED, __ATOMIC_RELAXED)) {}
+    __atomic_store_n(&ss->dirty, true, __ATOMIC_RELAXED);
+}
+
+// Versiones por chunk de una columna (CONFIG TRACK): ver[c] es el último frame en que
+// se escribió alguna instancia de [c << ENGINE_TRACK_SHIFT, (c + 1) << ENGINE_TRACK_SHIFT)
+#define ENGINE_TRACK_SHIFT 10
+#define ENGINE_TRACK_CHUNK (1 << ENGINE_TRACK_SHIFT)
+#define ENGINE_TRACK_CHUNKS(n) (((n) + ENGINE_TRACK_CHUNK - 1) >> ENGINE_TRACK_SHIFT)
+
+// Seguro entre hilos. Solo escribe si cambia: los hilos que tocan el mismo chunk
+// en el mismo frame no se disputan la línea de caché
+static inline void engine_touch(uint32_t* ver, uint32_t version, int32_t i) {
+    uint32_t* v = &ver[i >> ENGINE_TRACK_SHIFT];
+    if (__atomic_load_n(v, __ATOMIC_RELAXED) != version) __atomic_store_n(v, version, __ATOMIC_RELAXED);
+}
+
+static inline void engine_touch_range(uint32_t* ver, uint32_t version, int32_t start, int32_t end) {
+    for (int32_t i = start & ~(ENGINE_TRACK_CHUNK - 1); i < end; i += ENGINE_TRACK_CHUNK) engine_touch(ver, version, i);
+}
+
+// Últimos syncs de una región con CONFIG TRACK (dos: con PIPELINE los buffers se alternan)
+typedef struct {
+    uint32_t version[2];
+    uint32_t base[2];
+    uint32_t count[2];
+    int next;
+    int32_t visited;   // Chunks recorridos en el último sync
+} SceneTrack;
+
+// Región de un gcomponent del GSPEC en el buffer de instancias compartido:
+// [base, base + count), con su propio rango sucio (índices globales)
+typedef struct {
+    const char* name;
+    uint32_t base;
+    uint32_t count;
+    SceneSyncState sync;
+} SceneRegion;
+
 // Funciones de gestión del SceneData
 static inline void scene_init(SceneData* s, uint32_t initial_capacity) {
     if (initial_capacity == 0) initial_capacity = 1;
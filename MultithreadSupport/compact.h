@@ -0,0 +1,235 @@
+/* This Source Code Form is subject to the terms of the Mozilla Public
+ * License, v. 2.0. If a copy of the MPL was not distributed with this
+ * file, You can obtain one at https://mozilla.org/MPL/2.0/.
+ */
+
+
+#ifndef COMPACT_H
+#define COMPACT_H
+
+#include "parallel.h"
+#include "reorder.h"
+#include <stdint.h>
+#include <stdlib.h>
+#include <string.h>
+
+// Suma de prefijos y compactación paralelas sobre [0, n).
+//
+// Como en reduce.h, el trabajo va por bloques fijos de SCAN_BLOCK elementos y cada
+// bloque lo hace entero un solo hilo: primero se cuenta cada bloque, después una suma
+// de prefijos (serie, n / 4096 entradas) da dónde empieza cada uno en la salida y por
+// último cada bloque escribe su parte. El orden se conserva y el resultado no depende
+// del número de hilos.
+//
+// Se llaman desde el hilo principal, no desde dentro de un parallel_run: los buffers
+// de trabajo son estáticos.
+
+#define SCAN_BLOCK_SHIFT 12
+#define SCAN_BLOCK (1 << SCAN_BLOCK_SHIFT)
+#define SCAN_BLOCKS(n) (((n) + SCAN_BLOCK - 1) >> SCAN_BLOCK_SHIFT)
+
+// Primer bloque que empieza en start o después: un rango hace los bloques que empiezan en él
+#define SCAN_BLOCK_FIRST(start) (((start) + SCAN_BLOCK - 1) >> SCAN_BLOCK_SHIFT)
+
+// keep[i - start] = 1 si el elemento i se conserva, 0 si no, para i en [start, end)
+typedef void (*CompactKeepFn)(void* ctx, int start, int end, uint8_t* keep);
+
+// Buffers de trabajo de compact_mark/compact_scatter y de las <entidad>_compact generadas
+static struct {
+    uint8_t* keep;       // [n] resultado del predicado
+    int32_t* index;      // [n] índices conservados
+    int32_t* inverse;    // [n] nuevo índice de cada elemento, -1 si se elimina
+    int32_t* block;      // [SCAN_BLOCKS(n)] conservados por bloque, después primera salida
+    int32_t capacity;
+    int32_t n;           // Elementos del último compact_mark
+    uint8_t* column;     // Columna movida antes de copiarla de vuelta
+    size_t column_bytes;
+} g_compact;
+
+static inline int compact_reserve(int32_t n) {
+    if (n <= g_compact.capacity) return 0;
+    uint8_t* keep = (uint8_t*)realloc(g_compact.keep, (size_t)n);
+    if (keep) g_compact.keep = keep;
+    int32_t* index = (int32_t*)realloc(g_compact.index, (size_t)n * sizeof(int32_t));
+    if (index) g_compact.index = index;
+    int32_t* inverse = (int32_t*)realloc(g_compact.inverse, (size_t)n * sizeof(int32_t));
+    if (inverse) g_compact.inverse = inverse;
+    int32_t* block = (int32_t*)realloc(g_compact.block, (size_t)SCAN_BLOCKS(n) * sizeof(int32_t));
+    if (block) g_compact.block = block;
+    if (!keep || !index || !inverse || !block) return -1;
+    g_compact.capacity = n;
+    return 0;
+}
+
+// Buffer para mover una columna de bytes bytes (-1 si no hay memoria)
+static inline int compact_reserve_column(size_t bytes) {
+    if (bytes <= g_compact.column_bytes) return 0;
+    uint8_t* column = (uint8_t*)realloc(g_compact.column, bytes);
+    if (!column) return -1;
+    g_compact.column = column;
+    g_compact.column_bytes = bytes;
+    return 0;
+}
+
+typedef struct {
+    void* ctx;
+    CompactKeepFn fn;
+    int32_t n;
+    int32_t* idx;
+    int32_t* inv;
+} CompactPass;
+
+static void compact_mark_range(void* arg, int start, int end) {
+    CompactPass* p = (CompactPass*)arg;
+    for (int b = SCAN_BLOCK_FIRST(start); (b << SCAN_BLOCK_SHIFT) < end; b++) {
+        const int lo = b << SCAN_BLOCK_SHIFT;
+        const int hi = p->n - lo > SCAN_BLOCK ? lo + SCAN_BLOCK : p->n;
+        uint8_t* keep = g_compact.keep + lo;
+        p->fn(p->ctx, lo, hi, keep);
+        int32_t count = 0;
+        for (int i = 0; i < hi - lo; i++) count += keep[i] != 0;
+        g_compact.block[b] = count;
+    }
+}
+
+// Evalúa keep sobre [0, n) y devuelve cuántos se conservan (-1 si no hay memoria).
+// Deja el resultado en g_compact.keep para compact_scatter
+static inline int32_t compact_mark(void* ctx, CompactKeepFn keep, int32_t n) {
+    g_compact.n = 0;
+    if (n <= 0) return 0;
+    if (compact_reserve(n) != 0) return -1;
+    CompactPass p = { ctx, keep, n, NULL, NULL };
+    parallel_run(&p, compact_mark_range, n);
+    g_compact.n = n;
+    int32_t total = 0;
+    for (int32_t b = 0; b < SCAN_BLOCKS(n); b++) {
+        const int32_t count = g_compact.block[b];
+        g_compact.block[b] = total;
+        total += count;
+    }
+    return total;
+}
+
+static void compact_scatter_range(void* arg, int start, int end) {
+    CompactPass* p = (CompactPass*)arg;
+    for (int b = SCAN_BLOCK_FIRST(start); (b << SCAN_BLOCK_SHIFT) < end; b++) {
+        const int lo = b << SCAN_BLOCK_SHIFT;
+        const int hi = p->n - lo > SCAN_BLOCK ? lo + SCAN_BLOCK : p->n;
+        int32_t o = g_compact.block[b];
+        for (int i = lo; i < hi; i++) {
+            if (g_compact.keep[i]) {
+                if (p->idx) p->idx[o] = i;
+                if (p->inv) p->inv[i] = o;
+                o++;
+            } else if (p->inv) {
+                p->inv[i] = -1;
+            }
+        }
+    }
+}
+
+// Tras compact_mark: idx[0..total) = índices conservados en orden y, si inv no es NULL,
+// inv[i] = nuevo índice de i (-1 si se elimina). Cualquiera de los dos puede ser NULL
+static inline void compact_scatter(int32_t* idx, int32_t* inv) {
+    CompactPass p = { NULL, NULL, g_compact.n, idx, inv };
+    if (g_compact.n > 0) parallel_run(&p, compact_scatter_range, g_compact.n);
+}
+
+// Lista densa de los índices de [0, n) que keep conserva, en orden. Devuelve su
+// longitud (-1 si no hay memoria)
+static inline int32_t parallel_compact(void* ctx, CompactKeepFn keep, int32_t n, int32_t* idx) {
+    const int32_t total = compact_mark(ctx, keep, n);
+    if (total > 0) compact_scatter(idx, NULL);
+    return total;
+}
+
+// Primera posición k de una lista de compact_scatter con idx[k] != k: las filas
+// anteriores no se mueven al compactar (m si no se mueve ninguna)
+static inline int32_t compact_first_moved(const int32_t* idx, int32_t m) {
+    int32_t lo = 0, hi = m;
+    while (lo < hi) {
+        const int32_t mid = lo + (hi - lo) / 2;
+        if (idx[mid] == mid) lo = mid + 1;
+        else hi = mid;
+    }
+    return lo;
+}
+
+// Entradas de la lista (ordenada) menores que v: el nuevo índice del primer
+// conservado a partir de v
+static inline int32_t compact_rank(const int32_t* idx, int32_t m, int32_t v) {
+    int32_t lo = 0, hi = m;
+    while (lo < hi) {
+        const int32_t mid = lo + (hi - lo) / 2;
+        if (idx[mid] < v) lo = mid + 1;
+        else hi = mid;
+    }
+    return lo;
+}
+
+// Predicado sobre una columna bool/uint8: se conservan las que son distintas de cero
+static inline void compact_keep_u8(void* ctx, int start, int end, uint8_t* keep) {
+    const uint8_t* x = (const uint8_t*)ctx + start;
+    for (int i = 0; i < end - start; i++) keep[i] = x[i] != 0;
+}
+
+// Suma de prefijos de enteros (parallel_scan)
+
+static int64_t* g_scan_blocks = NULL;
+static int32_t g_scan_capacity = 0;
+
+typedef struct {
+    const int32_t* in;
+    int32_t* out;
+    int32_t n;
+} ScanPass;
+
+static void parallel_scan_sum_range(void* arg, int start, int end) {
+    ScanPass* p = (ScanPass*)arg;
+    for (int b = SCAN_BLOCK_FIRST(start); (b << SCAN_BLOCK_SHIFT) < end; b++) {
+        const int lo = b << SCAN_BLOCK_SHIFT;
+        const int hi = p->n - lo > SCAN_BLOCK ? lo + SCAN_BLOCK : p->n;
+        int64_t s = 0;
+        for (int i = lo; i < hi; i++) s += p->in[i];
+        g_scan_blocks[b] = s;
+    }
+}
+
+static void parallel_scan_write_range(void* arg, int start, int end) {
+    ScanPass* p = (ScanPass*)arg;
+    for (int b = SCAN_BLOCK_FIRST(start); (b << SCAN_BLOCK_SHIFT) < end; b++) {
+        const int lo = b << SCAN_BLOCK_SHIFT;
+        const int hi = p->n - lo > SCAN_BLOCK ? lo + SCAN_BLOCK : p->n;
+        int64_t s = g_scan_blocks[b];
+        for (int i = lo; i < hi; i++) {
+            const int32_t v = p->in[i];
+            p->out[i] = (int32_t)s;
+            s += v;
+        }
+    }
+}
+
+// Suma de prefijos exclusiva: out[i] = in[0] + ... + in[i - 1]. Devuelve el total
+// (-1 si no hay memoria). in y out pueden ser el mismo array
+static inline int64_t parallel_scan(const int32_t* in, int32_t* out, int32_t n) {
+    if (n <= 0) return 0;
+    const int32_t blocks = SCAN_BLOCKS(n);
+    if (blocks > g_scan_capacity) {
+        int64_t* grown = (int64_t*)realloc(g_scan_blocks, (size_t)blocks * sizeof(int64_t));
+        if (!grown) return -1;
+        g_scan_blocks = grown;
+        g_scan_capacity = blocks;
+    }
+    ScanPass p = { in, out, n };
+    parallel_run(&p, parallel_scan_sum_range, n);
+    int64_t total = 0;
+    for (int32_t b = 0; b < blocks; b++) {
+        const int64_t s = g_scan_blocks[b];
+        g_scan_blocks[b] = total;
+        total += s;
+    }
+    parallel_run(&p, parallel_scan_write_range, n);
+    return total;
+}
+
+#endif
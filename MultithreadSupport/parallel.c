@@ -6,6 +6,11 @@
  */
 
 
+#ifdef __linux__
+#define _GNU_SOURCE  // pthread_attr_setaffinity_np, sched_getaffinity
+#include <sched.h>
+#endif
+
 #include "parallel.h"
 #include <pthread.h>
 #include <stdint.h>
@@ -21,45 +26,124 @@ typedef struct {
     SystemRangeFn fn;
     int start;
     int end;
+    int worker;
 } ThreadData;
 
+static ParallelChunkHook chunk_hook = NULL;
+
+// CPU de cada worker (CONFIG AFFINITY / NUMA); affinity_count = 0: sin fijar
+static int affinity_cpus[MAX_THREADS];
+static int affinity_count = 0;
+
+void parallel_set_affinity(const int* cpus, int count) {
+    affinity_count = 0;
+    for (int i = 0; i < MAX_THREADS && count > 0; i++) affinity_cpus[i] = cpus[i % count];
+    if (count <= 0) return;
+    affinity_count = MAX_THREADS;
+#ifdef __linux__
+    // El hilo principal ejecuta los sistemas SINGLE y los rangos pequeños como worker 0
+    cpu_set_t set;
+    CPU_ZERO(&set);
+    CPU_SET(affinity_cpus[0], &set);
+    pthread_setaffinity_np(pthread_self(), sizeof(set), &set);
+#endif
+}
+
+int parallel_default_cpus(int* cpus, int max) {
+    int n = 0;
+#ifdef __linux__
+    cpu_set_t set;
+    if (sched_getaffinity(0, sizeof(set), &set) != 0) return 0;
+    for (int c = 0; c < CPU_SETSIZE && n < max; c++)
+        if (CPU_ISSET(c, &set)) cpus[n++] = c;
+#else
+    (void)cpus; (void)max;
+#endif
+    return n;
+}
+
+void parallel_set_chunk_hook(ParallelChunkHook hook) {
+    chunk_hook = hook;
+}
+
+static void run_chunk(void* w, SystemRangeFn fn, int worker, int start, int end) {
+    ParallelChunkHook hook = chunk_hook;
+    if (hook) hook(worker, start, end, 0);
+    fn(w, start, end);
+    if (hook) hook(worker, start, end, 1);
+}
+
 static void* worker_static(void* arg) {
     ThreadData* data = (ThreadData*)arg;
-    data->fn(data->world, data->start, data->end);
+    run_chunk(data->world, data->fn, data->worker, data->start, data->end);
     return NULL;
 }
 
-void parallel_run(void* w, SystemRangeFn fn, int count) {
-    if (count <= 1024) { 
-        fn(w, 0, count);
-        return;
-    }
-
+// Lanza un hilo por tramo [bounds[i], bounds[i + 1]) no vacío y espera a todos
+static void run_split(void* w, SystemRangeFn fn, const int* bounds) {
     pthread_t threads[MAX_THREADS];
     ThreadData thread_data[MAX_THREADS];
-
-    int per_thread = count / MAX_THREADS;
-    int remainder = count % MAX_THREADS;
-    int current_start = 0;
-
     int threads_to_launch = 0;
-    for (int i = 0; i < MAX_THREADS && current_start < count; i++) {
+
+    for (int i = 0; i < MAX_THREADS; i++) {
+        if (bounds[i] >= bounds[i + 1]) continue;
         thread_data[i].world = w;
         thread_data[i].fn = fn;
-        thread_data[i].start = current_start;
-        
-        int chunk_size = per_thread + (i < remainder ? 1 : 0);
-        thread_data[i].end = current_start + chunk_size;
-        current_start = thread_data[i].end;
+        thread_data[i].start = bounds[i];
+        thread_data[i].end = bounds[i + 1];
+        thread_data[i].worker = i;
 
-        if (pthread_create(&threads[i], NULL, worker_static, &thread_data[i]) == 0) {
+        pthread_attr_t attr;
+        pthread_attr_init(&attr);
+#ifdef __linux__
+        if (affinity_count) {
+            cpu_set_t set;
+            CPU_ZERO(&set);
+            CPU_SET(affinity_cpus[i], &set);
+            pthread_attr_setaffinity_np(&attr, sizeof(set), &set);
+        }
+#endif
+        if (pthread_create(&threads[threads_to_launch], &attr, worker_static, &thread_data[i]) == 0) {
             threads_to_launch++;
         } else {
-            fn(w, thread_data[i].start, thread_data[i].end);
+            run_chunk(w, fn, i, thread_data[i].start, thread_data[i].end);
         }
+        pthread_attr_destroy(&attr);
     }
 
     for (int i = 0; i < threads_to_launch; i++) {
         pthread_join(threads[i], NULL);
     }
 }
+
+void parallel_run(void* w, SystemRangeFn fn, int count) {
+    if (count <= 1024) { 
+        run_chunk(w, fn, 0, 0, count);
+        return;
+    }
+
+    int bounds[MAX_THREADS + 1];
+    int per_thread = count / MAX_THREADS;
+    int remainder = count % MAX_THREADS;
+    bounds[0] = 0;
+    for (int i = 0; i < MAX_THREADS; i++) {
+        bounds[i + 1] = bounds[i] + per_thread + (i < remainder ? 1 : 0);
+    }
+    run_split(w, fn, bounds);
+}
+
+void parallel_run_owned(void* w, SystemRangeFn fn, int count, int capacity) {
+    if (count <= 1024) {
+        run_chunk(w, fn, 0, 0, count);
+        return;
+    }
+
+    // Tramos fijos sobre la capacidad: no se mueven cuando cambia count
+    int bounds[MAX_THREADS + 1];
+    for (int i = 0; i <= MAX_THREADS; i++) {
+        int b = i == MAX_THREADS ? capacity
+              : (int)(((int64_t)capacity * i / MAX_THREADS) & ~(int64_t)(PARALLEL_OWNED_ALIGN - 1));
+        bounds[i] = b < count ? b : count;
+    }
+    run_split(w, fn, bounds);
+}
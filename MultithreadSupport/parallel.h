@@ -18,4 +18,23 @@ typedef void (*SystemRangeFn)(void* world, int start, int end);
 // Prototipo para ejecución paralela pasiva
 void parallel_run(void* world, SystemRangeFn func, int total_items);
 
+// Como parallel_run, pero el worker k recibe siempre su tramo fijo de [0, capacity)
+// (límites múltiplos de PARALLEL_OWNED_ALIGN) recortado a [0, total_items): cada
+// worker toca los mismos elementos en todos los frames (CONFIG NUMA)
+#define PARALLEL_OWNED_ALIGN 1024
+void parallel_run_owned(void* world, SystemRangeFn func, int total_items, int capacity);
+
+// Fija el worker k a la CPU cpus[k % count], y el hilo que llama a cpus[0].
+// count = 0 deja los hilos libres. Sin efecto fuera de Linux
+void parallel_set_affinity(const int* cpus, int count);
+
+// Escribe en cpus (hasta max) las CPUs en las que puede correr el proceso, en orden,
+// y devuelve cuántas son (0 si no se pueden consultar)
+int parallel_default_cpus(int* cpus, int max);
+
+// Hook opcional por chunk (tracing/contadores): se llama en el hilo que ejecuta
+// el rango [start,end), con is_end = 0 antes y 1 después. NULL lo desactiva.
+typedef void (*ParallelChunkHook)(int worker, int start, int end, int is_end);
+void parallel_set_chunk_hook(ParallelChunkHook hook);
+
 #endif
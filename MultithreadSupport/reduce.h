@@ -0,0 +1,184 @@
+/* This Source Code Form is subject to the terms of the Mozilla Public
+ * License, v. 2.0. If a copy of the MPL was not distributed with this
+ * file, You can obtain one at https://mozilla.org/MPL/2.0/.
+ */
+
+
+#ifndef REDUCE_H
+#define REDUCE_H
+
+#include "parallel.h"
+#include <float.h>
+#include <stdint.h>
+#include <stdlib.h>
+#include <string.h>
+
+// Reducciones paralelas deterministas sobre [0, n).
+//
+// parallel_reduce: cada bloque fijo de REDUCE_BLOCK elementos tiene su parcial y los
+// parciales se combinan en orden de bloque. Un bloque lo calcula entero el hilo cuyo
+// rango contiene su primer elemento, así que el resultado (también con float) es el
+// mismo bit a bit con cualquier número de hilos.
+//
+// parallel_histogram: histograma local por rango sumado con atómicos. Los conteos son
+// enteros: el resultado no depende del reparto.
+//
+// Se llaman desde el hilo principal, no desde dentro de un parallel_run: los parciales
+// viven en un buffer estático.
+
+#define REDUCE_BLOCK_SHIFT 12
+#define REDUCE_BLOCK (1 << REDUCE_BLOCK_SHIFT)
+#define REDUCE_BLOCKS(n) (((n) + REDUCE_BLOCK - 1) >> REDUCE_BLOCK_SHIFT)
+
+// Acumula [start, end) en partial (llega con el valor identidad)
+typedef void (*ReduceRangeFn)(void* ctx, int start, int end, void* partial);
+// acc = acc combinado con partial
+typedef void (*ReduceMergeFn)(void* acc, const void* partial);
+
+typedef struct {
+    void* ctx;
+    ReduceRangeFn fn;
+    int n;
+    size_t size;
+    const void* identity;
+    uint8_t* partials;
+} ReducePass;
+
+static uint8_t* g_reduce_partials = NULL;
+static size_t g_reduce_capacity = 0;
+
+static void parallel_reduce_range(void* arg, int start, int end) {
+    ReducePass* p = (ReducePass*)arg;
+    // Bloques que empiezan en [start, end); el último puede acabar fuera del rango
+    for (int b = (start + REDUCE_BLOCK - 1) >> REDUCE_BLOCK_SHIFT; (b << REDUCE_BLOCK_SHIFT) < end; b++) {
+        const int lo = b << REDUCE_BLOCK_SHIFT;
+        const int hi = p->n - lo > REDUCE_BLOCK ? lo + REDUCE_BLOCK : p->n;
+        void* partial = p->partials + (size_t)b * p->size;
+        memcpy(partial, p->identity, p->size);
+        p->fn(p->ctx, lo, hi, partial);
+    }
+}
+
+// result (size bytes) = identity combinado, en orden, con el parcial de cada bloque.
+// Devuelve -1 si no hay memoria para los parciales
+static inline int parallel_reduce(void* ctx, ReduceRangeFn fn, ReduceMergeFn merge, int n,
+                                  void* result, size_t size, const void* identity) {
+    memcpy(result, identity, size);
+    if (n <= 0) return 0;
+    const size_t bytes = (size_t)REDUCE_BLOCKS(n) * size;
+    if (bytes > g_reduce_capacity) {
+        uint8_t* grown = (uint8_t*)realloc(g_reduce_partials, bytes);
+        if (!grown) return -1;
+        g_reduce_partials = grown;
+        g_reduce_capacity = bytes;
+    }
+    ReducePass p = { ctx, fn, n, size, identity, g_reduce_partials };
+    parallel_run(&p, parallel_reduce_range, n);
+    for (int b = 0; b < REDUCE_BLOCKS(n); b++) merge(result, g_reduce_partials + (size_t)b * size);
+    return 0;
+}
+
+// Suma a hist[0..bins) lo que hay en [start, end) (hist llega a cero)
+typedef void (*HistogramRangeFn)(void* ctx, int start, int end, int64_t* hist);
+
+typedef struct {
+    void* ctx;
+    HistogramRangeFn fn;
+    int bins;
+    int64_t* hist;
+    int failed;
+} HistogramPass;
+
+static void parallel_histogram_range(void* arg, int start, int end) {
+    HistogramPass* p = (HistogramPass*)arg;
+    int64_t* local = (int64_t*)calloc((size_t)p->bins, sizeof(int64_t));
+    if (!local) {
+        __atomic_store_n(&p->failed, 1, __ATOMIC_RELAXED);
+        return;
+    }
+    p->fn(p->ctx, start, end, local);
+    for (int k = 0; k < p->bins; k++)
+        if (local[k]) __atomic_fetch_add(&p->hist[k], local[k], __ATOMIC_RELAXED);
+    free(local);
+}
+
+// hist[0..bins) = histograma de [0, n). Devuelve -1 si algún rango no tuvo memoria
+// para su histograma local (el resultado queda incompleto)
+static inline int parallel_histogram(void* ctx, HistogramRangeFn fn, int n, int64_t* hist, int bins) {
+    memset(hist, 0, (size_t)bins * sizeof(int64_t));
+    if (n <= 0) return 0;
+    HistogramPass p = { ctx, fn, bins, hist, 0 };
+    parallel_run(&p, parallel_histogram_range, n);
+    return p.failed ? -1 : 0;
+}
+
+// Reducciones habituales sobre una columna
+
+static void reduce_count_u8_range(void* ctx, int start, int end, void* partial) {
+    const uint8_t* x = (const uint8_t*)ctx;
+    int64_t n = 0;
+    for (int i = start; i < end; i++) n += x[i] != 0;
+    *(int64_t*)partial += n;
+}
+
+static void reduce_add_i64(void* acc, const void* partial) {
+    *(int64_t*)acc += *(const int64_t*)partial;
+}
+
+// Elementos distintos de cero en una columna bool/uint8
+static inline int64_t parallel_count_u8(const void* x, int n) {
+    const int64_t zero = 0;
+    int64_t result;
+    parallel_reduce((void*)x, reduce_count_u8_range, reduce_add_i64, n, &result, sizeof(result), &zero);
+    return result;
+}
+
+static void reduce_sum_f32_range(void* ctx, int start, int end, void* partial) {
+    const float* x = (const float*)ctx;
+    double s = 0.0;
+    for (int i = start; i < end; i++) s += x[i];
+    *(double*)partial += s;
+}
+
+static void reduce_add_f64(void* acc, const void* partial) {
+    *(double*)acc += *(const double*)partial;
+}
+
+// Suma en double de una columna float
+static inline double parallel_sum_f32(const float* x, int n) {
+    const double zero = 0.0;
+    double result;
+    parallel_reduce((void*)x, reduce_sum_f32_range, reduce_add_f64, n, &result, sizeof(result), &zero);
+    return result;
+}
+
+typedef struct {
+    float min, max;
+} ReduceMinMax;
+
+static void reduce_minmax_f32_range(void* ctx, int start, int end, void* partial) {
+    const float* x = (const float*)ctx;
+    ReduceMinMax* m = (ReduceMinMax*)partial;
+    for (int i = start; i < end; i++) {
+        if (x[i] < m->min) m->min = x[i];
+        if (x[i] > m->max) m->max = x[i];
+    }
+}
+
+static void reduce_merge_minmax(void* acc, const void* partial) {
+    ReduceMinMax* a = (ReduceMinMax*)acc;
+    const ReduceMinMax* p = (const ReduceMinMax*)partial;
+    if (p->min < a->min) a->min = p->min;
+    if (p->max > a->max) a->max = p->max;
+}
+
+// Mínimo y máximo de una columna float (FLT_MAX y -FLT_MAX si n == 0)
+static inline void parallel_minmax_f32(const float* x, int n, float* min, float* max) {
+    const ReduceMinMax identity = { FLT_MAX, -FLT_MAX };
+    ReduceMinMax result;
+    parallel_reduce((void*)x, reduce_minmax_f32_range, reduce_merge_minmax, n, &result, sizeof(result), &identity);
+    *min = result.min;
+    *max = result.max;
+}
+
+#endif
@@ -0,0 +1,179 @@
+/* This Source Code Form is subject to the terms of the Mozilla Public
+ * License, v. 2.0. If a copy of the MPL was not distributed with this
+ * file, You can obtain one at https://mozilla.org/MPL/2.0/.
+ */
+
+
+#ifndef REORDER_H
+#define REORDER_H
+
+#include "parallel.h"
+#include "reduce.h"
+#include <stdbool.h>
+#include <stdint.h>
+#include <string.h>
+
+// Reordenación espacial de columnas SoA (CONFIG REORDER).
+//
+// 1. morton_keys: clave = código Morton de 30 bits (10 por eje, sobre la caja que
+//    envuelve las posiciones, calculada con parallel_minmax_f32) en los 32 bits altos,
+//    índice original en los bajos.
+// 2. radix_sort_u64: orden radix LSD estable y paralelo de esas claves.
+// 3. parallel_gather: aplica la permutación a cada columna.
+//
+// Las pasadas paralelas usan bloques fijos de RADIX_BLOCK elementos: cada bloque
+// tiene su histograma, así que la salida no depende de cómo parallel_run reparte.
+
+#define RADIX_BLOCK_SHIFT 14
+#define RADIX_BLOCK (1 << RADIX_BLOCK_SHIFT)
+#define RADIX_BLOCKS(n) (((n) + RADIX_BLOCK - 1) >> RADIX_BLOCK_SHIFT)
+
+// Separa los 10 bits bajos de v dejando dos ceros entre cada uno
+static inline uint32_t morton_spread10(uint32_t v) {
+    v &= 0x3FF;
+    v = (v | (v << 16)) & 0x030000FF;
+    v = (v | (v << 8)) & 0x0300F00F;
+    v = (v | (v << 4)) & 0x030C30C3;
+    v = (v | (v << 2)) & 0x09249249;
+    return v;
+}
+
+typedef struct {
+    uint64_t* keys;
+    const float *x, *y, *z;
+    float min[3];
+    float scale[3];   // 1023 / extensión de cada eje
+} MortonPass;
+
+static void morton_keys_range(void* arg, int start, int end) {
+    MortonPass* p = (MortonPass*)arg;
+    for (int i = start; i < end; i++) {
+        const uint32_t qx = (uint32_t)((p->x[i] - p->min[0]) * p->scale[0]);
+        const uint32_t qy = (uint32_t)((p->y[i] - p->min[1]) * p->scale[1]);
+        const uint32_t qz = (uint32_t)((p->z[i] - p->min[2]) * p->scale[2]);
+        const uint32_t code = morton_spread10(qx) | (morton_spread10(qy) << 1) | (morton_spread10(qz) << 2);
+        p->keys[i] = ((uint64_t)code << 32) | (uint32_t)i;
+    }
+}
+
+static inline void morton_keys(uint64_t* keys, const float* x, const float* y, const float* z, int32_t n) {
+    if (n <= 0) return;
+    MortonPass p = { keys, x, y, z, { 0.0f, 0.0f, 0.0f }, { 0.0f, 0.0f, 0.0f } };
+    float max[3];
+    parallel_minmax_f32(x, n, &p.min[0], &max[0]);
+    parallel_minmax_f32(y, n, &p.min[1], &max[1]);
+    parallel_minmax_f32(z, n, &p.min[2], &max[2]);
+    for (int k = 0; k < 3; k++) {
+        const float extent = max[k] - p.min[k];
+        p.scale[k] = extent > 0.0f ? 1023.0f / extent : 0.0f;
+    }
+    parallel_run(&p, morton_keys_range, n);
+}
+
+typedef struct {
+    const uint64_t* src;
+    uint64_t* dst;
+    int shift;
+    int32_t* hist;     // [bloque][256] apariciones de cada dígito
+    int32_t* offset;   // [bloque][256] primera posición de salida
+} RadixPass;
+
+static inline void radix_flush(int32_t* hist, const int32_t* local) {
+    for (int d = 0; d < 256; d++)
+        if (local[d]) __atomic_fetch_add(&hist[d], local[d], __ATOMIC_RELAXED);
+}
+
+static void radix_hist_range(void* arg, int start, int end) {
+    RadixPass* p = (RadixPass*)arg;
+    int32_t local[256] = { 0 };
+    int32_t block = start >> RADIX_BLOCK_SHIFT;
+    for (int i = start; i < end; i++) {
+        if ((i >> RADIX_BLOCK_SHIFT) != block) {
+            // Un bloque puede quedar repartido entre dos hilos
+            radix_flush(&p->hist[block * 256], local);
+            memset(local, 0, sizeof(local));
+            block = i >> RADIX_BLOCK_SHIFT;
+        }
+        local[(p->src[i] >> p->shift) & 0xFF]++;
+    }
+    radix_flush(&p->hist[block * 256], local);
+}
+
+static void radix_scatter_range(void* arg, int start, int end) {
+    RadixPass* p = (RadixPass*)arg;
+    int32_t pos[256];
+    int32_t block = start >> RADIX_BLOCK_SHIFT;
+    memcpy(pos, &p->offset[block * 256], sizeof(pos));
+    // Empezando a mitad de bloque: saltar lo que escribe el hilo anterior
+    for (int i = block << RADIX_BLOCK_SHIFT; i < start; i++) pos[(p->src[i] >> p->shift) & 0xFF]++;
+    for (int i = start; i < end; i++) {
+        if ((i >> RADIX_BLOCK_SHIFT) != block) {
+            block = i >> RADIX_BLOCK_SHIFT;
+            memcpy(pos, &p->offset[block * 256], sizeof(pos));
+        }
+        const uint64_t v = p->src[i];
+        p->dst[pos[(v >> p->shift) & 0xFF]++] = v;
+    }
+}
+
+// Ordena n claves por los bits [first_bit, first_bit + bits) usando a y b como buffers
+// alternos. hist y offset tienen RADIX_BLOCKS(n) * 256 entradas. Devuelve el buffer
+// con el resultado (a o b). Los dígitos iguales en todas las claves no se recorren.
+static inline uint64_t* radix_sort_u64(uint64_t* a, uint64_t* b, int32_t n, int first_bit, int bits,
+                                       int32_t* hist, int32_t* offset) {
+    const int32_t blocks = RADIX_BLOCKS(n);
+    for (int shift = first_bit; shift < first_bit + bits; shift += 8) {
+        RadixPass p = { a, b, shift, hist, offset };
+        memset(hist, 0, (size_t)blocks * 256 * sizeof(int32_t));
+        parallel_run(&p, radix_hist_range, n);
+
+        // Suma de prefijos en orden (dígito, bloque): orden estable
+        int32_t total = 0;
+        bool trivial = false;
+        for (int d = 0; d < 256; d++) {
+            const int32_t before = total;
+            for (int32_t k = 0; k < blocks; k++) {
+                offset[k * 256 + d] = total;
+                total += hist[k * 256 + d];
+            }
+            if (total - before == n) trivial = true;
+        }
+        if (trivial) continue;
+
+        parallel_run(&p, radix_scatter_range, n);
+        uint64_t* t = a; a = b; b = t;
+    }
+    return a;
+}
+
+typedef struct {
+    uint8_t* dst;
+    const uint8_t* src;
+    size_t size;
+    const int32_t* perm;
+} GatherPass;
+
+static void parallel_gather_range(void* arg, int start, int end) {
+    GatherPass* p = (GatherPass*)arg;
+    switch (p->size) {
+    case 1:
+        for (int i = start; i < end; i++) p->dst[i] = p->src[p->perm[i]];
+        break;
+    case 4:
+        for (int i = start; i < end; i++) ((uint32_t*)p->dst)[i] = ((const uint32_t*)p->src)[p->perm[i]];
+        break;
+    case 8:
+        for (int i = start; i < end; i++) ((uint64_t*)p->dst)[i] = ((const uint64_t*)p->src)[p->perm[i]];
+        break;
+    default:
+        for (int i = start; i < end; i++) memcpy(p->dst + (size_t)i * p->size, p->src + (size_t)p->perm[i] * p->size, p->size);
+    }
+}
+
+// dst[i] = src[perm[i]] para elementos de size bytes
+static inline void parallel_gather(void* dst, const void* src, size_t size, const int32_t* perm, int32_t n) {
+    GatherPass p = { (uint8_t*)dst, (const uint8_t*)src, size, perm };
+    parallel_run(&p, parallel_gather_range, n);
+}
+
+#endif
@@ -0,0 +1,201 @@
+/* This Source Code Form is subject to the terms of the Mozilla Public
+ * License, v. 2.0. If a copy of the MPL was not distributed with this
+ * file, You can obtain one at https://mozilla.org/MPL/2.0/.
+ */
+
+
+#ifndef PERF_COUNTERS_H
+#define PERF_COUNTERS_H
+
+#include <errno.h>
+#include <pthread.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <string.h>
+
+#ifdef __linux__
+#include <linux/perf_event.h>
+#include <sys/syscall.h>
+#include <unistd.h>
+#endif
+
+#define PERF_EVENTS 4
+#define PERF_MAX_WORKERS 64
+
+enum { PERF_CYCLES, PERF_INSTRUCTIONS, PERF_LLC_MISSES, PERF_BRANCH_MISSES };
+
+static const char* const perf_event_names[PERF_EVENTS] = {
+    "cycles", "instructions", "llc_misses", "branch_misses"
+};
+
+// Contadores del hilo que los abrió (solo espacio de usuario: basta con perf_event_paranoid <= 2)
+typedef struct {
+    int fd[PERF_EVENTS];
+} PerfThread;
+
+typedef struct {
+    uint64_t calls;
+    uint64_t value[PERF_EVENTS];
+} PerfEntry;
+
+typedef struct {
+    const char* const* names;
+    int count;
+    PerfEntry* entries;
+    PerfEntry workers[PERF_MAX_WORKERS];
+    PerfThread main;
+    pthread_t main_thread;
+    int available[PERF_EVENTS];
+    volatile int current;  // entrada a la que los workers suman sus chunks
+} PerfCounters;
+
+static inline int perf_open_event(int index) {
+#ifdef __linux__
+    // CACHE_MISSES es, en la práctica, fallos de último nivel (LLC)
+    static const uint64_t configs[PERF_EVENTS] = {
+        PERF_COUNT_HW_CPU_CYCLES, PERF_COUNT_HW_INSTRUCTIONS,
+        PERF_COUNT_HW_CACHE_MISSES, PERF_COUNT_HW_BRANCH_MISSES
+    };
+    struct perf_event_attr attr;
+    memset(&attr, 0, sizeof(attr));
+    attr.type = PERF_TYPE_HARDWARE;
+    attr.size = sizeof(attr);
+    attr.config = configs[index];
+    attr.exclude_kernel = 1;
+    attr.exclude_hv = 1;
+    return (int)syscall(SYS_perf_event_open, &attr, 0, -1, -1, 0);
+#else
+    (void)index;
+    errno = ENOSYS;
+    return -1;
+#endif
+}
+
+static inline int perf_thread_open(PerfThread* t, const int* wanted) {
+    int opened = 0;
+    for (int i = 0; i < PERF_EVENTS; i++) {
+        t->fd[i] = (wanted && !wanted[i]) ? -1 : perf_open_event(i);
+        if (t->fd[i] >= 0) opened++;
+    }
+    return opened;
+}
+
+static inline void perf_thread_read(const PerfThread* t, uint64_t v[PERF_EVENTS]) {
+    for (int i = 0; i < PERF_EVENTS; i++) {
+        v[i] = 0;
+#ifdef __linux__
+        if (t->fd[i] >= 0 && read(t->fd[i], &v[i], sizeof(uint64_t)) != sizeof(uint64_t)) v[i] = 0;
+#endif
+    }
+}
+
+static inline void perf_thread_close(PerfThread* t) {
+    for (int i = 0; i < PERF_EVENTS; i++) {
+#ifdef __linux__
+        if (t->fd[i] >= 0) close(t->fd[i]);
+#endif
+        t->fd[i] = -1;
+    }
+}
+
+// Devuelve el número de eventos disponibles; 0 = modo desactivado (todo es no-op)
+static inline int perf_init(PerfCounters* p) {
+    p->main_thread = pthread_self();
+    p->current = -1;
+    int opened = perf_thread_open(&p->main, NULL);
+    for (int i = 0; i < PERF_EVENTS; i++) p->available[i] = p->main.fd[i] >= 0;
+    if (opened == 0) {
+        printf("[PERF] perf_event_open no disponible (%s); contadores desactivados\n", strerror(errno));
+    } else if (opened < PERF_EVENTS) {
+        printf("[PERF] solo %d de %d contadores disponibles\n", opened, PERF_EVENTS);
+    }
+    return opened;
+}
+
+static inline int perf_enabled(const PerfCounters* p) {
+    return p->main.fd[0] >= 0 || p->main.fd[1] >= 0 || p->main.fd[2] >= 0 || p->main.fd[3] >= 0;
+}
+
+static inline void perf_begin(PerfCounters* p, int id, uint64_t v[PERF_EVENTS]) {
+    perf_thread_read(&p->main, v);
+    p->current = id;
+}
+
+static inline void perf_add(PerfEntry* e, const uint64_t v[PERF_EVENTS]) {
+    __atomic_fetch_add(&e->calls, 1, __ATOMIC_RELAXED);
+    for (int i = 0; i < PERF_EVENTS; i++) __atomic_fetch_add(&e->value[i], v[i], __ATOMIC_RELAXED);
+}
+
+// Suma lo que contó el hilo principal desde perf_begin (los workers suman aparte)
+static inline void perf_end(PerfCounters* p, int id, const uint64_t begin[PERF_EVENTS]) {
+    if (!perf_enabled(p)) return;
+    uint64_t now[PERF_EVENTS];
+    perf_thread_read(&p->main, now);
+    for (int i = 0; i < PERF_EVENTS; i++) now[i] -= begin[i];
+    perf_add(&p->entries[id], now);
+    p->current = -1;
+}
+
+#define PERF_CALL(perf, id, ...) do { \
+    uint64_t _perf_v0[PERF_EVENTS]; \
+    perf_begin(&(perf), (id), _perf_v0); \
+    __VA_ARGS__; \
+    perf_end(&(perf), (id), _perf_v0); \
+} while (0)
+
+// Hook de chunk: los workers son hilos nuevos en cada parallel_run, así que cada
+// chunk abre sus propios contadores. En el camino inline (hilo principal) ya
+// cuentan los del sistema y solo se suma al worker.
+static inline void perf_chunk(PerfCounters* p, int worker, int is_end) {
+    static __thread PerfThread t;
+    static __thread uint64_t v0[PERF_EVENTS];
+    if (!perf_enabled(p) || worker < 0 || worker >= PERF_MAX_WORKERS) return;
+    int on_main = pthread_equal(pthread_self(), p->main_thread);
+
+    if (!is_end) {
+        if (on_main) t = p->main;
+        else perf_thread_open(&t, p->available);
+        perf_thread_read(&t, v0);
+        return;
+    }
+
+    uint64_t v[PERF_EVENTS];
+    perf_thread_read(&t, v);
+    for (int i = 0; i < PERF_EVENTS; i++) v[i] -= v0[i];
+    perf_add(&p->workers[worker], v);
+    if (!on_main) {
+        int id = p->current;
+        if (id >= 0) {
+            // Las llamadas ya las cuenta perf_end: aquí solo se suman valores
+            for (int i = 0; i < PERF_EVENTS; i++) __atomic_fetch_add(&p->entries[id].value[i], v[i], __ATOMIC_RELAXED);
+        }
+        perf_thread_close(&t);
+    }
+}
+
+static inline void perf_print_values(const PerfEntry* e, FILE* f) {
+    for (int i = 0; i < PERF_EVENTS; i++) fprintf(f, " %s=%llu", perf_event_names[i], (unsigned long long)e->value[i]);
+    double ipc = e->value[PERF_CYCLES] ? (double)e->value[PERF_INSTRUCTIONS] / e->value[PERF_CYCLES] : 0.0;
+    fprintf(f, " ipc=%.2f\n", ipc);
+}
+
+// [PERF] frame=600 name=ApplyPhysicsExtreme calls=600 cycles=... instructions=... llc_misses=... branch_misses=... ipc=1.52
+// [PERF] frame=600 worker=3 chunks=1200 cycles=... ipc=...
+static inline void perf_dump(const PerfCounters* p, uint64_t frame, FILE* f) {
+    if (!perf_enabled(p)) return;
+    for (int id = 0; id < p->count; id++) {
+        const PerfEntry* e = &p->entries[id];
+        if (e->calls == 0) continue;
+        fprintf(f, "[PERF] frame=%llu name=%s calls=%llu", (unsigned long long)frame, p->names[id], (unsigned long long)e->calls);
+        perf_print_values(e, f);
+    }
+    for (int w = 0; w < PERF_MAX_WORKERS; w++) {
+        const PerfEntry* e = &p->workers[w];
+        if (e->calls == 0) continue;
+        fprintf(f, "[PERF] frame=%llu worker=%d chunks=%llu", (unsigned long long)frame, w, (unsigned long long)e->calls);
+        perf_print_values(e, f);
+    }
+    fflush(f);
+}
+
+#endif
@@ -0,0 +1,111 @@
+/* This Source Code Form is subject to the terms of the Mozilla Public
+ * License, v. 2.0. If a copy of the MPL was not distributed with this
+ * file, You can obtain one at https://mozilla.org/MPL/2.0/.
+ */
+
+
+#ifndef PROFILER_H
+#define PROFILER_H
+
+#include "../TimeSupport/clock.h"
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+// Ventana de muestras por entrada: las estadísticas son de los últimos N frames
+#ifndef PROFILE_SAMPLES
+#define PROFILE_SAMPLES 256
+#endif
+
+typedef struct {
+    uint64_t samples[PROFILE_SAMPLES];
+    uint32_t head;
+    uint32_t filled;
+    uint64_t calls;
+    uint64_t total_ns;
+} ProfileEntry;
+
+// Valor muestreado una vez por frame (p.ej. entidades activas)
+typedef struct {
+    int64_t last;
+    int64_t sum;
+    uint64_t frames;
+} ProfileGauge;
+
+typedef struct {
+    const char* const* names;
+    int count;
+    ProfileEntry* entries;
+    const char* const* gauge_names;
+    int gauge_count;
+    ProfileGauge* gauges;
+} Profiler;
+
+// Cronometra una sentencia (admite comas en los argumentos)
+#define PROFILE_CALL(prof, id, ...) do { \
+    const uint64_t _prof_t0 = clock_now_ns(); \
+    __VA_ARGS__; \
+    profile_record(&(prof), (id), clock_now_ns() - _prof_t0); \
+} while (0)
+
+static inline void profile_record(Profiler* p, int id, uint64_t ns) {
+    ProfileEntry* e = &p->entries[id];
+    e->samples[e->head] = ns;
+    e->head = (e->head + 1) % PROFILE_SAMPLES;
+    if (e->filled < PROFILE_SAMPLES) e->filled++;
+    e->calls++;
+    e->total_ns += ns;
+}
+
+static inline void profile_gauge(Profiler* p, int id, int64_t value) {
+    ProfileGauge* g = &p->gauges[id];
+    g->last = value;
+    g->sum += value;
+    g->frames++;
+}
+
+// Descarta todo lo medido hasta ahora (fin del calentamiento)
+static inline void profile_reset(Profiler* p) {
+    memset(p->entries, 0, (size_t)p->count * sizeof(ProfileEntry));
+    if (p->gauge_count > 0) memset(p->gauges, 0, (size_t)p->gauge_count * sizeof(ProfileGauge));
+}
+
+static int profile_compare_u64(const void* a, const void* b) {
+    uint64_t x = *(const uint64_t*)a, y = *(const uint64_t*)b;
+    return (x > y) - (x < y);
+}
+
+// Una línea por entrada, formato clave=valor (tiempos en microsegundos). mean/p50/p99/max son
+// de la ventana de muestras; total_us acumula todas las llamadas desde el último reset:
+// [PROFILE] frame=600 name=ApplyPhysicsExtreme calls=600 mean_us=812.4 p50_us=790.1 p99_us=1203.9 max_us=1410.2 total_us=487440.0
+// [PROFILE] frame=600 gauge=Cube.active last=153600 mean=76928.0
+static inline void profile_dump(const Profiler* p, uint64_t frame, FILE* f) {
+    uint64_t sorted[PROFILE_SAMPLES];
+    for (int id = 0; id < p->count; id++) {
+        const ProfileEntry* e = &p->entries[id];
+        if (e->filled == 0) continue;
+        memcpy(sorted, e->samples, e->filled * sizeof(uint64_t));
+        qsort(sorted, e->filled, sizeof(uint64_t), profile_compare_u64);
+
+        uint64_t sum = 0;
+        for (uint32_t i = 0; i < e->filled; i++) sum += sorted[i];
+        uint32_t p99 = (e->filled * 99) / 100;
+        if (p99 >= e->filled) p99 = e->filled - 1;
+
+        fprintf(f, "[PROFILE] frame=%llu name=%s calls=%llu mean_us=%.1f p50_us=%.1f p99_us=%.1f max_us=%.1f total_us=%.1f\n",
+                (unsigned long long)frame, p->names[id], (unsigned long long)e->calls,
+                (double)sum / e->filled / 1e3, sorted[e->filled / 2] / 1e3,
+                sorted[p99] / 1e3, sorted[e->filled - 1] / 1e3, e->total_ns / 1e3);
+    }
+    for (int id = 0; id < p->gauge_count; id++) {
+        const ProfileGauge* g = &p->gauges[id];
+        if (g->frames == 0) continue;
+        fprintf(f, "[PROFILE] frame=%llu gauge=%s last=%lld mean=%.1f\n",
+                (unsigned long long)frame, p->gauge_names[id], (long long)g->last,
+                (double)g->sum / g->frames);
+    }
+    fflush(f);
+}
+
+#endif
@@ -0,0 +1,150 @@
+/* This Source Code Form is subject to the terms of the Mozilla Public
+ * License, v. 2.0. If a copy of the MPL was not distributed with this
+ * file, You can obtain one at https://mozilla.org/MPL/2.0/.
+ */
+
+
+#ifndef STATS_H
+#define STATS_H
+
+#include "profiler.h"
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <fcntl.h>
+#include <unistd.h>
+
+// Métricas por frame legibles por máquina, a fichero, FIFO o stdout ("-").
+//
+// NDJSON: una línea por frame
+//   {"frame":1,"t_ns":16000000,"frame_ns":812000,"dt":0.016,"rss_kb":10240,"active":{"Cube":256},"gauges":{"Cube.awake":200},"systems_ns":{"ApplyPhysicsExtreme":812345}}
+//   ("active" son los gauges <Entidad>.active; "gauges", el resto con su nombre completo)
+//
+// BINARY (little endian del host):
+//   cabecera: "EFST" u32 versión, u32 n_gauges, u32 n_systems,
+//             nombres (n_gauges + n_systems cadenas terminadas en '\0')
+//   registro: u64 frame, u64 t_ns, u64 frame_ns, f64 dt, i64 rss_kb, i64 gauge[n_gauges], u64 system_ns[n_systems]
+//
+// Los tiempos por sistema son la diferencia de total_ns del profiler entre frames,
+// así que suman todas las llamadas del frame (varios pasos, varias fases).
+
+#define STATS_VERSION 1
+
+#ifndef STATS_BUFFER_BYTES
+#define STATS_BUFFER_BYTES (1 << 20)
+#endif
+
+typedef enum { STATS_NDJSON, STATS_BINARY } StatsFormat;
+
+typedef struct {
+    FILE* f;
+    StatsFormat format;
+    char* buffer;
+    uint64_t* prev_total;  // total_ns por entrada en el frame anterior
+    int statm_fd;
+} StatsWriter;
+
+static inline int stats_open(StatsWriter* s, const Profiler* p, const char* path, StatsFormat format) {
+    memset(s, 0, sizeof(*s));
+    s->format = format;
+    s->statm_fd = -1;
+    s->f = strcmp(path, "-") == 0 ? stdout : fopen(path, format == STATS_BINARY ? "wb" : "w");
+    if (!s->f) {
+        fprintf(stderr, "[STATS] No se pudo abrir %s\n", path);
+        return -1;
+    }
+    // Escritura en bloques grandes: una llamada al sistema cada ~1 MB, no cada frame.
+    // stdout ya está en uso, así que conserva su buffer.
+    if (s->f != stdout) {
+        s->buffer = (char*)malloc(STATS_BUFFER_BYTES);
+        if (s->buffer) setvbuf(s->f, s->buffer, _IOFBF, STATS_BUFFER_BYTES);
+    }
+    s->prev_total = (uint64_t*)calloc((size_t)p->count, sizeof(uint64_t));
+#ifdef __linux__
+    s->statm_fd = open("/proc/self/statm", O_RDONLY);
+#endif
+
+    if (format == STATS_BINARY) {
+        const uint32_t header[4] = { 0x54534645u /* "EFST" */, STATS_VERSION,
+                                     (uint32_t)p->gauge_count, (uint32_t)(p->count - 1) };
+        fwrite(header, sizeof(header), 1, s->f);
+        for (int i = 0; i < p->gauge_count; i++) fwrite(p->gauge_names[i], strlen(p->gauge_names[i]) + 1, 1, s->f);
+        for (int i = 1; i < p->count; i++) fwrite(p->names[i], strlen(p->names[i]) + 1, 1, s->f);
+    }
+    return 0;
+}
+
+// Memoria residente en KB (-1 si no se puede leer)
+static inline int64_t stats_rss_kb(StatsWriter* s) {
+    if (s->statm_fd < 0) return -1;
+    char buf[128];
+    ssize_t n = pread(s->statm_fd, buf, sizeof(buf) - 1, 0);
+    if (n <= 0) return -1;
+    buf[n] = '\0';
+    long long size = 0, resident = 0;
+    if (sscanf(buf, "%lld %lld", &size, &resident) != 2) return -1;
+    return resident * (sysconf(_SC_PAGESIZE) / 1024);
+}
+
+static inline uint64_t stats_delta(StatsWriter* s, const Profiler* p, int id) {
+    const uint64_t total = p->entries[id].total_ns;
+    // Tras profile_reset el total vuelve a empezar
+    const uint64_t delta = total >= s->prev_total[id] ? total - s->prev_total[id] : total;
+    s->prev_total[id] = total;
+    return delta;
+}
+
+// La entrada 0 del profiler es el frame completo; el resto son sistemas y spans
+static inline void stats_frame(StatsWriter* s, const Profiler* p, uint64_t frame, uint64_t t_ns, double dt) {
+    if (!s->f) return;
+    const int64_t rss_kb = stats_rss_kb(s);
+    const uint64_t frame_ns = stats_delta(s, p, 0);
+
+    if (s->format == STATS_BINARY) {
+        const uint64_t head[3] = { frame, t_ns, frame_ns };
+        fwrite(head, sizeof(head), 1, s->f);
+        fwrite(&dt, sizeof(dt), 1, s->f);
+        fwrite(&rss_kb, sizeof(rss_kb), 1, s->f);
+        for (int i = 0; i < p->gauge_count; i++) fwrite(&p->gauges[i].last, sizeof(int64_t), 1, s->f);
+        for (int i = 1; i < p->count; i++) {
+            const uint64_t ns = stats_delta(s, p, i);
+            fwrite(&ns, sizeof(ns), 1, s->f);
+        }
+        return;
+    }
+
+    fprintf(s->f, "{\"frame\":%llu,\"t_ns\":%llu,\"frame_ns\":%llu,\"dt\":%.9g,\"rss_kb\":%lld,\"active\":{",
+            (unsigned long long)frame, (unsigned long long)t_ns, (unsigned long long)frame_ns, dt, (long long)rss_kb);
+    int n = 0;
+    for (int i = 0; i < p->gauge_count; i++) {
+        // "Cube.active" -> "Cube"
+        const char* name = p->gauge_names[i];
+        const char* dot = strchr(name, '.');
+        if (!dot || strcmp(dot, ".active") != 0) continue;
+        fprintf(s->f, "%s\"%.*s\":%lld", n++ ? "," : "", (int)(dot - name), name, (long long)p->gauges[i].last);
+    }
+    fputs("},\"gauges\":{", s->f);
+    n = 0;
+    for (int i = 0; i < p->gauge_count; i++) {
+        const char* dot = strchr(p->gauge_names[i], '.');
+        if (dot && strcmp(dot, ".active") == 0) continue;
+        fprintf(s->f, "%s\"%s\":%lld", n++ ? "," : "", p->gauge_names[i], (long long)p->gauges[i].last);
+    }
+    fputs("},\"systems_ns\":{", s->f);
+    for (int i = 1; i < p->count; i++) {
+        fprintf(s->f, "%s\"%s\":%llu", i > 1 ? "," : "", p->names[i], (unsigned long long)stats_delta(s, p, i));
+    }
+    fputs("}}\n", s->f);
+}
+
+static inline void stats_close(StatsWriter* s) {
+    if (s->f && s->f != stdout) fclose(s->f);
+    else if (s->f) fflush(s->f);
+    if (s->statm_fd >= 0) close(s->statm_fd);
+    free(s->buffer);
+    free(s->prev_total);
+    s->f = NULL;
+}
+
+#endif
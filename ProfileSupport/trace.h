@@ -0,0 +1,125 @@
+/* This Source Code Form is subject to the terms of the Mozilla Public
+ * License, v. 2.0. If a copy of the MPL was not distributed with this
+ * file, You can obtain one at https://mozilla.org/MPL/2.0/.
+ */
+
+
+#ifndef TRACE_H
+#define TRACE_H
+
+#include "../TimeSupport/clock.h"
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+
+// Pista 0 = hilo principal (sistemas); pista 1+N = worker N de parallel_run
+#ifndef TRACE_MAX_TRACKS
+#define TRACE_MAX_TRACKS 65
+#endif
+
+// Eventos por pista; al llenarse se sobrescriben los más antiguos
+#ifndef TRACE_RING_EVENTS
+#define TRACE_RING_EVENTS 16384
+#endif
+
+#define TRACE_STACK_DEPTH 8
+
+typedef struct {
+    uint64_t ts_ns;
+    uint64_t dur_ns;
+    const char* name;
+    int32_t start, end;  // rango del chunk (-1 en spans de sistema)
+} TraceEvent;
+
+// Un solo escritor por pista: no hace falta sincronización
+typedef struct {
+    TraceEvent events[TRACE_RING_EVENTS];
+    uint64_t written;
+    uint64_t open_ts[TRACE_STACK_DEPTH];
+    const char* open_name[TRACE_STACK_DEPTH];
+    int depth;
+} TraceRing;
+
+static TraceRing* g_trace_tracks[TRACE_MAX_TRACKS];
+static uint64_t g_trace_origin_ns;
+static const char* volatile g_trace_current = "parallel_run";
+
+static inline TraceRing* trace_track(int track) {
+    if (track < 0 || track >= TRACE_MAX_TRACKS) return NULL;
+    // Solo el dueño de la pista la crea, así que no hay carrera
+    if (!g_trace_tracks[track]) g_trace_tracks[track] = (TraceRing*)calloc(1, sizeof(TraceRing));
+    return g_trace_tracks[track];
+}
+
+static inline void trace_push(TraceRing* r, const char* name, uint64_t ts, uint64_t dur, int32_t start, int32_t end) {
+    TraceEvent* e = &r->events[r->written % TRACE_RING_EVENTS];
+    e->ts_ns = ts;
+    e->dur_ns = dur;
+    e->name = name;
+    e->start = start;
+    e->end = end;
+    r->written++;
+}
+
+static inline void trace_init(void) {
+    g_trace_origin_ns = clock_now_ns();
+}
+
+// Spans del hilo principal (anidables: sistema -> despacho)
+static inline void trace_begin(const char* name) {
+    TraceRing* r = trace_track(0);
+    if (!r || r->depth >= TRACE_STACK_DEPTH) return;
+    r->open_name[r->depth] = name;
+    r->open_ts[r->depth++] = clock_now_ns();
+    g_trace_current = name;
+}
+
+static inline void trace_end(void) {
+    TraceRing* r = trace_track(0);
+    if (!r || r->depth == 0) return;
+    r->depth--;
+    uint64_t t0 = r->open_ts[r->depth];
+    trace_push(r, r->open_name[r->depth], t0, clock_now_ns() - t0, -1, -1);
+}
+
+// Hook de parallel_set_chunk_hook: un span por chunk [start,end) y worker
+static inline void trace_chunk_hook(int worker, int start, int end, int is_end) {
+    TraceRing* r = trace_track(1 + worker);
+    if (!r) return;
+    if (!is_end) {
+        r->open_ts[0] = clock_now_ns();
+        return;
+    }
+    trace_push(r, g_trace_current, r->open_ts[0], clock_now_ns() - r->open_ts[0], start, end);
+}
+
+// Chrome Trace Event JSON (chrome://tracing, ui.perfetto.dev)
+static inline int trace_write(const char* path) {
+    FILE* f = fopen(path, "w");
+    if (!f) return -1;
+    fprintf(f, "{\"displayTimeUnit\":\"ns\",\"traceEvents\":[\n");
+    int first = 1;
+    for (int t = 0; t < TRACE_MAX_TRACKS; t++) {
+        TraceRing* r = g_trace_tracks[t];
+        if (!r) continue;
+        char label[32];
+        if (t == 0) snprintf(label, sizeof(label), "main");
+        else snprintf(label, sizeof(label), "worker %d", t - 1);
+        fprintf(f, "%s{\"name\":\"thread_name\",\"ph\":\"M\",\"pid\":1,\"tid\":%d,\"args\":{\"name\":\"%s\"}}",
+                first ? "" : ",\n", t, label);
+        first = 0;
+        uint64_t begin = r->written > TRACE_RING_EVENTS ? r->written - TRACE_RING_EVENTS : 0;
+        for (uint64_t i = begin; i < r->written; i++) {
+            const TraceEvent* e = &r->events[i % TRACE_RING_EVENTS];
+            fprintf(f, ",\n{\"name\":\"%s\",\"ph\":\"X\",\"pid\":1,\"tid\":%d,\"ts\":%.3f,\"dur\":%.3f",
+                    e->name, t, (e->ts_ns - g_trace_origin_ns) / 1e3, e->dur_ns / 1e3);
+            if (e->start >= 0) fprintf(f, ",\"args\":{\"start\":%d,\"end\":%d,\"count\":%d}", e->start, e->end, e->end - e->start);
+            fprintf(f, "}");
+        }
+    }
+    fprintf(f, "\n]}\n");
+    fclose(f);
+    return 0;
+}
+
+#endif
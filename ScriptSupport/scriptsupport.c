@@ -7,12 +7,26 @@
 
 
 #include "scriptsupport.h"
+#include <pthread.h>
 #include <stdarg.h>
 #include <stdio.h>
+#include <stdlib.h>
 #include <string.h>
 
 static ScriptSupportState g_state = {0};
 
+// Lotes de comandos por rango (sistemas paralelos)
+typedef struct {
+    int key, seq;
+    int count, capacity;
+    GameCommand* commands;
+} StagedBatch;
+
+static pthread_mutex_t g_stage_lock = PTHREAD_MUTEX_INITIALIZER;
+static StagedBatch** g_batches = NULL;
+static int g_batch_count = 0, g_batch_capacity = 0;
+static _Thread_local StagedBatch* t_batch = NULL;
+
 static int find_free_timer_slot(void) {
     for(int i=0;i<MAX_TIMERS;i++)
         if(!g_state.timers[i].active) return i;
@@ -29,7 +43,22 @@ static int find_timer_by_name(const char* name,uint32_t owner_id){
     return -1;
 }
 
+static void stage_command(StagedBatch* b,GameCommand cmd){
+    if(b->count>=b->capacity){
+        int cap=b->capacity?b->capacity*2:64;
+        GameCommand* grown=realloc(b->commands,sizeof(GameCommand)*cap);
+        if(!grown) return;
+        b->commands=grown;
+        b->capacity=cap;
+    }
+    b->commands[b->count++]=cmd;
+}
+
 static void push_command(GameCommand cmd){
+    if(t_batch){
+        stage_command(t_batch,cmd);
+        return;
+    }
     if(g_state.command_count>=MAX_COMMANDS){
         scriptsupport_log("ERROR: Command buffer full");
         return;
@@ -58,6 +87,43 @@ void emit_start_timer(const char* n,float d,uint32_t owner){GameCommand c={0};c.
 void emit_stop_timer(const char* n,uint32_t owner){GameCommand c={0};c.type=CMD_STOP_TIMER;c.source_id=owner;strncpy(c.timer.timer_name,n,ENTITY_NAME_LEN-1);push_command(c);}
 void emit_event(EventType t,uint32_t src,uint32_t tgt,uint32_t d){GameCommand c={0};c.type=CMD_EMIT_EVENT;c.source_id=src;c.target_id=tgt;c.event.event_type=t;c.event.data=d;push_command(c);}
 void emit_custom_event(const char* n,uint32_t src,uint32_t tgt,uint32_t d){GameCommand c={0};c.type=CMD_EMIT_EVENT;c.source_id=src;c.target_id=tgt;c.event.event_type=EVENT_CUSTOM;strncpy(c.event.custom_name,n,ENTITY_NAME_LEN-1);c.event.data=d;push_command(c);}
+void script_destroy_self(uint32_t id){emit_destroy(id);}
+
+// Staging
+void scriptsupport_stage_begin(int key){
+    pthread_mutex_lock(&g_stage_lock);
+    if(g_batch_count>=g_batch_capacity){
+        int cap=g_batch_capacity?g_batch_capacity*2:16;
+        StagedBatch** grown=realloc(g_batches,sizeof(StagedBatch*)*cap);
+        if(!grown){pthread_mutex_unlock(&g_stage_lock);return;}
+        memset(grown+g_batch_capacity,0,sizeof(StagedBatch*)*(cap-g_batch_capacity));
+        g_batches=grown;
+        g_batch_capacity=cap;
+    }
+    if(!g_batches[g_batch_count]) g_batches[g_batch_count]=calloc(1,sizeof(StagedBatch));
+    StagedBatch* b=g_batches[g_batch_count];
+    if(b){b->key=key;b->seq=g_batch_count;b->count=0;g_batch_count++;}
+    pthread_mutex_unlock(&g_stage_lock);
+    t_batch=b;
+}
+void scriptsupport_stage_end(void){t_batch=NULL;}
+
+static int compare_batches(const void* a,const void* b){
+    const StagedBatch* x=*(StagedBatch* const*)a;
+    const StagedBatch* y=*(StagedBatch* const*)b;
+    if(x->key!=y->key) return x->key<y->key?-1:1;
+    return x->seq<y->seq?-1:(x->seq>y->seq);
+}
+void scriptsupport_commit_staged(void){
+    // Mismo orden que el bucle secuencial, sea cual sea el número de hilos
+    qsort(g_batches,g_batch_count,sizeof(StagedBatch*),compare_batches);
+    for(int i=0;i<g_batch_count;i++){
+        StagedBatch* b=g_batches[i];
+        for(int k=0;k<b->count;k++) push_command(b->commands[k]);
+        b->count=0;
+    }
+    g_batch_count=0;
+}
 
 // Timers
 bool is_timer_done(const char* name,uint32_t owner){int idx=find_timer_by_name(name,owner);return idx==-1?true:g_state.timers[idx].elapsed>=g_state.timers[idx].duration;}
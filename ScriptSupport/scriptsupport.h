@@ -98,6 +98,13 @@ void emit_start_timer(const char* name, float duration, uint32_t owner_id);
 void emit_stop_timer(const char* name, uint32_t owner_id);
 void emit_event(EventType type, uint32_t source_id, uint32_t target_id, uint32_t data);
 void emit_custom_event(const char* name, uint32_t source_id, uint32_t target_id, uint32_t data);
+void script_destroy_self(uint32_t entity_id);
+
+// Ejecución paralela: lo emitido entre stage_begin y stage_end va a un lote del hilo
+// actual; commit_staged (hilo principal) los publica ordenados por clave (inicio del rango)
+void scriptsupport_stage_begin(int key);
+void scriptsupport_stage_end(void);
+void scriptsupport_commit_staged(void);
 
 void scriptsupport_clear_commands(void);
 int scriptsupport_get_command_count(void);
@@ -0,0 +1,264 @@
+/* This Source Code Form is subject to the terms of the Mozilla Public
+ * License, v. 2.0. If a copy of the MPL was not distributed with this
+ * file, You can obtain one at https://mozilla.org/MPL/2.0/.
+ */
+
+
+#ifndef SIMD_H
+#define SIMD_H
+
+#include <stdbool.h>
+#include <stdint.h>
+#include <stdlib.h>
+#include <string.h>
+#include <math.h>
+
+// Kernels SIMD sobre columnas float de tipos SOA (axpy, axpy con máscara, clamp,
+// longitud, normalizar, reflejar). Cada kernel trabaja sobre n elementos a partir
+// de los punteros recibidos; los wrappers generados por el builder aplican [start, end).
+//
+// La ISA se elige en tiempo de ejecución (simd_init, CPUID): AVX-512F, AVX2, SSE2
+// o escalar. El binario no necesita -march=native para usar AVX2/AVX-512.
+// ENGINE_SIMD=scalar|sse|avx2|avx512 fuerza una ruta (si la CPU la soporta).
+
+// Sin contracción a FMA (ni en los kernels escalares con -march=native): todas las
+// rutas hacen las mismas operaciones con el mismo redondeo
+#pragma GCC push_options
+#pragma GCC optimize("fp-contract=off")
+
+// Componentes máximos de un tipo SOA en length/normalize/reflect
+#define SIMD_MAX_COMPS 8
+
+typedef struct {
+    const char* isa;
+    void (*axpy)(float* y, const float* x, float a, int n);
+    void (*masked_axpy)(float* y, const float* x, float a, const bool* mask, int n);
+    void (*clamp)(float* y, float lo, float hi, int n);
+    void (*length)(float* out, const float* const* c, int k, int n);
+    void (*normalize)(float* const* c, int k, int n);
+    void (*reflect)(float* const* c, const float* normal, int k, int n);
+} SimdKernels;
+
+// ========== Escalar (referencia y cola de las rutas vectoriales) ==========
+
+static void simd_axpy_scalar(float* y, const float* x, float a, int n) {
+    for (int i = 0; i < n; i++) y[i] = y[i] + a * x[i];
+}
+
+static void simd_masked_axpy_scalar(float* y, const float* x, float a, const bool* mask, int n) {
+    for (int i = 0; i < n; i++) if (mask[i]) y[i] = y[i] + a * x[i];
+}
+
+// Misma semántica que maxps/minps (incluido NaN) para que todas las rutas coincidan
+static void simd_clamp_scalar(float* y, float lo, float hi, int n) {
+    for (int i = 0; i < n; i++) {
+        const float t = y[i] > lo ? y[i] : lo;
+        y[i] = t < hi ? t : hi;
+    }
+}
+
+static void simd_length_scalar(float* out, const float* const* c, int k, int n) {
+    for (int i = 0; i < n; i++) {
+        float sum = c[0][i] * c[0][i];
+        for (int j = 1; j < k; j++) sum = sum + c[j][i] * c[j][i];
+        out[i] = sqrtf(sum);
+    }
+}
+
+static void simd_normalize_scalar(float* const* c, int k, int n) {
+    for (int i = 0; i < n; i++) {
+        float sum = c[0][i] * c[0][i];
+        for (int j = 1; j < k; j++) sum = sum + c[j][i] * c[j][i];
+        const float len = sqrtf(sum);
+        if (!(len > 0.0f)) continue;
+        const float inv = 1.0f / len;
+        for (int j = 0; j < k; j++) c[j][i] = c[j][i] * inv;
+    }
+}
+
+static void simd_reflect_scalar(float* const* c, const float* normal, int k, int n) {
+    for (int i = 0; i < n; i++) {
+        float d = c[0][i] * normal[0];
+        for (int j = 1; j < k; j++) d = d + c[j][i] * normal[j];
+        const float f = 2.0f * d;
+        for (int j = 0; j < k; j++) c[j][i] = c[j][i] - f * normal[j];
+    }
+}
+
+static SimdKernels g_simd = {
+    "scalar", simd_axpy_scalar, simd_masked_axpy_scalar, simd_clamp_scalar,
+    simd_length_scalar, simd_normalize_scalar, simd_reflect_scalar
+};
+
+#if defined(__x86_64__) && defined(__GNUC__) && !defined(__clang__)
+#define SIMD_HAS_X86 1
+#include <immintrin.h>
+
+// ========== SSE2 (siempre disponible en x86-64) ==========
+#define SIMD_FN(name) simd_##name##_sse
+#define V __m128
+#define VW 4
+#define VLOAD _mm_loadu_ps
+#define VSTORE _mm_storeu_ps
+#define VSET1 _mm_set1_ps
+#define VADD _mm_add_ps
+#define VSUB _mm_sub_ps
+#define VMUL _mm_mul_ps
+#define VDIV _mm_div_ps
+#define VMIN _mm_min_ps
+#define VMAX _mm_max_ps
+#define VSQRT _mm_sqrt_ps
+#define M __m128
+#define MGT _mm_cmpgt_ps
+#define VBLEND(m, a, b) _mm_or_ps(_mm_and_ps((m), (a)), _mm_andnot_ps((m), (b)))
+static inline __m128 simd_mask_sse(const bool* p) {
+    int32_t bits;
+    memcpy(&bits, p, sizeof(bits));
+    const __m128i zero = _mm_setzero_si128();
+    __m128i b = _mm_unpacklo_epi8(_mm_cvtsi32_si128(bits), zero);
+    b = _mm_unpacklo_epi16(b, zero);
+    return _mm_castsi128_ps(_mm_cmpgt_epi32(b, zero));
+}
+#define MLOAD simd_mask_sse
+#include "simd_impl.h"
+#undef SIMD_FN
+#undef V
+#undef VW
+#undef VLOAD
+#undef VSTORE
+#undef VSET1
+#undef VADD
+#undef VSUB
+#undef VMUL
+#undef VDIV
+#undef VMIN
+#undef VMAX
+#undef VSQRT
+#undef M
+#undef MGT
+#undef VBLEND
+#undef MLOAD
+
+// ========== AVX2 ==========
+#pragma GCC push_options
+#pragma GCC target("avx2")
+#define SIMD_FN(name) simd_##name##_avx2
+#define V __m256
+#define VW 8
+#define VLOAD _mm256_loadu_ps
+#define VSTORE _mm256_storeu_ps
+#define VSET1 _mm256_set1_ps
+#define VADD _mm256_add_ps
+#define VSUB _mm256_sub_ps
+#define VMUL _mm256_mul_ps
+#define VDIV _mm256_div_ps
+#define VMIN _mm256_min_ps
+#define VMAX _mm256_max_ps
+#define VSQRT _mm256_sqrt_ps
+#define M __m256
+#define MGT(a, b) _mm256_cmp_ps((a), (b), _CMP_GT_OQ)
+#define VBLEND(m, a, b) _mm256_blendv_ps((b), (a), (m))
+static inline __m256 simd_mask_avx2(const bool* p) {
+    const __m256i w = _mm256_cvtepu8_epi32(_mm_loadl_epi64((const __m128i*)p));
+    return _mm256_castsi256_ps(_mm256_cmpgt_epi32(w, _mm256_setzero_si256()));
+}
+#define MLOAD simd_mask_avx2
+#include "simd_impl.h"
+#undef SIMD_FN
+#undef V
+#undef VW
+#undef VLOAD
+#undef VSTORE
+#undef VSET1
+#undef VADD
+#undef VSUB
+#undef VMUL
+#undef VDIV
+#undef VMIN
+#undef VMAX
+#undef VSQRT
+#undef M
+#undef MGT
+#undef VBLEND
+#undef MLOAD
+#pragma GCC pop_options
+
+// ========== AVX-512F ==========
+#pragma GCC push_options
+#pragma GCC target("avx512f")
+#define SIMD_FN(name) simd_##name##_avx512
+#define V __m512
+#define VW 16
+#define VLOAD _mm512_loadu_ps
+#define VSTORE _mm512_storeu_ps
+#define VSET1 _mm512_set1_ps
+#define VADD _mm512_add_ps
+#define VSUB _mm512_sub_ps
+#define VMUL _mm512_mul_ps
+#define VDIV _mm512_div_ps
+#define VMIN _mm512_min_ps
+#define VMAX _mm512_max_ps
+#define VSQRT _mm512_sqrt_ps
+#define M __mmask16
+#define MGT(a, b) _mm512_cmp_ps_mask((a), (b), _CMP_GT_OQ)
+#define VBLEND(m, a, b) _mm512_mask_blend_ps((m), (b), (a))
+static inline __mmask16 simd_mask_avx512(const bool* p) {
+    const __m512i w = _mm512_cvtepu8_epi32(_mm_loadu_si128((const __m128i*)p));
+    return _mm512_test_epi32_mask(w, w);
+}
+#define MLOAD simd_mask_avx512
+#include "simd_impl.h"
+#undef SIMD_FN
+#undef V
+#undef VW
+#undef VLOAD
+#undef VSTORE
+#undef VSET1
+#undef VADD
+#undef VSUB
+#undef VMUL
+#undef VDIV
+#undef VMIN
+#undef VMAX
+#undef VSQRT
+#undef M
+#undef MGT
+#undef VBLEND
+#undef MLOAD
+#pragma GCC pop_options
+#endif
+
+// Elige la ISA una vez al arrancar; sin llamarla se usan los kernels escalares
+static inline const char* simd_init(void) {
+#ifdef SIMD_HAS_X86
+    static const SimdKernels sse = {
+        "sse", simd_axpy_sse, simd_masked_axpy_sse, simd_clamp_sse,
+        simd_length_sse, simd_normalize_sse, simd_reflect_sse
+    };
+    static const SimdKernels avx2 = {
+        "avx2", simd_axpy_avx2, simd_masked_axpy_avx2, simd_clamp_avx2,
+        simd_length_avx2, simd_normalize_avx2, simd_reflect_avx2
+    };
+    static const SimdKernels avx512 = {
+        "avx512", simd_axpy_avx512, simd_masked_axpy_avx512, simd_clamp_avx512,
+        simd_length_avx512, simd_normalize_avx512, simd_reflect_avx512
+    };
+
+    __builtin_cpu_init();
+    const bool has_avx2 = __builtin_cpu_supports("avx2");
+    const bool has_avx512 = __builtin_cpu_supports("avx512f");
+    const char* force = getenv("ENGINE_SIMD");
+
+    if (force && strcmp(force, "scalar") == 0) return g_simd.isa;
+    if (force && strcmp(force, "sse") == 0) g_simd = sse;
+    else if (force && strcmp(force, "avx2") == 0 && has_avx2) g_simd = avx2;
+    else if (has_avx512 && (!force || strcmp(force, "avx512") == 0)) g_simd = avx512;
+    else if (has_avx2) g_simd = avx2;
+    else g_simd = sse;
+#endif
+    return g_simd.isa;
+}
+
+#pragma GCC pop_options
+
+#endif
@@ -0,0 +1,95 @@
+/* This Source Code Form is subject to the terms of the Mozilla Public
+ * License, v. 2.0. If a copy of the MPL was not distributed with this
+ * file, You can obtain one at https://mozilla.org/MPL/2.0/.
+ */
+
+
+// Cuerpo de los kernels, incluido una vez por ISA desde simd.h con las macros
+// SIMD_FN, V, VW, VLOAD, VSTORE, VSET1, VADD, VSUB, VMUL, VDIV, VMIN, VMAX,
+// VSQRT, M, MLOAD, MGT y VBLEND definidas. Sin include guard a propósito.
+//
+// Sin FMA: mismas operaciones y en el mismo orden que los kernels escalares, así
+// que todas las ISA producen exactamente el mismo resultado. La cola (< VW
+// elementos) la hace el kernel escalar.
+
+static void SIMD_FN(axpy)(float* y, const float* x, float a, int n) {
+    const V va = VSET1(a);
+    int i = 0;
+    for (; i + VW <= n; i += VW)
+        VSTORE(y + i, VADD(VLOAD(y + i), VMUL(va, VLOAD(x + i))));
+    simd_axpy_scalar(y + i, x + i, a, n - i);
+}
+
+static void SIMD_FN(masked_axpy)(float* y, const float* x, float a, const bool* mask, int n) {
+    const V va = VSET1(a);
+    int i = 0;
+    for (; i + VW <= n; i += VW) {
+        const V old = VLOAD(y + i);
+        VSTORE(y + i, VBLEND(MLOAD(mask + i), VADD(old, VMUL(va, VLOAD(x + i))), old));
+    }
+    simd_masked_axpy_scalar(y + i, x + i, a, mask + i, n - i);
+}
+
+static void SIMD_FN(clamp)(float* y, float lo, float hi, int n) {
+    const V vlo = VSET1(lo), vhi = VSET1(hi);
+    int i = 0;
+    for (; i + VW <= n; i += VW)
+        VSTORE(y + i, VMIN(VMAX(VLOAD(y + i), vlo), vhi));
+    simd_clamp_scalar(y + i, lo, hi, n - i);
+}
+
+static void SIMD_FN(length)(float* out, const float* const* c, int k, int n) {
+    int i = 0;
+    for (; i + VW <= n; i += VW) {
+        V v = VLOAD(c[0] + i);
+        V sum = VMUL(v, v);
+        for (int j = 1; j < k; j++) {
+            v = VLOAD(c[j] + i);
+            sum = VADD(sum, VMUL(v, v));
+        }
+        VSTORE(out + i, VSQRT(sum));
+    }
+    const float* tail[SIMD_MAX_COMPS];
+    for (int j = 0; j < k; j++) tail[j] = c[j] + i;
+    simd_length_scalar(out + i, tail, k, n - i);
+}
+
+static void SIMD_FN(normalize)(float* const* c, int k, int n) {
+    const V zero = VSET1(0.0f), one = VSET1(1.0f);
+    int i = 0;
+    for (; i + VW <= n; i += VW) {
+        V v = VLOAD(c[0] + i);
+        V sum = VMUL(v, v);
+        for (int j = 1; j < k; j++) {
+            v = VLOAD(c[j] + i);
+            sum = VADD(sum, VMUL(v, v));
+        }
+        const V len = VSQRT(sum);
+        const M nonzero = MGT(len, zero);
+        const V inv = VDIV(one, len);
+        for (int j = 0; j < k; j++) {
+            v = VLOAD(c[j] + i);
+            VSTORE(c[j] + i, VBLEND(nonzero, VMUL(v, inv), v));
+        }
+    }
+    float* tail[SIMD_MAX_COMPS];
+    for (int j = 0; j < k; j++) tail[j] = c[j] + i;
+    simd_normalize_scalar(tail, k, n - i);
+}
+
+static void SIMD_FN(reflect)(float* const* c, const float* normal, int k, int n) {
+    V vn[SIMD_MAX_COMPS];
+    for (int j = 0; j < k; j++) vn[j] = VSET1(normal[j]);
+    const V two = VSET1(2.0f);
+    int i = 0;
+    for (; i + VW <= n; i += VW) {
+        V d = VMUL(VLOAD(c[0] + i), vn[0]);
+        for (int j = 1; j < k; j++) d = VADD(d, VMUL(VLOAD(c[j] + i), vn[j]));
+        const V f = VMUL(two, d);
+        for (int j = 0; j < k; j++)
+            VSTORE(c[j] + i, VSUB(VLOAD(c[j] + i), VMUL(f, vn[j])));
+    }
+    float* tail[SIMD_MAX_COMPS];
+    for (int j = 0; j < k; j++) tail[j] = c[j] + i;
+    simd_reflect_scalar(tail, normal, k, n - i);
+}
@@ -0,0 +1,85 @@
+/* This Source Code Form is subject to the terms of the Mozilla Public
+ * License, v. 2.0. If a copy of the MPL was not distributed with this
+ * file, You can obtain one at https://mozilla.org/MPL/2.0/.
+ */
+
+
+#ifndef CLOCK_H
+#define CLOCK_H
+
+#include <stdint.h>
+#include <time.h>
+
+#if defined(__x86_64__) || defined(__i386__)
+#include <cpuid.h>
+#include <x86intrin.h>
+#define CLOCK_HAS_TSC 1
+#endif
+
+// Reloj monotónico en nanosegundos (no retrocede con ajustes de hora)
+static inline uint64_t clock_now_ns(void) {
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return (uint64_t)ts.tv_sec * 1000000000ull + (uint64_t)ts.tv_nsec;
+}
+
+static inline double clock_ns_to_ms(uint64_t ns) {
+    return (double)ns / 1e6;
+}
+
+// TSC calibrado contra CLOCK_MONOTONIC: lectura sin syscall ni vDSO.
+// Solo se usa si el TSC es invariante (no cambia con la frecuencia ni el estado de la CPU).
+typedef struct {
+    uint64_t tsc0;
+    uint64_t ns0;
+    double ns_per_tick;
+    int valid;
+} ClockTsc;
+
+static inline void clock_tsc_calibrate(ClockTsc* c, uint64_t window_ns) {
+    c->valid = 0;
+#ifdef CLOCK_HAS_TSC
+    unsigned int eax, ebx, ecx, edx;
+    if (!__get_cpuid(0x80000007, &eax, &ebx, &ecx, &edx) || !(edx & (1u << 8))) return;
+
+    uint64_t ns_start = clock_now_ns();
+    uint64_t tsc_start = __rdtsc();
+    uint64_t ns_end;
+    do { ns_end = clock_now_ns(); } while (ns_end - ns_start < window_ns);
+    uint64_t tsc_end = __rdtsc();
+    if (tsc_end <= tsc_start) return;
+
+    c->ns_per_tick = (double)(ns_end - ns_start) / (double)(tsc_end - tsc_start);
+    c->tsc0 = tsc_end;
+    c->ns0 = ns_end;
+    c->valid = 1;
+#else
+    (void)window_ns;
+#endif
+}
+
+static inline uint64_t clock_tsc_now_ns(const ClockTsc* c) {
+#ifdef CLOCK_HAS_TSC
+    if (c->valid) return c->ns0 + (uint64_t)((double)(__rdtsc() - c->tsc0) * c->ns_per_tick);
+#endif
+    (void)c;
+    return clock_now_ns();
+}
+
+// Espera híbrida: duerme hasta spin_ns antes del objetivo y termina con espera activa
+// (nanosleep puede despertar con ~0.1-1 ms de retraso)
+static inline void clock_wait_until_ns(uint64_t target_ns, uint64_t spin_ns) {
+    uint64_t now = clock_now_ns();
+    if (now + spin_ns < target_ns) {
+        uint64_t sleep_ns = target_ns - spin_ns - now;
+        struct timespec ts = { (time_t)(sleep_ns / 1000000000ull), (long)(sleep_ns % 1000000000ull) };
+        nanosleep(&ts, NULL);
+    }
+    while (clock_now_ns() < target_ns) {
+#ifdef CLOCK_HAS_TSC
+        _mm_pause();
+#endif
+    }
+}
+
+#endif
@@ -0,0 +1,70 @@
+/* This Source Code Form is subject to the terms of the Mozilla Public
+ * License, v. 2.0. If a copy of the MPL was not distributed with this
+ * file, You can obtain one at https://mozilla.org/MPL/2.0/.
+ */
+
+
+#ifndef FRAME_TIMER_H
+#define FRAME_TIMER_H
+
+#include "clock.h"
+
+// Máximo de pasos fijos por frame: si la simulación no da abasto se descarta
+// el tiempo sobrante en lugar de entrar en espiral
+#ifndef FRAME_TIMER_MAX_STEPS
+#define FRAME_TIMER_MAX_STEPS 8
+#endif
+
+#define FRAME_TIMER_SPIN_NS 1000000ull
+
+typedef struct {
+    ClockTsc tsc;
+    uint64_t start_ns;
+    uint64_t frame_start_ns;
+    uint64_t target_frame_ns;  // 0 = sin limitador
+    double fixed_dt;           // 0 = paso variable
+    double accumulator;
+} FrameTimer;
+
+static inline void frame_timer_init(FrameTimer* t, double fixed_dt, int target_fps) {
+    clock_tsc_calibrate(&t->tsc, 5000000ull);
+    t->start_ns = clock_tsc_now_ns(&t->tsc);
+    t->frame_start_ns = t->start_ns;
+    t->target_frame_ns = target_fps > 0 ? 1000000000ull / (uint64_t)target_fps : 0;
+    t->fixed_dt = fixed_dt;
+    t->accumulator = 0.0;
+}
+
+// Inicio de frame: devuelve el tiempo real transcurrido desde el frame anterior (s)
+static inline double frame_timer_begin(FrameTimer* t, uint64_t* frame_start_ns, uint64_t* frame_time_ns) {
+    uint64_t now = clock_tsc_now_ns(&t->tsc);
+    uint64_t elapsed = now - t->frame_start_ns;
+    t->frame_start_ns = now;
+    *frame_start_ns = now - t->start_ns;
+    *frame_time_ns = elapsed;
+    return (double)elapsed / 1e9;
+}
+
+// Paso fijo: acumula el tiempo real y devuelve cuántos pasos de fixed_dt toca simular
+static inline int frame_timer_steps(FrameTimer* t, double real_dt) {
+    t->accumulator += real_dt;
+    int steps = (int)(t->accumulator / t->fixed_dt);
+    if (steps > FRAME_TIMER_MAX_STEPS) {
+        steps = FRAME_TIMER_MAX_STEPS;
+        t->accumulator = 0.0;
+    } else {
+        t->accumulator -= steps * t->fixed_dt;
+    }
+    return steps;
+}
+
+// Limitador: espera hasta completar target_frame_ns desde el inicio del frame
+static inline void frame_timer_limit(const FrameTimer* t) {
+    if (t->target_frame_ns == 0) return;
+    // El objetivo se expresa en el reloj monotónico (el TSC calibrado puede derivar)
+    uint64_t elapsed = clock_tsc_now_ns(&t->tsc) - t->frame_start_ns;
+    if (elapsed >= t->target_frame_ns) return;
+    clock_wait_until_ns(clock_now_ns() + (t->target_frame_ns - elapsed), FRAME_TIMER_SPIN_NS);
+}
+
+#endif
@@ -0,0 +1,94 @@
+/* This Source Code Form is subject to the terms of the Mozilla Public
+ * License, v. 2.0. If a copy of the MPL was not distributed with this
+ * file, You can obtain one at https://mozilla.org/MPL/2.0/.
+ */
+
+
+#include "backend_null.h"
+#include <stdlib.h>
+#include <string.h>
+
+static RenderInstance* null_gpu = NULL;
+static uint32_t null_gpu_capacity = 0;
+static NullBackendStats null_stats;
+static FILE* null_record = NULL;
+
+int backend_null_record_open(const char* path) {
+    null_record = fopen(path, "w");
+    if (!null_record) {
+        fprintf(stderr, "[NULL] No se pudo abrir %s\n", path);
+        return -1;
+    }
+    return 0;
+}
+
+static void null_upload(const SceneData* s, uint32_t first, uint32_t count) {
+    memcpy(&null_gpu[first], &s->instances[first], (size_t)count * sizeof(RenderInstance));
+    const uint32_t last = first + count - 1;
+    if (null_stats.ranges == 0 || first < null_stats.first) null_stats.first = first;
+    if (null_stats.ranges == 0 || last > null_stats.last) null_stats.last = last;
+    null_stats.bytes += (uint64_t)count * sizeof(RenderInstance);
+    null_stats.ranges++;
+}
+
+void backend_null_update_gpu(const SceneData* s, const SceneSyncState* ss) {
+    if (s == NULL) return;
+
+    if (s->count > null_gpu_capacity) {
+        RenderInstance* gpu = (RenderInstance*)realloc(null_gpu, (size_t)s->capacity * sizeof(RenderInstance));
+        if (gpu == NULL) return;
+        null_gpu = gpu;
+        null_gpu_capacity = s->capacity;
+        null_stats.resized = true;
+        null_upload(s, 0, s->capacity);
+        return;
+    }
+
+    if (!ss->dirty) return;
+
+    if (ss->dirty_max >= null_gpu_capacity) return;
+
+    null_upload(s, ss->dirty_min, ss->dirty_max - ss->dirty_min + 1);
+}
+
+void backend_null_draw_instanced(const SceneData* s) {
+    const uint32_t drawn = s ? s->count : 0;
+    null_stats.frames++;
+
+    if (null_record) {
+        if (null_stats.ranges) {
+            fprintf(null_record, "{\"frame\":%llu,\"bytes\":%llu,\"ranges\":%u,\"first\":%u,\"last\":%u,\"resized\":%d,\"drawn\":%u}\n",
+                    (unsigned long long)null_stats.frames, (unsigned long long)null_stats.bytes, null_stats.ranges,
+                    null_stats.first, null_stats.last, null_stats.resized ? 1 : 0, drawn);
+        } else {
+            fprintf(null_record, "{\"frame\":%llu,\"bytes\":0,\"ranges\":0,\"resized\":0,\"drawn\":%u}\n",
+                    (unsigned long long)null_stats.frames, drawn);
+        }
+    }
+
+    null_stats.last_bytes = null_stats.bytes;
+    null_stats.last_ranges = null_stats.ranges;
+    null_stats.total_bytes += null_stats.bytes;
+    null_stats.total_ranges += null_stats.ranges;
+    null_stats.bytes = 0;
+    null_stats.ranges = 0;
+    null_stats.first = 0;
+    null_stats.last = 0;
+    null_stats.resized = false;
+}
+
+const NullBackendStats* backend_null_stats(void) {
+    return &null_stats;
+}
+
+void backend_null_shutdown(void) {
+    const uint64_t frames = null_stats.frames ? null_stats.frames : 1;
+    printf("[NULL] frames=%llu upload_bytes=%llu ranges=%llu bytes_per_frame=%.1f\n",
+           (unsigned long long)null_stats.frames, (unsigned long long)null_stats.total_bytes,
+           (unsigned long long)null_stats.total_ranges, (double)null_stats.total_bytes / (double)frames);
+    if (null_record) fclose(null_record);
+    null_record = NULL;
+    free(null_gpu);
+    null_gpu = NULL;
+    null_gpu_capacity = 0;
+}
@@ -0,0 +1,48 @@
+/* This Source Code Form is subject to the terms of the Mozilla Public
+ * License, v. 2.0. If a copy of the MPL was not distributed with this
+ * file, You can obtain one at https://mozilla.org/MPL/2.0/.
+ */
+
+
+#ifndef BACKEND_NULL_H
+#define BACKEND_NULL_H
+
+#include <stdint.h>
+#include <stdio.h>
+#include "../GraphicSystem/graphics_types.h"
+#include "../GraphicSystem/scene_sync_state.h"
+
+// Backend sin GPU (BACKEND null / BACKEND record): la "GPU" es un buffer en memoria
+// del host. Sigue el mismo camino que backend_raylib (recrear el buffer al crecer,
+// si no subir solo el rango sucio) y cuenta lo que se habría subido.
+// BACKEND record además escribe una línea NDJSON por frame:
+//   {"frame":1,"bytes":17408,"ranges":1,"first":0,"last":255,"resized":1,"drawn":256}
+
+typedef struct {
+    // Frame en curso (se cierra en draw_instanced)
+    uint64_t bytes;
+    uint32_t ranges;
+    uint32_t first, last;   // Rango subido (índices de instancia)
+    bool resized;
+    // Último frame cerrado y totales
+    uint64_t last_bytes;
+    uint32_t last_ranges;
+    uint64_t total_bytes;
+    uint64_t total_ranges;
+    uint64_t frames;
+} NullBackendStats;
+
+int backend_null_record_open(const char* path);
+
+// Copia al buffer del host lo que backend_raylib subiría al VBO
+void backend_null_update_gpu(const SceneData* s, const SceneSyncState* ss);
+
+// Cierra el frame: acumula los contadores y, con record, escribe su línea
+void backend_null_draw_instanced(const SceneData* s);
+
+const NullBackendStats* backend_null_stats(void);
+
+// Resumen final ([NULL] frames=... upload_bytes=...) y cierre del fichero de record
+void backend_null_shutdown(void);
+
+#endif
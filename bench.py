@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+
+# Engine Factory Bench: genera, compila y ejecuta una matriz de specs
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+WORK_DIR = os.path.join(ROOT, ".bench")
+DEFAULT_MATRIX = os.path.join(ROOT, "specs", "bench_matrix.json")
+
+# Directivas CONFIG que controla el bench; las del spec base se sustituyen
+BENCH_CONFIG = ("MAX_THREADS", "PROFILE", "PROFILE_EVERY", "PROFILE_WARMUP", "MAX_FRAMES",
+                "TARGET_FPS", "TRACE", "PERF_COUNTERS", "STATS")
+
+PROFILE_ENTRY = re.compile(r"\[PROFILE\] frame=\d+ name=(\S+) calls=(\d+) .*total_us=([\d.]+)")
+PROFILE_GAUGE = re.compile(r"\[PROFILE\] frame=\d+ gauge=(\S+) last=(-?\d+) mean=([\d.]+)")
+
+def die(msg):
+    print(f"\n[BENCH ERROR] {msg}\n", file=sys.stderr)
+    sys.exit(1)
+
+def parse_cpus(text):
+    # "0-3,6" -> {0, 1, 2, 3, 6}
+    cpus = set()
+    for part in text.split(","):
+        lo, _, hi = part.partition("-")
+        cpus.update(range(int(lo), int(hi or lo) + 1))
+    return cpus
+
+def expand_matrix(matrix):
+    # Producto cartesiano de los ejes; layouts y cflags son diccionarios nombre -> valor
+    axes = matrix["axes"]
+    layouts = axes.get("layout", {"soa": []})
+    cflags = axes.get("cflags", {"O2": "-O2"})
+    for count, threads, layout, flags in itertools.product(
+            axes.get("count", [None]), axes.get("threads", [1]), sorted(layouts), sorted(cflags)):
+        case_id = f"{layout}-{flags}-t{threads}" + (f"-n{count}" if count is not None else "")
+        yield case_id, {"count": count, "threads": threads, "layout": layout, "cflags": flags,
+                        "rewrites": layouts[layout], "flags": cflags[flags]}
+
+def make_spec(base, matrix, params):
+    lines = [l for l in base.splitlines()
+             if not (l.strip().startswith("CONFIG ") and l.split()[1] in BENCH_CONFIG)
+             and not (matrix.get("backend") and l.strip().startswith("BACKEND "))]
+    text = "\n".join(lines) + "\n"
+
+    if params["count"] is not None:
+        entity = matrix.get("entity")
+        pattern = rf"^(GENERIC {re.escape(entity)}\s+count=)\d+" if entity else r"^(GENERIC \w+\s+count=)\d+"
+        text, n = re.subn(pattern, rf"\g<1>{params['count']}", text, count=1, flags=re.M)
+        if n == 0:
+            die(f"El spec base no tiene GENERIC {entity or ''} con count=")
+
+    # Variantes de layout: sustituciones literales sobre el spec base
+    for old, new in params["rewrites"]:
+        if old not in text:
+            die(f"Layout {params['layout']}: '{old}' no aparece en el spec")
+        text = text.replace(old, new)
+
+    frames = matrix["warmup"] + matrix["frames"]
+    config = [f"CONFIG MAX_THREADS {params['threads']}", "CONFIG PROFILE ON",
+              f"CONFIG PROFILE_WARMUP {matrix['warmup']}", f"CONFIG MAX_FRAMES {frames}"]
+    if matrix.get("backend"):
+        config.insert(0, f"BACKEND {matrix['backend']}")
+    return "\n".join(config) + "\n\n" + text
+
+def prepare_workdir(case_dir):
+    # El builder trabaja sobre el directorio actual: cada caso tiene su árbol con enlaces al repo
+    os.makedirs(case_dir, exist_ok=True)
+    for entry in os.listdir(ROOT):
+        src = os.path.join(ROOT, entry)
+        dst = os.path.join(case_dir, entry)
+        if entry.startswith(".") or not os.path.isdir(src) or os.path.lexists(dst):
+            continue
+        os.symlink(src, dst)
+
+def run(cmd, cwd, what):
+    proc = subprocess.run(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    if proc.returncode != 0:
+        die(f"{what} falló ({' '.join(cmd)}):\n{proc.stdout}")
+    return proc.stdout
+
+def parse_profile(output):
+    # Nos quedamos con el último volcado (resumen final tras MAX_FRAMES)
+    entries, gauges = {}, {}
+    for line in output.splitlines():
+        m = PROFILE_ENTRY.match(line)
+        if m:
+            entries[m.group(1)] = (int(m.group(2)), float(m.group(3)))
+            continue
+        m = PROFILE_GAUGE.match(line)
+        if m:
+            gauges[m.group(1)] = float(m.group(3))
+    return entries, gauges
+
+def measure(binary, case_dir, cpus, entity):
+    def pin():
+        if cpus:
+            os.sched_setaffinity(0, cpus)
+
+    proc = subprocess.run([binary], cwd=case_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                          text=True, preexec_fn=pin)
+    if proc.returncode != 0:
+        die(f"{binary} terminó con código {proc.returncode}:\n{proc.stdout[-2000:]}")
+
+    entries, gauges = parse_profile(proc.stdout)
+    if "frame" not in entries or entries["frame"][0] == 0:
+        die(f"{binary}: no hay datos de profiler tras el calentamiento (¿terminó antes?)")
+
+    active = gauges.get(f"{entity}.active") if entity else next(iter(gauges.values()), None)
+    frames, frame_us = entries["frame"]
+    result = {"frames": frames, "fps": frames / (frame_us / 1e6), "frame_us": frame_us / frames,
+              "active_mean": active, "gauges": gauges, "systems": {}}
+    for name, (calls, total_us) in entries.items():
+        if name == "frame" or calls == 0:
+            continue
+        mean_ns = total_us * 1e3 / calls
+        result["systems"][name] = {"calls": calls, "mean_us": mean_ns / 1e3,
+                                   "ns_per_entity": mean_ns / active if active else None}
+    return result
+
+def median_result(runs):
+    # Mediana por métrica entre repeticiones
+    def med(values):
+        values = [v for v in values if v is not None]
+        return statistics.median(values) if values else None
+    out = {k: med([r[k] for r in runs]) for k in ("frames", "fps", "frame_us", "active_mean")}
+    out["gauges"] = {name: med([r["gauges"].get(name) for r in runs]) for name in runs[0]["gauges"]}
+    out["systems"] = {}
+    for name in runs[0]["systems"]:
+        samples = [r["systems"][name] for r in runs if name in r["systems"]]
+        out["systems"][name] = {k: med([s[k] for s in samples]) for k in ("calls", "mean_us", "ns_per_entity")}
+    return out
+
+def compare(results, baseline, threshold, min_us):
+    # Regresión: fps por debajo o tiempo por llamada por encima del umbral relativo.
+    # Los sistemas de menos de min_us por llamada son ruido y no se comparan.
+    # Con BACKEND null/record también cuenta el volumen de subida por frame (gspec.upload_*).
+    regressions = []
+    base_cases = baseline.get("cases", {})
+    for case_id, res in results["cases"].items():
+        base = base_cases.get(case_id)
+        if not base:
+            print(f"[BASELINE] {case_id}: sin referencia")
+            continue
+        delta = res["fps"] / base["fps"] - 1.0
+        print(f"[BASELINE] {case_id}: fps {base['fps']:.1f} -> {res['fps']:.1f} ({delta:+.1%})")
+        if delta < -threshold:
+            regressions.append(f"{case_id} fps {delta:+.1%}")
+        for name, sys_res in res["systems"].items():
+            base_sys = base.get("systems", {}).get(name)
+            if not base_sys or base_sys["mean_us"] < min_us:
+                continue
+            delta = sys_res["mean_us"] / base_sys["mean_us"] - 1.0
+            if delta > threshold:
+                regressions.append(f"{case_id} {name} mean_us {base_sys['mean_us']:.1f} -> {sys_res['mean_us']:.1f} ({delta:+.1%})")
+        for name, value in res.get("gauges", {}).items():
+            base_value = base.get("gauges", {}).get(name)
+            if not name.startswith("gspec.upload") or not base_value or value is None:
+                continue
+            delta = value / base_value - 1.0
+            if delta > threshold:
+                regressions.append(f"{case_id} {name} {base_value:.0f} -> {value:.0f} ({delta:+.1%})")
+    return regressions
+
+def main():
+    ap = argparse.ArgumentParser(description="Genera, compila y ejecuta una matriz de specs y recoge el profiler")
+    ap.add_argument("matrix", nargs="?", default=DEFAULT_MATRIX, help="matriz JSON (por defecto specs/bench_matrix.json)")
+    ap.add_argument("-o", "--output", default="bench_results.json", help="fichero JSON de resultados")
+    ap.add_argument("-b", "--baseline", help="JSON de referencia con el que comparar")
+    ap.add_argument("--save-baseline", action="store_true", help="escribir también los resultados en --baseline")
+    ap.add_argument("-t", "--threshold", type=float, help="umbral de regresión relativo (0.05 = 5%%)")
+    ap.add_argument("-r", "--repeat", type=int, help="repeticiones por caso (se toma la mediana)")
+    ap.add_argument("-k", "--filter", help="solo casos cuyo id contiene este texto")
+    args = ap.parse_args()
+
+    with open(args.matrix) as f:
+        matrix = json.load(f)
+    matrix.setdefault("warmup", 100)
+    matrix.setdefault("frames", 500)
+    repeat = args.repeat or matrix.get("repeat", 1)
+    threshold = args.threshold if args.threshold is not None else matrix.get("threshold", 0.05)
+    cpus = parse_cpus(matrix["cpus"]) if matrix.get("cpus") else None
+    if cpus and not hasattr(os, "sched_setaffinity"):
+        print("[BENCH] Aviso: sched_setaffinity no disponible, se ejecuta sin fijar CPUs")
+        cpus = None
+    elif cpus:
+        cpus &= os.sched_getaffinity(0)
+        if not cpus:
+            die(f"Ninguna CPU de '{matrix['cpus']}' está disponible")
+
+    # Las rutas de la matriz son relativas a la raíz del repo
+    with open(os.path.join(ROOT, matrix["spec"])) as f:
+        base_spec = f.read()
+
+    results = {"meta": {"matrix": os.path.relpath(args.matrix, ROOT), "spec": matrix["spec"],
+                        "warmup": matrix["warmup"], "frames": matrix["frames"], "repeat": repeat,
+                        "cpus": matrix.get("cpus"), "host": platform.node(), "machine": platform.machine(),
+                        "cc": run([matrix.get("cc", "gcc"), "--version"], ROOT, "cc").splitlines()[0],
+                        "date": time.strftime("%Y-%m-%dT%H:%M:%S")},
+               "cases": {}}
+    try:
+        results["meta"]["commit"] = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                                   stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                                   text=True).stdout.strip() or None
+    except OSError:
+        results["meta"]["commit"] = None
+
+    for case_id, params in expand_matrix(matrix):
+        if args.filter and args.filter not in case_id:
+            continue
+        case_dir = os.path.join(WORK_DIR, case_id)
+        prepare_workdir(case_dir)
+        with open(os.path.join(case_dir, "bench.spec"), "w") as f:
+            f.write(make_spec(base_spec, matrix, params))
+
+        builder_cmd = [sys.executable, os.path.join(ROOT, "builder.py"), "bench.spec"]
+        if matrix.get("gspec"):
+            builder_cmd.append(os.path.join(ROOT, matrix["gspec"]))
+        run(builder_cmd, case_dir, "builder.py")
+        # parallel.c es otra unidad de compilación: no ve el #define de main.c
+        cmd = [matrix.get("cc", "gcc"), *params["flags"].split(), f"-DGENERATED_MAX_THREADS={params['threads']}",
+               "main.c", "MultithreadSupport/parallel.c", "-o", "engine", "-lm", "-lpthread"]
+        run(cmd, case_dir, "Compilación")
+
+        runs = [measure(os.path.join(case_dir, "engine"), case_dir, cpus, matrix.get("entity"))
+                for _ in range(repeat)]
+        res = median_result(runs)
+        res["params"] = {k: params[k] for k in ("count", "threads", "layout", "cflags")}
+        results["cases"][case_id] = res
+
+        per_entity = ", ".join(f"{name}={s['ns_per_entity']:.2f}" for name, s in sorted(res["systems"].items())
+                               if s["ns_per_entity"] is not None)
+        print(f"[BENCH] {case_id}: {res['fps']:.1f} fps, {res['frame_us']:.1f} us/frame | ns/entidad: {per_entity}")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=1, sort_keys=True)
+        f.write("\n")
+    print(f"[BENCH] Resultados en {args.output}")
+
+    if args.baseline and args.save_baseline:
+        shutil.copyfile(args.output, args.baseline)
+        print(f"[BENCH] Referencia guardada en {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), threshold, matrix.get("min_us", 1.0))
+        if regressions:
+            print(f"\n[BENCH] {len(regressions)} regresiones (umbral {threshold:.0%}):")
+            for r in regressions:
+                print(f"  - {r}")
+            sys.exit(1)
+        print(f"[BENCH] Sin regresiones (umbral {threshold:.0%})")
+
+if __name__ == "__main__": main()
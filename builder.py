@@ -10,6 +10,7 @@
 import sys
 import os
 import re
+import json
 import configparser
 from collections import OrderedDict
 
@@ -22,16 +23,34 @@ OUT = "main.c"
 MODS = "modules"
 
 gspec_data = {
-    "gcomponent": None,
-    "entity": None,
-    "visibility": None,
-    "transform": None,
-    "color": None
+    "gcomponent": None,   # Nombre del primer gcomponent (None sin GSPEC)
+    "components": []      # Un dict por [gcomponent <Nombre>]: entity, visibility, transform, color, culling
 }
 
 MAX_THREADS = 8
 SOA_TYPES = {}
 SELECTED_BACKEND = "raylib"
+RECORD_FILE = None
+PROFILE = False
+PROFILE_EVERY = 0
+PROFILE_WARMUP = 0
+MAX_FRAMES = 0
+STOP_WHEN = []
+STATS_FILE = None
+STATS_FORMAT = "NDJSON"
+MULTIVERSION_TARGETS = []
+TRACE_FILE = None
+PERF_COUNTERS = False
+FIXED_DT = 0.0
+TARGET_FPS = 0
+SLEEP = []
+REORDER = []
+COMPACT = []
+TRACK = []
+EXPORT = None
+PIPELINE = False
+NUMA = False
+AFFINITY = None  # None, "ON" o lista de CPUs
 
 
 TYPE_MAP = {
@@ -58,6 +77,9 @@ def die(msg):
 def warn(msg):
     print(f"\033[93m[WARN]\033[0m {msg}")
 
+# Secciones de un gcomponent: [<Nombre>.visibility], ... (sin prefijo si es el único)
+GCOMPONENT_SECTIONS = ("visibility", "transform", "color", "culling")
+
 def parse_gspec(gspec_file, entities_data, gspec_output_data):
     if not gspec_file:
         return
@@ -68,77 +90,139 @@ def parse_gspec(gspec_file, entities_data, gspec_output_data):
     except Exception as e:
         die(f"Error al leer el archivo GSPEC '{gspec_file}': {e}")
 
-    if 'gcomponent CubeVisuals' not in config:
-        die("GSPEC Error: Sección '[gcomponent CubeVisuals]' no encontrada.")
-    gcomp_section = config['gcomponent CubeVisuals']
-    gspec_output_data['gcomponent'] = 'CubeVisuals'
+    names = [sec.split(None, 1)[1].strip() for sec in config.sections() if sec.startswith('gcomponent ')]
+    if not names:
+        die("GSPEC Error: No hay ninguna sección '[gcomponent <Nombre>]'.")
+    unprefixed = [k for k in GCOMPONENT_SECTIONS if k in config]
+    if len(names) > 1 and unprefixed:
+        die(f"GSPEC Error: Con varios gcomponents, '[{unprefixed[0]}]' debe llevar el nombre del gcomponent ('[<Nombre>.{unprefixed[0]}]').")
+
+    gspec_output_data['gcomponent'] = names[0]
+    for name in names:
+        if not re.match(r'^[A-Za-z_][A-Za-z0-9_]*$', name):
+            die(f"GSPEC Error: Nombre de gcomponent inválido '{name}' (se usa como identificador C).")
+        sections = {}
+        for kind in GCOMPONENT_SECTIONS:
+            if f"{name}.{kind}" in config:
+                sections[kind] = f"{name}.{kind}"
+            elif len(names) == 1 and kind in config:
+                sections[kind] = kind
+            else:
+                sections[kind] = None
+        gspec_output_data['components'].append(parse_gcomponent(config, name, sections, entities_data))
+
+    for sec in config.sections():
+        prefix = sec.split('.', 1)[0]
+        if '.' in sec and prefix not in names:
+            warn(f"GSPEC Advertencia: Sección '[{sec}]' de un gcomponent no declarado ('{prefix}').")
+
+def parse_gcomponent(config, name, sections, entities_data):
+    gcomp_section = config[f'gcomponent {name}']
+    comp = {"name": name, "entity": None, "visibility": None, "transform": None, "color": None, "culling": None}
 
     entity_name = gcomp_section.get('entity')
     if not entity_name:
-        die("GSPEC Error: 'entity' no especificado en '[gcomponent CubeVisuals]'.")
+        die(f"GSPEC Error: 'entity' no especificado en '[gcomponent {name}]'.")
     if entity_name not in entities_data:
         die(f"GSPEC Error: Entidad '{entity_name}' del GSPEC no definida en el archivo SPEC.")
     if entities_data[entity_name]['kind'] != 'GENERIC':
         die(f"GSPEC Error: La entidad '{entity_name}' debe ser de tipo GENERIC para ser sincronizada con el renderizado instanciado.")
-    gspec_output_data['entity'] = entity_name
+    comp['entity'] = entity_name
 
-    if 'visibility' in config:
-        vis_section = config['visibility']
-        gspec_output_data['visibility'] = {
+    if sections['visibility']:
+        vis_section = config[sections['visibility']]
+        comp['visibility'] = {
             'when': vis_section.get('when'),
             'else': vis_section.get('else')
         }
-        if not gspec_output_data['visibility']['when']:
-            die("GSPEC Error: 'when' no especificado en '[visibility]'.")
-        vis_var = gspec_output_data['visibility']['when']
+        if not comp['visibility']['when']:
+            die(f"GSPEC Error: 'when' no especificado en '[{sections['visibility']}]'.")
+        vis_var = comp['visibility']['when']
         if vis_var not in entities_data[entity_name]['vars']:
             die(f"GSPEC Error: Variable '{entity_name}.{vis_var}' para 'visibility.when' no declarada en la entidad.")
         if entities_data[entity_name]['vars'][vis_var] != 'bool':
             warn(f"GSPEC Advertencia: La variable '{entity_name}.{vis_var}' para 'visibility.when' no es de tipo booleano.")
-        if gspec_output_data['visibility']['else'] not in ['alpha_zero']:
-            warn(f"GSPEC Advertencia: 'else' desconocido '{gspec_output_data['visibility']['else']}' en '[visibility]'. Se espera 'alpha_zero'.")
+        if comp['visibility']['else'] not in ['alpha_zero']:
+            warn(f"GSPEC Advertencia: 'else' desconocido '{comp['visibility']['else']}' en '[{sections['visibility']}]'. Se espera 'alpha_zero'.")
 
-    if 'transform' in config:
-        trans_section = config['transform']
-        gspec_output_data['transform'] = {
+    if sections['transform']:
+        trans_section = config[sections['transform']]
+        comp['transform'] = {
             'update_when': trans_section.get('update_when'),
             'type': trans_section.get('type'),
             'from': trans_section.get('from')
         }
-        if not gspec_output_data['transform']['type']:
-            die("GSPEC Error: 'type' no especificado en '[transform]'.")
-        if not gspec_output_data['transform']['from']:
-            die("GSPEC Error: 'from' no especificado en '[transform]'.")
-        if gspec_output_data['transform']['type'] not in ['translation']:
-            die(f"GSPEC Error: Tipo de transformación desconocido '{gspec_output_data['transform']['type']}'. Se espera 'translation'.")
-
-        if gspec_output_data['transform']['update_when']:
-            update_var = gspec_output_data['transform']['update_when']
+        if not comp['transform']['type']:
+            die(f"GSPEC Error: 'type' no especificado en '[{sections['transform']}]'.")
+        if not comp['transform']['from']:
+            die(f"GSPEC Error: 'from' no especificado en '[{sections['transform']}]'.")
+        if comp['transform']['type'] not in ['translation']:
+            die(f"GSPEC Error: Tipo de transformación desconocido '{comp['transform']['type']}'. Se espera 'translation'.")
+
+        if comp['transform']['update_when']:
+            update_var = comp['transform']['update_when']
             if update_var not in entities_data[entity_name]['vars']:
                 die(f"GSPEC Error: Variable '{entity_name}.{update_var}' para 'transform.update_when' no declarada en la entidad.")
             if entities_data[entity_name]['vars'][update_var] != 'bool':
                 warn(f"GSPEC Advertencia: La variable '{entity_name}.{update_var}' para 'transform.update_when' no es de tipo booleano.")
 
-    if 'color' in config:
-        color_section = config['color']
-        gspec_output_data['color'] = {
+    if sections['color']:
+        color_section = config[sections['color']]
+        comp['color'] = {
             'type': color_section.get('type'),
             'from': color_section.get('from')
         }
-        if not gspec_output_data['color']['type']:
-            warn("GSPEC Advertencia: 'type' no especificado en '[color]'. Asumiendo 'hex_to_rgba'.")
-            gspec_output_data['color']['type'] = 'hex_to_rgba'
-        if not gspec_output_data['color']['from']:
-            die("GSPEC Error: 'from' no especificado en '[color]'.")
-        if gspec_output_data['color']['type'] not in ['hex_to_rgba']:
-            die(f"GSPEC Error: Tipo de color desconocido '{gspec_output_data['color']['type']}'. Se espera 'hex_to_rgba'.")
+        if not comp['color']['type']:
+            warn(f"GSPEC Advertencia: 'type' no especificado en '[{sections['color']}]'. Asumiendo 'hex_to_rgba'.")
+            comp['color']['type'] = 'hex_to_rgba'
+        if not comp['color']['from']:
+            die(f"GSPEC Error: 'from' no especificado en '[{sections['color']}]'.")
+        if comp['color']['type'] not in ['hex_to_rgba']:
+            die(f"GSPEC Error: Tipo de color desconocido '{comp['color']['type']}'. Se espera 'hex_to_rgba'.")
         
-        color_var = gspec_output_data['color']['from']
+        color_var = comp['color']['from']
         if color_var not in entities_data[entity_name]['vars']:
             die(f"GSPEC Error: Variable '{entity_name}.{color_var}' para 'color.from' no declarada en la entidad.")
         if entities_data[entity_name]['vars'][color_var] not in ['int', 'uint', 'uint32']:
             warn(f"GSPEC Advertencia: La variable '{entity_name}.{color_var}' para 'color.from' no es de tipo entero (esperado para hex_to_rgba).")
 
+    if sections['culling']:
+        cull_section = config[sections['culling']]
+        if not comp['transform']:
+            die(f"GSPEC Error: '[{sections['culling']}]' necesita '[transform]' para conocer la posición de cada instancia.")
+        size_var = cull_section.get('size')
+        if not size_var:
+            die(f"GSPEC Error: 'size' no especificado en '[{sections['culling']}]'.")
+        shared = entities_data[entity_name]['shared_vars']
+        size_vars = [f"{size_var}_{c}" for c in ('x', 'y', 'z')]
+        for v in size_vars:
+            if v not in shared:
+                die(f"GSPEC Error: '[{sections['culling']}]' requiere la variable SHARED '{entity_name}.{size_var}' con componentes x, y, z (falta '{v}').")
+
+        def floats(key, default, n):
+            raw = cull_section.get(key, default)
+            try:
+                vals = [float(x) for x in raw.split(',')]
+            except ValueError:
+                die(f"GSPEC Error: Valor no numérico en '[{sections['culling']}]' {key} = {raw}")
+            if len(vals) != n:
+                die(f"GSPEC Error: '[{sections['culling']}]' {key} necesita {n} valor(es), tiene {len(vals)}.")
+            return vals
+
+        # Por defecto, la cámara de GraphicSystem/camera_system.h
+        comp['culling'] = {
+            'size': size_vars,
+            'position': floats('camera_position', '0, 20, 20', 3),
+            'target': floats('camera_target', '0, 0, 0', 3),
+            'up': floats('camera_up', '0, 1, 0', 3),
+            'fovy': floats('fovy', '45', 1)[0],
+            'aspect': floats('aspect', '1.7778', 1)[0],
+            'near': floats('near', '0.01', 1)[0],
+            'far': floats('far', '1000', 1)[0],
+        }
+
+    return comp
+
 # PARSER
 
 entities = {}
@@ -153,7 +237,9 @@ globals = {
 entity_contexts = {}
 
 system_modes = {}
+explicit_modes = set()
 system_priorities = {}
+system_iterate = {}
 
 current_entity = None
 current_phase = None
@@ -180,7 +266,11 @@ with open(SPEC) as f:
             continue
 
         if line.startswith("BACKEND "):
-            SELECTED_BACKEND = line.split()[1].lower()
+            parts = line.split()
+            SELECTED_BACKEND = parts[1].lower()
+            # BACKEND record [fichero]: backend null que además escribe la subida de cada frame
+            if SELECTED_BACKEND == "record":
+                RECORD_FILE = parts[2] if len(parts) > 2 else "record.ndjson"
             continue
 
         if line.startswith("CONFIG "):
@@ -194,6 +284,122 @@ with open(SPEC) as f:
                         MAX_THREADS = int(config_value)
                     except ValueError:
                         die(f"Línea {line_num}: Valor inválido para MAX_THREADS: {config_value}")
+                elif config_key == "PROFILE":
+                    if config_value not in ["ON", "OFF"]:
+                        die(f"Línea {line_num}: PROFILE debe ser ON u OFF")
+                    PROFILE = config_value == "ON"
+                elif config_key == "FIXED_DT":
+                    try:
+                        FIXED_DT = float(config_value.rstrip("fF"))
+                    except ValueError:
+                        die(f"Línea {line_num}: Valor inválido para FIXED_DT: {config_value}")
+                    if FIXED_DT <= 0:
+                        die(f"Línea {line_num}: FIXED_DT debe ser mayor que 0")
+                elif config_key == "TARGET_FPS":
+                    try:
+                        TARGET_FPS = int(config_value)
+                    except ValueError:
+                        die(f"Línea {line_num}: Valor inválido para TARGET_FPS: {config_value}")
+                elif config_key == "PERF_COUNTERS":
+                    if config_value not in ["ON", "OFF"]:
+                        die(f"Línea {line_num}: PERF_COUNTERS debe ser ON u OFF")
+                    PERF_COUNTERS = config_value == "ON"
+                elif config_key == "TRACE":
+                    TRACE_FILE = None if config_value == "OFF" else config_value
+                elif config_key == "PROFILE_EVERY":
+                    try:
+                        PROFILE_EVERY = int(config_value)
+                    except ValueError:
+                        die(f"Línea {line_num}: Valor inválido para PROFILE_EVERY: {config_value}")
+                elif config_key == "MAX_FRAMES":
+                    try:
+                        MAX_FRAMES = int(config_value)
+                    except ValueError:
+                        die(f"Línea {line_num}: Valor inválido para MAX_FRAMES: {config_value}")
+                elif config_key == "STOP_WHEN":
+                    # CONFIG STOP_WHEN Entidad.var <op> <número>
+                    cond = parts[2:]
+                    m = re.match(r'^(\w+)\.(\w+)$', cond[0])
+                    if len(cond) != 3 or not m or cond[1] not in ("==", "!=", "<", "<=", ">", ">=") \
+                            or not re.match(r'^-?\d+(\.\d+)?f?$', cond[2]):
+                        die(f"Línea {line_num}: Sintaxis STOP_WHEN incorrecta. Uso: CONFIG STOP_WHEN <Entidad>.<var> <op> <número>")
+                    STOP_WHEN.append((m.group(1), m.group(2), cond[1], cond[2], line_num))
+                elif config_key == "MULTIVERSION":
+                    # ON = baseline + AVX2 + AVX-512; también admite una lista propia (avx2,arch=znver3)
+                    if config_value == "OFF":
+                        MULTIVERSION_TARGETS = []
+                    elif config_value == "ON":
+                        MULTIVERSION_TARGETS = ["default", "avx2", "avx512f"]
+                    elif re.match(r'^[\w=.+-]+(,[\w=.+-]+)*$', config_value):
+                        MULTIVERSION_TARGETS = ["default"] + [t for t in config_value.split(",") if t != "default"]
+                    else:
+                        die(f"Línea {line_num}: MULTIVERSION debe ser ON, OFF o una lista de targets separada por comas")
+                elif config_key == "STATS":
+                    STATS_FILE = config_value
+                    STATS_FORMAT = parts[3] if len(parts) > 3 else "NDJSON"
+                    if STATS_FORMAT not in ["NDJSON", "BINARY"]:
+                        die(f"Línea {line_num}: Formato de STATS desconocido '{STATS_FORMAT}', debe ser NDJSON o BINARY")
+                elif config_key == "PIPELINE":
+                    if config_value not in ["ON", "OFF"]:
+                        die(f"Línea {line_num}: PIPELINE debe ser ON u OFF")
+                    PIPELINE = config_value == "ON"
+                elif config_key == "NUMA":
+                    if config_value not in ["ON", "OFF"]:
+                        die(f"Línea {line_num}: NUMA debe ser ON u OFF")
+                    NUMA = config_value == "ON"
+                elif config_key == "AFFINITY":
+                    # CONFIG AFFINITY ON | OFF | cpu,cpu,...: worker k fijo a una CPU
+                    if config_value in ["ON", "OFF"]:
+                        AFFINITY = "ON" if config_value == "ON" else None
+                    elif re.match(r'^\d+(,\d+)*$', config_value):
+                        AFFINITY = [int(c) for c in config_value.split(",")]
+                    else:
+                        die(f"Línea {line_num}: AFFINITY debe ser ON, OFF o una lista de CPUs separada por comas")
+                elif config_key == "SLEEP":
+                    # CONFIG SLEEP Entidad.flag: lista de despiertos sobre una variable bool
+                    m = re.match(r'^(\w+)\.(\w+)$', config_value)
+                    if not m:
+                        die(f"Línea {line_num}: Sintaxis SLEEP incorrecta. Uso: CONFIG SLEEP <Entidad>.<flag>")
+                    SLEEP.append((m.group(1), m.group(2), line_num))
+                elif config_key == "REORDER":
+                    # CONFIG REORDER Entidad.posicion N: orden Morton cada N frames
+                    m = re.match(r'^(\w+)\.(\w+)$', config_value)
+                    if not m or len(parts) < 4 or not parts[3].isdigit() or int(parts[3]) <= 0:
+                        die(f"Línea {line_num}: Sintaxis REORDER incorrecta. Uso: CONFIG REORDER <Entidad>.<posicion> <cada_N_frames>")
+                    REORDER.append((m.group(1), m.group(2), int(parts[3]), line_num))
+                elif config_key == "COMPACT":
+                    # CONFIG COMPACT Entidad.flag N: elimina las instancias con el flag a false cada N frames
+                    m = re.match(r'^(\w+)\.(\w+)$', config_value)
+                    if not m or len(parts) < 4 or not parts[3].isdigit() or int(parts[3]) <= 0:
+                        die(f"Línea {line_num}: Sintaxis COMPACT incorrecta. Uso: CONFIG COMPACT <Entidad>.<flag> <cada_N_frames>")
+                    COMPACT.append((m.group(1), m.group(2), int(parts[3]), line_num))
+                elif config_key == "EXPORT":
+                    # CONFIG EXPORT /nombre Entidad.var [Entidad.var ...] [EVERY N]: columnas en memoria compartida
+                    args = parts[3:]
+                    every = 1
+                    if len(args) >= 2 and args[-2] == "EVERY":
+                        if not args[-1].isdigit() or int(args[-1]) <= 0:
+                            die(f"Línea {line_num}: EXPORT: EVERY necesita un número de frames mayor que 0")
+                        every = int(args[-1])
+                        args = args[:-2]
+                    if not re.match(r'^/[\w.-]+$', config_value) or not args \
+                            or not all(re.match(r'^(\w+)\.(\w+)$', a) for a in args):
+                        die(f"Línea {line_num}: Sintaxis EXPORT incorrecta. Uso: CONFIG EXPORT /<nombre> <Entidad>.<var> [<Entidad>.<var> ...] [EVERY <N>]")
+                    if EXPORT:
+                        die(f"Línea {line_num}: Solo se admite un CONFIG EXPORT")
+                    EXPORT = {"name": config_value, "targets": [tuple(a.split(".", 1)) for a in args], "every": every, "line": line_num}
+                elif config_key == "TRACK":
+                    # CONFIG TRACK Entidad.var [Entidad.var ...]: versión por chunk de cada columna
+                    for target in parts[2:]:
+                        m = re.match(r'^(\w+)\.(\w+)$', target)
+                        if not m:
+                            die(f"Línea {line_num}: Sintaxis TRACK incorrecta. Uso: CONFIG TRACK <Entidad>.<var> [<Entidad>.<var> ...]")
+                        TRACK.append((m.group(1), m.group(2), line_num))
+                elif config_key == "PROFILE_WARMUP":
+                    try:
+                        PROFILE_WARMUP = int(config_value)
+                    except ValueError:
+                        die(f"Línea {line_num}: Valor inválido para PROFILE_WARMUP: {config_value}")
             continue
 
         if line.startswith("SYSTEM "):
@@ -222,6 +428,14 @@ with open(SPEC) as f:
             if mode_name not in ["SINGLE", "PARALLEL"]:
                 die(f"Línea {line_num}: Modo desconocido '{mode_name}', debe ser SINGLE o PARALLEL")
             system_modes[current_system] = mode_name
+            explicit_modes.add(current_system)
+            continue
+
+        if line.startswith("ITERATE ") and current_system:
+            parts = line.split()
+            if len(parts) < 2 or parts[1] not in ["ALL", "AWAKE"]:
+                die(f"Línea {line_num}: ITERATE debe ser ALL o AWAKE")
+            system_iterate[current_system] = parts[1]
             continue
 
         if line.startswith("PRIORITY ") and current_system:
@@ -414,6 +628,101 @@ with open(SPEC) as f:
         elif current_system_phase:
             globals[current_system_phase].append(current_system)
 
+def is_zero_val(v):
+    # Valor por defecto que ya deja el memset de init_world
+    v = v.strip()
+    if v in ["0", "0.0", "0.0f", "0.00f", "false", "NULL"]: return True
+    if v.startswith("{") and v.endswith("}"):
+        content = v[1:-1]
+        parts = content.split(",")
+        for p in parts:
+            if not is_zero_val(p): return False
+        return True
+    return False
+
+def profile_id(label):
+    return "PROF_" + re.sub(r'\W', '_', label)
+
+def write_system_call(out, indent, mod, call):
+    # Con CONFIG PROFILE/PERF_COUNTERS/TRACE cada llamada se mide; sin ellos no se genera nada extra
+    if PROFILE:
+        call = f"PROFILE_CALL(g_profiler, {profile_id(mod)}, {call})"
+    if PERF_COUNTERS:
+        call = f"PERF_CALL(g_perf, {profile_id(mod)}, {call})"
+    if TRACE_FILE:
+        out.write(f'{indent}trace_begin("{mod}"); {call}; trace_end();\n')
+    else:
+        out.write(f"{indent}{call};\n")
+
+def write_span_begin(out, indent, label, perf=True):
+    # perf=False en spans que contienen parallel_run: los workers ya suman al sistema
+    if TRACE_FILE:
+        out.write(f'{indent}trace_begin("{label}");\n')
+    if PERF_COUNTERS and perf:
+        out.write(f"{indent}uint64_t _c_{profile_id(label)}[PERF_EVENTS];\n")
+        out.write(f"{indent}perf_begin(&g_perf, {profile_id(label)}, _c_{profile_id(label)});\n")
+    if PROFILE:
+        out.write(f"{indent}const uint64_t _t_{profile_id(label)} = clock_now_ns();\n")
+
+def write_span_end(out, indent, label, perf=True):
+    if PROFILE:
+        out.write(f"{indent}profile_record(&g_profiler, {profile_id(label)}, clock_now_ns() - _t_{profile_id(label)});\n")
+    if PERF_COUNTERS and perf:
+        out.write(f"{indent}perf_end(&g_perf, {profile_id(label)}, _c_{profile_id(label)});\n")
+    if TRACE_FILE:
+        out.write(f"{indent}trace_end();\n")
+
+def write_simd_helpers(out, type_name, comps):
+    # Wrappers por tipo SOA float sobre los kernels de SimdSupport/simd.h, en rango [start, end)
+    t = type_name.lower()
+    k = len(comps)
+    cols = lambda prefix, const="": ", ".join(f"{const}float* {prefix}{c}" for c in comps)
+    offs = lambda prefix: ", ".join(f"{prefix}{c} + start" for c in comps)
+
+    out.write(f"// SIMD {type_name} (SOA float {' '.join(comps)})\n")
+    out.write(f"static inline void {t}_axpy({cols('dst_')}, {cols('src_', 'const ')}, float a, int start, int end) {{\n")
+    out.write("    if (end <= start) return;\n")
+    for c in comps:
+        out.write(f"    g_simd.axpy(dst_{c} + start, src_{c} + start, a, end - start);\n")
+    out.write("}\n")
+    out.write(f"static inline void {t}_masked_axpy({cols('dst_')}, {cols('src_', 'const ')}, float a, const bool* mask, int start, int end) {{\n")
+    out.write("    if (end <= start) return;\n")
+    for c in comps:
+        out.write(f"    g_simd.masked_axpy(dst_{c} + start, src_{c} + start, a, mask + start, end - start);\n")
+    out.write("}\n")
+    out.write(f"static inline void {t}_clamp({cols('')}, float lo, float hi, int start, int end) {{\n")
+    out.write("    if (end <= start) return;\n")
+    for c in comps:
+        out.write(f"    g_simd.clamp({c} + start, lo, hi, end - start);\n")
+    out.write("}\n")
+    out.write(f"static inline void {t}_length(float* out, {cols('', 'const ')}, int start, int end) {{\n")
+    out.write("    if (end <= start) return;\n")
+    out.write(f"    const float* c[{k}] = {{ {offs('')} }};\n")
+    out.write(f"    g_simd.length(out + start, c, {k}, end - start);\n")
+    out.write("}\n")
+    out.write(f"static inline void {t}_normalize({cols('')}, int start, int end) {{\n")
+    out.write("    if (end <= start) return;\n")
+    out.write(f"    float* c[{k}] = {{ {offs('')} }};\n")
+    out.write(f"    g_simd.normalize(c, {k}, end - start);\n")
+    out.write("}\n")
+    normal = ", ".join(f"float n{c}" for c in comps)
+    out.write(f"static inline void {t}_reflect({cols('')}, {normal}, int start, int end) {{\n")
+    out.write("    if (end <= start) return;\n")
+    out.write(f"    float* c[{k}] = {{ {offs('')} }};\n")
+    out.write(f"    const float normal[{k}] = {{ {', '.join(f'n{c}' for c in comps)} }};\n")
+    out.write(f"    g_simd.reflect(c, normal, {k}, end - start);\n")
+    out.write("}\n\n")
+
+class IndentedOut:
+    """Añade un nivel de sangría a lo escrito (cuerpo del bucle de paso fijo)."""
+
+    def __init__(self, out, prefix="    "):
+        self.out = out
+        self.prefix = prefix
+
+    def write(self, text):
+        self.out.write(re.sub(r'(?m)^(?=.)', self.prefix, text))
+
 def sort_systems_by_priority(sys_list):
     return sorted(sys_list, key=lambda x: system_priorities.get(x, 100))
 
@@ -470,14 +779,177 @@ if GSPEC:
 if "World" not in entities:
     die("Debe existir la entidad UNIQUE World")
 
+# Backends cuyo contexto gráfico pertenece al hilo que abrió la ventana (OpenGL)
+THREAD_BOUND_BACKENDS = ("raylib",)
+
+# Fichero del backend (backend/backend_<fuente>.c/.h): record es el backend null con registro
+BACKEND_SOURCE = {"record": "null"}.get(SELECTED_BACKEND, SELECTED_BACKEND)
+
+def backend_calls(world, scene, sync):
+    # (subida, dibujo) para el backend elegido; world es "w." o "w->"
+    if BACKEND_SOURCE == "null":
+        return (f"backend_null_update_gpu({scene}, {sync})", f"backend_null_draw_instanced({scene})")
+    return (f"backend_{BACKEND_SOURCE}_update_gpu(&{world}world.vbo_id, {scene}, {sync})",
+            f"backend_{BACKEND_SOURCE}_draw_instanced({world}world.cube_model, {scene})")
+if PIPELINE:
+    if not (GSPEC and gspec_data['gcomponent'] and SELECTED_BACKEND != "manual"):
+        die("CONFIG PIPELINE requiere un GSPEC y un backend (no BACKEND manual)")
+    if SELECTED_BACKEND in THREAD_BOUND_BACKENDS:
+        die(f"CONFIG PIPELINE: el backend '{SELECTED_BACKEND}' solo puede subir y dibujar desde el hilo que creó el contexto, "
+            "no desde el hilo de render")
+
+# CONFIG NUMA: los tramos fijos por worker solo sirven con los workers fijos a una CPU
+if NUMA and AFFINITY is None:
+    AFFINITY = "ON"
+
+def parallel_call(world, fn, count, entity=None):
+    # parallel_run sobre [0, count); con CONFIG NUMA y un rango de índices de entity,
+    # cada worker recibe siempre el mismo tramo de su capacidad
+    if NUMA and entity:
+        return f"parallel_run_owned({world}, (SystemRangeFn){fn}, {count}, {entities[entity]['count']})"
+    return f"parallel_run({world}, (SystemRangeFn){fn}, {count})"
+
+# CONFIG SLEEP: la entidad mantiene la lista de instancias con el flag a true
+for ent_name, flag, line_num in SLEEP:
+    if ent_name not in entities or entities[ent_name]["kind"] != "GENERIC":
+        die(f"Línea {line_num}: SLEEP requiere una entidad GENERIC, '{ent_name}' no lo es")
+    if flag not in entities[ent_name]["vars"] or entities[ent_name]["vars"][flag]["type"] != "bool":
+        die(f"Línea {line_num}: SLEEP requiere la variable bool '{ent_name}.{flag}' declarada en la entidad")
+    if "sleep" in entities[ent_name]:
+        die(f"Línea {line_num}: {ent_name} ya tiene CONFIG SLEEP")
+    entities[ent_name]["sleep"] = flag
+
+# CONFIG REORDER: orden Morton de las columnas por <pos>_x/_y/_z, con tabla de handles
+for ent_name, pos, every, line_num in REORDER:
+    if ent_name not in entities or entities[ent_name]["kind"] != "GENERIC":
+        die(f"Línea {line_num}: REORDER requiere una entidad GENERIC, '{ent_name}' no lo es")
+    for c in ("x", "y", "z"):
+        info = entities[ent_name]["vars"].get(f"{pos}_{c}")
+        if not info or info["type"] != "float":
+            die(f"Línea {line_num}: REORDER requiere la variable float '{ent_name}.{pos}_{c}' (p. ej. un SOA Vector3)")
+    if "reorder" in entities[ent_name]:
+        die(f"Línea {line_num}: {ent_name} ya tiene CONFIG REORDER")
+    entities[ent_name]["reorder"] = {"pos": pos, "every": every}
+
+# CONFIG COMPACT: <entidad>_compact cada N frames con las instancias que tienen el flag a true
+for ent_name, flag, every, line_num in COMPACT:
+    if ent_name not in entities or entities[ent_name]["kind"] != "GENERIC":
+        die(f"Línea {line_num}: COMPACT requiere una entidad GENERIC, '{ent_name}' no lo es")
+    if flag not in entities[ent_name]["vars"] or entities[ent_name]["vars"][flag]["type"] != "bool":
+        die(f"Línea {line_num}: COMPACT requiere la variable bool '{ent_name}.{flag}' declarada en la entidad")
+    if "compact" in entities[ent_name]:
+        die(f"Línea {line_num}: {ent_name} ya tiene CONFIG COMPACT")
+    entities[ent_name]["compact"] = {"flag": flag, "every": every}
+
+# CONFIG TRACK: columnas con versión por chunk; un SOA se sigue componente a componente
+for ent_name, var, line_num in TRACK:
+    if ent_name not in entities or entities[ent_name]["kind"] != "GENERIC":
+        die(f"Línea {line_num}: TRACK requiere una entidad GENERIC, '{ent_name}' no lo es")
+    e = entities[ent_name]
+    if var in e["vars"]:
+        columns = [var]
+    elif var in e["_original_vars"] and e["_original_vars"][var]["type"] in SOA_TYPES:
+        columns = [f"{var}_{c}" for c in SOA_TYPES[e["_original_vars"][var]["type"]]["comps"]]
+    else:
+        die(f"Línea {line_num}: TRACK: variable '{ent_name}.{var}' no declarada en la entidad")
+    tracked = e.setdefault("tracked", [])
+    tracked.extend(c for c in columns if c not in tracked)
+
+# CONFIG EXPORT: columnas GENERIC copiadas cada frame a un slot de la memoria compartida.
+# El descriptor JSON (<nombre>.layout.json, junto a main.c) da los offsets dentro del slot
+EXPORT_DTYPES = {
+    "float": ("float32", 4), "double": ("float64", 8), "bool": ("bool", 1),
+    "int": ("int32", 4), "uint": ("uint32", 4),
+    "int8": ("int8", 1), "uint8": ("uint8", 1), "int16": ("int16", 2), "uint16": ("uint16", 2),
+    "int32": ("int32", 4), "uint32": ("uint32", 4), "int64": ("int64", 8), "uint64": ("uint64", 8),
+}
+export_layout = None
+if EXPORT:
+    line_num = EXPORT["line"]
+    export_columns = []
+    for ent_name, var in EXPORT["targets"]:
+        if ent_name not in entities or entities[ent_name]["kind"] != "GENERIC":
+            die(f"Línea {line_num}: EXPORT requiere columnas de entidades GENERIC, '{ent_name}' no lo es")
+        e = entities[ent_name]
+        if var in e["vars"]:
+            cols = [var]
+        elif var in e["_original_vars"] and e["_original_vars"][var]["type"] in SOA_TYPES:
+            cols = [f"{var}_{c}" for c in SOA_TYPES[e["_original_vars"][var]["type"]]["comps"]]
+        else:
+            die(f"Línea {line_num}: EXPORT: variable '{ent_name}.{var}' no declarada en la entidad")
+        for col in cols:
+            if e["vars"][col]["type"] not in EXPORT_DTYPES:
+                die(f"Línea {line_num}: EXPORT: '{ent_name}.{col}' es de tipo {e['vars'][col]['type']}, solo se exportan tipos numéricos y bool")
+            if (ent_name, col) not in export_columns:
+                export_columns.append((ent_name, col))
+
+    def align(n, a):
+        return (n + a - 1) // a * a
+
+    # Slot: cabecera de 64 bytes, _active de cada entidad (int64) y columnas alineadas a 64
+    offset = 64
+    layout_entities = OrderedDict()
+    for ent_name, _ in export_columns:
+        if ent_name not in layout_entities:
+            layout_entities[ent_name] = {"capacity": entities[ent_name]["count"], "active_offset": offset}
+            offset += 8
+    layout_columns = []
+    for ent_name, col in export_columns:
+        dtype, size = EXPORT_DTYPES[entities[ent_name]["vars"][col]["type"]]
+        offset = align(offset, 64)
+        layout_columns.append({"name": f"{ent_name}.{col}", "entity": ent_name, "column": col,
+                               "dtype": dtype, "itemsize": size, "offset": offset})
+        offset += size * entities[ent_name]["count"]
+    export_layout = {
+        "shm": EXPORT["name"], "version": 1, "slots": 2, "every": EXPORT["every"],
+        "data_offset": 4096, "slot_bytes": align(offset, 4096), "slot_header_bytes": 64,
+        "entities": layout_entities, "columns": layout_columns,
+    }
+    # FNV-1a de 64 bits del descriptor: el lector no acepta una región con otro layout
+    layout_hash = 0xcbf29ce484222325
+    for byte in json.dumps(export_layout, sort_keys=True).encode():
+        layout_hash = ((layout_hash ^ byte) * 0x100000001b3) & 0xFFFFFFFFFFFFFFFF
+    export_layout["layout_hash"] = f"{layout_hash:016x}"
+
+# GSPEC sin [culling]: el sync se salta los chunks sin cambios si todas las columnas que lee
+# tienen CONFIG TRACK (con update_when = flag de SLEEP la traslación va por la lista de despiertos)
+for comp in (gspec_data['components'] if GSPEC and gspec_data['gcomponent'] else []):
+    e = entities[comp['entity']]
+    comp['track'] = False
+    if "tracked" not in e or comp['culling']: continue
+    sources = [comp['visibility']['when']] if comp['visibility'] else []
+    if comp['transform'] and not ("sleep" in e and comp['transform'].get('update_when') == e["sleep"]):
+        sources += [f"{f.strip().split('.')[0]}_{f.strip().split('.')[1]}" for f in comp['transform']['from'].split(',')[:3]]
+        if comp['transform'].get('update_when'):
+            sources.append(comp['transform']['update_when'])
+    if comp['color']:
+        sources.append(comp['color']['from'])
+    untracked = [c for c in sources if c not in e["tracked"]]
+    if untracked:
+        cols = ", ".join(f"{comp['entity']}.{c}" for c in untracked)
+        warn(f"GSPEC {comp['name']}: {cols} sin CONFIG TRACK, el sync recorre todas las instancias")
+    else:
+        comp['track'] = True
+        comp['track_sources'] = list(dict.fromkeys(sources))
+
 REQ_PATTERN = re.compile(
     r'//\s*REQ:\s*'
     r'([a-zA-Z_][a-zA-Z0-9_]*)'
     r'\.'
     r'([a-zA-Z_][a-zA-Z0-9_]*)'
     r'(?:\s+as\s+([a-zA-Z_][a-zA-Z0-9_]*))?'
+    r'(?:\s+(READ|WRITE)\b)?'
 )
 
+# Alineación (bytes) de cada columna de las entidades GENERIC
+COLUMN_ALIGN = 64
+
+# Variables internas de las entidades GENERIC que son un escalar, no una columna
+ENTITY_SCALARS = ("_active", "_capacity", "_awake_count", "_version")
+
+
+# Metadatos que script_builder.py escribe en los módulos sys_* generados desde .rule
+RULE_META_PATTERN = re.compile(r'^//\s*RULE_META:\s*(ENTITY|READS|WRITES|EFFECTS)\s+(.*)$', re.M)
 
 STRUCT_REQ_PATTERN = re.compile(
     r'//\s*REQ_STRUCT:\s*'
@@ -506,29 +978,51 @@ for mod in all_modules:
     with open(path) as f:
         content = f.read()
 
-        has_range_version = "range" in content.lower() and "_range" in mod.lower()
-
-        for entity_name, var_name, alias in REQ_PATTERN.findall(content):
+        # Las formas de rango se buscan en el código, no en los comentarios
+        code = re.sub(r'//[^\n]*|/\*.*?\*/', '', content, flags=re.S)
+        has_range_version = re.search(rf'\bsystem_{re.escape(mod)}_range\s*\(', code) is not None
+        # Forma de rango por columnas: system_<mod>_cols(int start, int end, SYSTEM_PARAMS_<mod>)
+        has_cols_version = re.search(rf'\bsystem_{re.escape(mod)}_cols\s*\(', code) is not None
+
+        rule_meta = None
+        meta_lines = RULE_META_PATTERN.findall(content)
+        if meta_lines:
+            rule_meta = {key: value.split() for key, value in meta_lines}
+            rule_meta["ENTITY"] = rule_meta.get("ENTITY", [None])[0]
+            for key in ("READS", "WRITES", "EFFECTS"):
+                rule_meta[key] = [v for v in rule_meta.get(key, []) if v != "NONE"]
+
+        for entity_name, var_name, alias, access in REQ_PATTERN.findall(content):
             if entity_name not in entities:
                 die(f"{mod}: Entidad '{entity_name}' no definida en REQ")
 
             is_shared = var_name in entities[entity_name]['_original_shared_vars']
             original_vars_dict = entities[entity_name]['_original_shared_vars'] if is_shared else entities[entity_name]['_original_vars']
             
-        for entity_name, var_name, alias in REQ_PATTERN.findall(content):
+        for entity_name, var_name, alias, access in REQ_PATTERN.findall(content):
             if entity_name not in entities:
                 die(f"{mod}: Entidad '{entity_name}' no definida en REQ")
 
             is_shared = var_name in entities[entity_name]['_original_shared_vars']
             original_vars_dict = entities[entity_name]['_original_shared_vars'] if is_shared else entities[entity_name]['_original_vars']
             
-            is_internal = var_name in ["_active", "_capacity"]
+            # _awake/_awake_count: lista de despiertos (CONFIG SLEEP)
+            is_internal = var_name in ENTITY_SCALARS or var_name == "_awake"
+            if var_name in ("_awake", "_awake_count") and "sleep" not in entities[entity_name]:
+                die(f"{mod}: '{entity_name}.{var_name}' requiere CONFIG SLEEP {entity_name}.<flag>")
+            # _version/_ver_<col>: versiones por chunk (CONFIG TRACK), para marcar escrituras con engine_touch
+            is_tracking = var_name == "_version" or var_name.startswith("_ver_")
+            if is_tracking:
+                tracked = entities[entity_name].get("tracked", [])
+                if (var_name == "_version" and not tracked) or (var_name != "_version" and var_name[5:] not in tracked):
+                    die(f"{mod}: '{entity_name}.{var_name}' requiere CONFIG TRACK {entity_name}.{var_name[5:] if var_name != '_version' else '<var>'}")
+                is_internal = True
             
             if var_name not in original_vars_dict and not is_internal:
                 die(f"{mod}: Variable '{entity_name}.{var_name}' no declarada en el .spec")
 
             if is_internal:
-                original_type_name = "int32"
+                original_type_name = "uint32" if is_tracking else "int32"
                 is_strict = True
             else:
                 original_type_info = original_vars_dict[var_name]
@@ -546,7 +1040,8 @@ for mod in all_modules:
                         "var": f"{var_name}_{comp}",
                         "alias": f"{alias}_{comp}",
                         "data_type": soa_info['base'],
-                        "is_shared": is_shared
+                        "is_shared": is_shared,
+                        "access": access or "WRITE"
                     })
             else:
                 reqs.append({
@@ -555,7 +1050,8 @@ for mod in all_modules:
                     "var": var_name,
                     "alias": alias,
                     "data_type": original_type_name,
-                    "is_shared": is_shared
+                    "is_shared": is_shared,
+                    "access": access or "WRITE"
                 })
                 
 
@@ -580,15 +1076,182 @@ for mod in all_modules:
                 lib_name = lib_name[:-2]
             external_libs_needed[lib_name] = True
 
+    mode = system_modes.get(mod, "SINGLE")
+    range_entity = None
+
+    if has_cols_version:
+        if has_range_version:
+            die(f"{mod}: define system_{mod}_range y system_{mod}_cols, usa solo una forma")
+        if struct_reqs or not reqs:
+            die(f"{mod}: system_{mod}_cols recibe columnas, necesita REQ (sin REQ_STRUCT)")
+        # El rango es la primera columna GENERIC que pide el módulo
+        range_entity = next((r["entity"] for r in reqs if entities[r["entity"]]["kind"] == "GENERIC"
+                             and not r["is_shared"] and r["var"] not in ENTITY_SCALARS), None)
+        if not range_entity:
+            die(f"{mod}: system_{mod}_cols necesita al menos una columna de una entidad GENERIC")
+
+    if rule_meta:
+        range_entity = rule_meta["ENTITY"]
+        if range_entity not in entities or entities[range_entity]["kind"] != "GENERIC":
+            die(f"{mod}: MODULE_ENTITY '{range_entity}' debe ser una entidad GENERIC del .spec")
+        for col in rule_meta["READS"] + rule_meta["WRITES"]:
+            ent_name, var_name = col.split(".", 1)
+            if ent_name not in entities:
+                die(f"{mod}: Entidad '{ent_name}' no definida (REQ en el .rule)")
+            if var_name not in entities[ent_name]["vars"] and var_name not in entities[ent_name]["shared_vars"]:
+                die(f"{mod}: Variable '{col}' no declarada en el .spec (REQ en el .rule)")
+
+        # Paralelo solo si cada iteración i escribe únicamente columnas de su entidad
+        # y no hay C crudo con efectos desconocidos; EMIT/DESTROY van a lotes por rango
+        parallel_safe = "RAW" not in rule_meta["EFFECTS"] and all(
+            col.split(".", 1)[0] == range_entity and col.split(".", 1)[1] in entities[range_entity]["vars"]
+            for col in rule_meta["WRITES"])
+        if mod not in explicit_modes:
+            mode = "PARALLEL" if parallel_safe else "SINGLE"
+        elif mode == "PARALLEL" and not parallel_safe:
+            warn(f"{mod}: escribe fuera de {range_entity}[i] o usa C crudo, se ejecuta en modo SINGLE")
+            mode = "SINGLE"
+    elif mode == "PARALLEL" and not has_cols_version:
+        if not has_range_version:
+            die(f"{mod}: MODE PARALLEL requiere definir system_{mod}_range(World* w, int start, int end) o system_{mod}_cols")
+        for entity_name, entity_data in entities.items():
+            if entity_data["kind"] == "GENERIC":
+                range_entity = entity_name
+                break
+
+    # ITERATE AWAKE: el rango [start, end) recorre <Entidad>._awake, no [0, _active)
+    iterate = system_iterate.get(mod, "ALL")
+    if iterate == "AWAKE":
+        if rule_meta or not range_entity:
+            die(f"{mod}: ITERATE AWAKE requiere MODE PARALLEL o system_{mod}_cols (no disponible en .rule)")
+        if "sleep" not in entities[range_entity]:
+            die(f"{mod}: ITERATE AWAKE requiere CONFIG SLEEP {range_entity}.<flag>")
+
     module_info[mod] = {
         "reqs": reqs,
         "struct_reqs": struct_reqs,
         "path": path,
-        "has_world_param": len(reqs) == 0 and len(struct_reqs) == 0,
-        "is_range_version": has_range_version,
-        "mode": system_modes.get(mod, "SINGLE")
+        "has_world_param": (len(reqs) == 0 and len(struct_reqs) == 0) or has_cols_version,
+        "is_range_version": has_range_version or has_cols_version,
+        "cols": has_cols_version,
+        "mode": mode,
+        "rule_meta": rule_meta,
+        "range_entity": range_entity,
+        "iterate": iterate,
+        "staged": bool(rule_meta) and any(e in ("EMIT", "DESTROY") for e in rule_meta["EFFECTS"])
     }
 
+needs_scriptsupport = any(info["staged"] for info in module_info.values())
+
+# CONFIG TRACK: una escritura sin engine_touch no la ve el sync del GSPEC. Los .rule la marcan
+# con ENGINE_TRACK_<Entidad>_<col>; los que escriben _active crean instancias (siempre se recorren)
+for mod, info in sorted(module_info.items()):
+    if info["rule_meta"]: continue
+    req_vars = {(r["entity"], r["var"]) for r in info["reqs"]}
+    if any(r["var"] == "_active" and r["access"] == "WRITE" for r in info["reqs"]): continue
+    for r in info["reqs"]:
+        if r["access"] == "WRITE" and r["var"] in entities[r["entity"]].get("tracked", []) \
+                and (r["entity"], f"_ver_{r['var']}") not in req_vars:
+            warn(f"{mod}: escribe {r['entity']}.{r['var']} (CONFIG TRACK) sin pedir {r['entity']}._ver_{r['var']}; "
+                 "usa engine_touch o el GSPEC no verá el cambio")
+
+# Los módulos en fases por entidad reciben &col[i]: sin garantía de alineación
+entity_phase_modules = {mod for e in entities.values() for phase_list in e["phases"].values() for mod in phase_list}
+for mod, info in module_info.items():
+    if info["cols"] and mod in entity_phase_modules:
+        die(f"{mod}: la forma system_{mod}_cols solo se puede usar en fases globales")
+
+def req_params(info):
+    # READ -> const T* restrict, WRITE -> T* restrict. Cada columna es un array distinto,
+    # salvo que el módulo pida la misma dos veces: entonces no hay restrict
+    seen = {}
+    for req in info["reqs"]:
+        seen[(req["entity"], req["var"])] = seen.get((req["entity"], req["var"]), 0) + 1
+    params = []
+    for req in info["reqs"]:
+        c_type = TYPE_MAP.get(req["data_type"], req["data_type"])
+        const = "const " if req["access"] == "READ" else ""
+        restrict = " restrict" if seen[(req["entity"], req["var"])] == 1 else ""
+        params.append(f"{const}{c_type}*{restrict} {req['alias']}")
+    for req in info["struct_reqs"]:
+        params.append(f"{req['entity']}_Data* {req['alias']}")
+    return params
+
+def req_args(info, world):
+    # Punteros a la base de cada columna (o a la variable) dentro de world ("w." o "w->")
+    args = []
+    for req in info["reqs"]:
+        ent = entities[req["entity"]]
+        base = f"{world}{req['entity'].lower()}.{req['var']}"
+        if ent["kind"] == "GENERIC" and not req["is_shared"] and req["var"] not in ENTITY_SCALARS:
+            args.append(f"&{base}[0]")
+        else:
+            args.append(f"&{base}")
+    return args
+
+# Entradas del profiler: sistemas, despachos paralelos, bucles por entidad, GSPEC y frame
+profile_labels = []
+# Tipos SOA con kernels SIMD (solo base float; SIMD_MAX_COMPS componentes como máximo)
+simd_types = OrderedDict((name, info) for name, info in SOA_TYPES.items()
+                         if info["base"] == "float" and len(info["comps"]) <= 8)
+
+# Las estadísticas por frame salen de los tiempos del profiler
+if STATS_FILE:
+    PROFILE = True
+
+# Condiciones de parada: <GENERIC>._active o variable de un UNIQUE
+stop_conditions = []
+for ent_name, var, op, value, line_num in STOP_WHEN:
+    if ent_name not in entities:
+        die(f"Línea {line_num}: STOP_WHEN usa la entidad desconocida '{ent_name}'")
+    e = entities[ent_name]
+    if e["kind"] == "GENERIC" and var != "_active" and not (var == "_awake_count" and "sleep" in e):
+        die(f"Línea {line_num}: STOP_WHEN sobre GENERIC {ent_name} solo admite _active (o _awake_count con CONFIG SLEEP)")
+    if e["kind"] == "UNIQUE" and var not in e["vars"]:
+        die(f"Línea {line_num}: {ent_name} no tiene la variable '{var}'")
+    stop_conditions.append((f"w.{ent_name.lower()}.{var} {op} {value}", f"{ent_name}.{var} {op} {value}"))
+
+if PROFILE or PERF_COUNTERS:
+    profile_labels = ["frame"] + sorted(module_info)
+    profile_labels += [f"{mod}.dispatch" for mod, info in sorted(module_info.items()) if info["mode"] == "PARALLEL"]
+    for name, e in entities.items():
+        profile_labels += [f"{name}.{phase}" for phase in ("START", "LOOP", "END") if e["kind"] == "GENERIC" and e["phases"][phase]]
+        if "sleep" in e:
+            profile_labels.append(f"{name}.sleep")
+        if "compact" in e:
+            profile_labels.append(f"{name}.compact")
+        if "reorder" in e:
+            profile_labels.append(f"{name}.reorder")
+    if EXPORT:
+        profile_labels.append("export")
+    if GSPEC and gspec_data['gcomponent'] and SELECTED_BACKEND != "manual":
+        profile_labels += ["gspec.sync", "gspec.upload", "gspec.draw"]
+        if PIPELINE:
+            profile_labels.append("gspec.submit")
+
+# Gauges del profiler: entidades activas (y despiertas con CONFIG SLEEP) por frame de cada GENERIC
+profile_gauges = []
+gauge_exprs = {}
+if PROFILE:
+    for name, e in entities.items():
+        if e["kind"] != "GENERIC": continue
+        gauge_exprs[f"{name}.active"] = f"w.{name.lower()}._active"
+        if "sleep" in e:
+            gauge_exprs[f"{name}.awake"] = f"w.{name.lower()}._awake_count"
+    # Volumen de subida del último frame presentado (backend null/record)
+    if GSPEC and gspec_data['gcomponent'] and BACKEND_SOURCE == "null":
+        gauge_exprs["gspec.upload_bytes"] = "(int64_t)backend_null_stats()->last_bytes"
+        gauge_exprs["gspec.upload_ranges"] = "(int64_t)backend_null_stats()->last_ranges"
+    # Instancias dentro del frustum en el último sync (suma de los gcomponents con [culling])
+    culled = [c for c in gspec_data['components'] if c['culling']] if GSPEC and gspec_data['gcomponent'] else []
+    if culled:
+        gauge_exprs["gspec.visible"] = " + ".join(f"g_cull_{c['name'].lower()}.visible_count" for c in culled)
+    # Chunks recorridos en el último sync (gcomponents con CONFIG TRACK)
+    tracked_comps = [c for c in gspec_data['components'] if c.get('track')] if GSPEC and gspec_data['gcomponent'] else []
+    if tracked_comps:
+        gauge_exprs["gspec.track_chunks"] = " + ".join(f"g_track_{c['name'].lower()}.visited" for c in tracked_comps)
+    profile_gauges = list(gauge_exprs)
+
 # GENERACIÓN DE CÓDIGO
 
 with open(OUT, "w") as out:
@@ -599,12 +1262,17 @@ with open(OUT, "w") as out:
     out.write("#include <math.h>\n")
 
     if GSPEC and gspec_data['gcomponent'] and SELECTED_BACKEND != "manual":
-        out.write(f'#include "backend/backend_{SELECTED_BACKEND}.h"\n')
+        out.write(f'#include "backend/backend_{BACKEND_SOURCE}.h"\n')
 
     if GSPEC and gspec_data['gcomponent']:
         out.write('\n#include "GraphicSystem/graphics_types.h"\n')
         out.write('#include "GraphicSystem/render_protocol.h"\n')
         out.write('#include "GraphicSystem/scene_sync_state.h"\n')
+        if any(c['culling'] for c in gspec_data['components']):
+            out.write('#include "GraphicSystem/frustum.h"\n')
+    if PIPELINE:
+        out.write("// Simulación y render en paralelo (CONFIG PIPELINE ON)\n")
+        out.write('#include "GraphicSystem/render_pipeline.h"\n')
 
     if external_libs_needed:
         out.write("\n// Librerías externas requeridas por módulos\n")
@@ -623,15 +1291,58 @@ with open(OUT, "w") as out:
                     out.write(f"#include <{lib}.h>\n")
     out.write("\n")
 
+    out.write("// Temporizador de frame (reloj monotónico / TSC calibrado)\n")
+    out.write('#include "TimeSupport/frame_timer.h"\n\n')
+
     out.write("// Include for parallel execution\n")
     out.write('#include "MultithreadSupport/parallel.h"\n\n')
+    if REORDER:
+        out.write("// Orden Morton y radix sort paralelo (CONFIG REORDER)\n")
+        out.write('#include "MultithreadSupport/reorder.h"\n\n')
+    if any(e["kind"] == "GENERIC" for e in entities.values()):
+        out.write("// Suma de prefijos y compactación paralelas (<entidad>_compact)\n")
+        out.write('#include "MultithreadSupport/compact.h"\n\n')
 
     out.write("// Include for graphics protocol and synchronization\n")
     out.write('#include "GraphicSystem/render_protocol.h"\n')
     out.write('#include "GraphicSystem/scene_sync_state.h"\n\n')
 
+    if PROFILE:
+        out.write("// Profiler (CONFIG PROFILE ON)\n")
+        out.write('#include "TimeSupport/clock.h"\n')
+        out.write('#include "ProfileSupport/profiler.h"\n\n')
+
+    if STATS_FILE:
+        out.write("// Estadísticas por frame (CONFIG STATS)\n")
+        out.write('#include "ProfileSupport/stats.h"\n\n')
+
+    if EXPORT:
+        out.write("// Columnas en memoria compartida (CONFIG EXPORT)\n")
+        out.write('#include "ExportSupport/shm_export.h"\n\n')
+
+    if MULTIVERSION_TARGETS:
+        # Clones por ISA de las funciones de rango; el resolver (ifunc) elige una vez al cargar el binario
+        targets = ", ".join(f'"{t}"' for t in MULTIVERSION_TARGETS)
+        out.write("// Multiversión (CONFIG MULTIVERSION)\n")
+        out.write(f"#define ENGINE_MULTIVERSION __attribute__((target_clones({targets})))\n\n")
+
+    if simd_types:
+        out.write("// Kernels SIMD con selección de ISA en tiempo de ejecución\n")
+        out.write('#include "SimdSupport/simd.h"\n\n')
+        for type_name, info in simd_types.items():
+            write_simd_helpers(out, type_name, info["comps"])
+
+    if PERF_COUNTERS:
+        out.write("// Contadores hardware (CONFIG PERF_COUNTERS ON)\n")
+        out.write('#include "ProfileSupport/perf_counters.h"\n\n')
+
+    if TRACE_FILE:
+        out.write("// Tracing por hilo (CONFIG TRACE)\n")
+        out.write('#include "ProfileSupport/trace.h"\n\n')
+
     out.write(f"// Configuration constants\n")
-    out.write(f"#define GENERATED_MAX_THREADS {MAX_THREADS}\n\n")
+    out.write(f"#define GENERATED_MAX_THREADS {MAX_THREADS}\n")
+    out.write(f"#define ENGINE_COLUMN_ALIGN {COLUMN_ALIGN}\n\n")
 
     out.write("// Los tipos compuestos deben ser definidos por el usuario o incluidos via REQ_LIB\n\n")
 
@@ -646,6 +1357,23 @@ with open(OUT, "w") as out:
         if e["kind"] == "GENERIC":
             out.write("    int32_t _active;     // Instancias activas\n")
             out.write("    int32_t _capacity;   // Capacidad máxima\n")
+            if "sleep" in e:
+                out.write(f"    // Lista de despiertos (CONFIG SLEEP {name}.{e['sleep']})\n")
+                out.write("    int32_t _awake_count;  // Entradas en _awake\n")
+                out.write("    int32_t _awake_seen;   // Instancias ya admitidas en la lista\n")
+                out.write(f"    int32_t _awake[{e['count']}] __attribute__((aligned(ENGINE_COLUMN_ALIGN)));\n")
+                out.write(f"    uint8_t _awake_listed[{e['count']}];  // 1 si el índice está en _awake\n")
+                out.write("    uint32_t _moves;       // REORDER/<entidad>_compact: las dormidas han cambiado de índice\n")
+            if "reorder" in e:
+                out.write(f"    // Handles estables (CONFIG REORDER {name}.{e['reorder']['pos']})\n")
+                out.write("    int32_t _handles_seen;  // Índices por debajo con handle asignado\n")
+                out.write(f"    int32_t _handle_slot[{e['count']}];  // handle -> índice actual\n")
+                out.write(f"    int32_t _slot_handle[{e['count']}] __attribute__((aligned(ENGINE_COLUMN_ALIGN)));  // índice -> handle\n")
+            if "tracked" in e:
+                out.write(f"    // Versiones por chunk (CONFIG TRACK {' '.join(e['tracked'])})\n")
+                out.write("    uint32_t _version;  // Frame actual: la versión que dejan las escrituras\n")
+                for col in e["tracked"]:
+                    out.write(f"    uint32_t _ver_{col}[ENGINE_TRACK_CHUNKS({e['count']})];\n")
         
         for var_name, info in sorted(e["vars"].items()):
             if var_name in ["_active", "_capacity"]: continue
@@ -653,7 +1381,7 @@ with open(OUT, "w") as out:
             c_type = TYPE_MAP.get(var_type, var_type)
 
             if e["kind"] == "GENERIC":
-                out.write(f"    {c_type} {var_name}[{e['count']}];\n")
+                out.write(f"    {c_type} {var_name}[{e['count']}] __attribute__((aligned(ENGINE_COLUMN_ALIGN)));\n")
             else:
                 out.write(f"    {c_type} {var_name};\n")
 
@@ -663,7 +1391,183 @@ with open(OUT, "w") as out:
             out.write(f"    {c_type} {var_name};  // Variable compartida\n")
 
         out.write(f"}} {name}_Data;\n\n")
+
+        for col in e.get("tracked", []):
+            c_type = TYPE_MAP.get(e["vars"][col]["type"], e["vars"][col]["type"])
+            out.write(f"// Escribe {name}.{col}[i] y marca su chunk (CONFIG TRACK). Seguro entre hilos\n")
+            out.write(f"static inline void {name.lower()}_set_{col}({name}_Data* d, int32_t i, {c_type} v) {{\n")
+            out.write(f"    d->{col}[i] = v;\n")
+            out.write(f"    engine_touch(d->_ver_{col}, d->_version, i);\n")
+            out.write("}\n\n")
+
+        if "sleep" in e:
+            name_l = name.lower()
+            flag = e["sleep"]
+            out.write(f"// Despierta {name}[i] (evento): vuelve a la lista si no estaba. Seguro entre hilos\n")
+            out.write(f"static inline void {name_l}_wake({name}_Data* d, int32_t i) {{\n")
+            out.write(f"    d->{flag}[i] = true;\n")
+            out.write("    if (i >= d->_awake_seen || __atomic_exchange_n(&d->_awake_listed[i], 1, __ATOMIC_RELAXED)) return;\n")
+            out.write("    d->_awake[__atomic_fetch_add(&d->_awake_count, 1, __ATOMIC_RELAXED)] = i;\n")
+            out.write("}\n\n")
+            out.write(f"// Admite las instancias creadas desde la última llamada que tengan {flag}\n")
+            out.write(f"static inline void {name_l}_awake_admit({name}_Data* d) {{\n")
+            out.write("    for (int32_t i = d->_awake_seen; i < d->_active; i++) {\n")
+            out.write(f"        if (d->{flag}[i] && !d->_awake_listed[i]) {{\n")
+            out.write("            d->_awake_listed[i] = 1;\n")
+            out.write("            d->_awake[d->_awake_count++] = i;\n")
+            out.write("        }\n")
+            out.write("    }\n")
+            out.write("    if (d->_active > d->_awake_seen) d->_awake_seen = d->_active;\n")
+            out.write("}\n\n")
+            out.write(f"// Una vez por frame: saca de la lista (sin reordenar) las instancias con {flag} a false\n")
+            out.write("// o fuera de _active, y admite las nuevas\n")
+            out.write(f"static inline void {name_l}_sleep_update({name}_Data* d) {{\n")
+            out.write("    int32_t n = 0;\n")
+            out.write("    for (int32_t k = 0; k < d->_awake_count; k++) {\n")
+            out.write("        const int32_t i = d->_awake[k];\n")
+            out.write(f"        if (i < d->_active && d->{flag}[i]) d->_awake[n++] = i;\n")
+            out.write("        else d->_awake_listed[i] = 0;\n")
+            out.write("    }\n")
+            out.write("    d->_awake_count = n;\n")
+            out.write("    if (d->_awake_seen > d->_active) d->_awake_seen = d->_active;\n")
+            out.write(f"    {name_l}_awake_admit(d);\n")
+            out.write("}\n\n")
     
+    for name, e in entities.items():
+        if "reorder" not in e: continue
+        name_l = name.lower()
+        count = e["count"]
+        pos = e["reorder"]["pos"]
+        columns = [v for v in sorted(e["vars"]) if v not in ("_active", "_capacity")]
+        if "sleep" in e:
+            columns.append("_awake_listed")
+        columns.append("_slot_handle")
+        out.write(f"// Handles de {name}: una instancia conserva su handle aunque REORDER la mueva.\n")
+        out.write("// Hasta la primera reordenación (y para las creadas después) handle == índice\n")
+        out.write(f"static inline int32_t {name_l}_handle(const {name}_Data* d, int32_t i) {{\n")
+        out.write("    return i < d->_handles_seen ? d->_slot_handle[i] : i;\n")
+        out.write("}\n\n")
+        out.write(f"static inline int32_t {name_l}_slot(const {name}_Data* d, int32_t handle) {{\n")
+        out.write("    return handle < d->_handles_seen ? d->_handle_slot[handle] : handle;\n")
+        out.write("}\n\n")
+        out.write(f"// Orden Morton de {name} (CONFIG REORDER {name}.{pos} {e['reorder']['every']})\n")
+        out.write("static struct {\n")
+        out.write(f"    uint64_t keys[{count}];\n")
+        out.write(f"    uint64_t tmp[{count}];\n")
+        out.write(f"    int32_t perm[{count}];  // perm[nuevo] = anterior\n")
+        if "sleep" in e:
+            out.write(f"    int32_t inv[{count}];   // inv[anterior] = nuevo\n")
+        out.write(f"    int32_t hist[RADIX_BLOCKS({count}) * 256];\n")
+        out.write(f"    int32_t offset[RADIX_BLOCKS({count}) * 256];\n")
+        out.write(f"    uint64_t column[{count}];  // Columna permutada antes de copiarla de vuelta\n")
+        out.write(f"}} g_reorder_{name_l};\n\n")
+        out.write(f"static void {name_l}_reorder({name}_Data* d) {{\n")
+        out.write("    const int32_t n = d->_active;\n")
+        out.write("    if (n <= 1) return;\n")
+        out.write(f"    for (int32_t i = d->_handles_seen; i < n; i++) {{\n")
+        out.write("        d->_slot_handle[i] = i;\n")
+        out.write("        d->_handle_slot[i] = i;\n")
+        out.write("    }\n")
+        out.write("    if (d->_handles_seen < n) d->_handles_seen = n;\n\n")
+        out.write(f"    morton_keys(g_reorder_{name_l}.keys, d->{pos}_x, d->{pos}_y, d->{pos}_z, n);\n")
+        out.write(f"    const uint64_t* sorted = radix_sort_u64(g_reorder_{name_l}.keys, g_reorder_{name_l}.tmp, n, 32, 30,\n")
+        out.write(f"                                            g_reorder_{name_l}.hist, g_reorder_{name_l}.offset);\n")
+        out.write(f"    int32_t* perm = g_reorder_{name_l}.perm;\n")
+        out.write("    for (int32_t k = 0; k < n; k++) perm[k] = (int32_t)(uint32_t)sorted[k];\n\n")
+        out.write("    // La misma permutación en todas las columnas\n")
+        for col in columns:
+            out.write(f"    _Static_assert(sizeof(d->{col}[0]) <= sizeof(uint64_t), \"REORDER: elemento de columna mayor que 8 bytes\");\n")
+            out.write(f"    parallel_gather(g_reorder_{name_l}.column, d->{col}, sizeof(d->{col}[0]), perm, n);\n")
+            out.write(f"    memcpy(d->{col}, g_reorder_{name_l}.column, (size_t)n * sizeof(d->{col}[0]));\n")
+        out.write("\n    for (int32_t i = 0; i < n; i++) d->_handle_slot[d->_slot_handle[i]] = i;\n")
+        if "tracked" in e:
+            out.write("    // Todas las instancias han cambiado de sitio: el sync del GSPEC las vuelve a recorrer\n")
+            for col in e["tracked"]:
+                out.write(f"    engine_touch_range(d->_ver_{col}, d->_version, 0, n);\n")
+        if "sleep" in e:
+            out.write("    // La lista de despiertos guarda índices: pasan a los nuevos\n")
+            out.write(f"    int32_t* inv = g_reorder_{name_l}.inv;\n")
+            out.write("    for (int32_t k = 0; k < n; k++) inv[perm[k]] = k;\n")
+            out.write("    for (int32_t k = 0; k < d->_awake_count; k++) d->_awake[k] = inv[d->_awake[k]];\n")
+            out.write("    d->_moves++;\n")
+        out.write("}\n\n")
+
+    for name, e in entities.items():
+        if e["kind"] != "GENERIC": continue
+        name_l = name.lower()
+        columns = [v for v in sorted(e["vars"]) if v not in ("_active", "_capacity")]
+        if "sleep" in e:
+            columns.append("_awake_listed")
+        col_types = [TYPE_MAP.get(e["vars"][c]["type"], e["vars"][c]["type"]) if c in e["vars"] else "uint8_t" for c in columns]
+        if "reorder" in e:
+            col_types.append("int32_t")
+        widest = " ".join(f"{t} c{k};" for k, t in enumerate(col_types))
+        out.write(f"// Compacta {name}: conserva en orden las instancias para las que keep da 1 y mueve sus\n")
+        out.write("// filas al principio de todas las columnas. Devuelve las eliminadas (-1 sin memoria).\n")
+        out.write("// Desde el hilo principal, fuera de los sistemas paralelos\n")
+        out.write(f"static inline int32_t {name_l}_compact({name}_Data* d, CompactKeepFn keep, void* ctx) {{\n")
+        out.write("    const int32_t n = d->_active;\n")
+        out.write("    if (n <= 0) return 0;\n")
+        out.write(f"    if (compact_reserve_column((size_t)n * sizeof(union {{ {widest} }})) != 0) return -1;\n")
+        out.write("    const int32_t m = compact_mark(ctx, keep, n);\n")
+        out.write("    if (m < 0) return -1;\n")
+        out.write("    if (m == n) return 0;\n")
+        out.write("    int32_t* idx = g_compact.index;\n")
+        if "sleep" in e:
+            out.write("    int32_t* inv = g_compact.inverse;\n")
+            out.write("    compact_scatter(idx, inv);\n")
+        else:
+            out.write("    compact_scatter(idx, NULL);\n")
+        out.write("    // Las filas anteriores a la primera eliminada se quedan donde están\n")
+        out.write("    const int32_t first = compact_first_moved(idx, m);\n")
+        for col in columns:
+            out.write(f"    parallel_gather(g_compact.column, d->{col}, sizeof(d->{col}[0]), idx + first, m - first);\n")
+            out.write(f"    memcpy(d->{col} + first, g_compact.column, (size_t)(m - first) * sizeof(d->{col}[0]));\n")
+        out.write("    // Las filas que quedan libres vuelven a los valores iniciales, como las no usadas\n")
+        for col in columns:
+            if col == "_awake_listed": continue
+            info = e["vars"][col]
+            if info["default"] is not None and not is_zero_val(info["default"]):
+                val = info["default"].strip()
+                c_type = TYPE_MAP.get(info["type"], info["type"])
+                if val.startswith('{'): val = f"({c_type}){val}"
+                out.write(f"    for (int32_t i = m; i < n; i++) d->{col}[i] = {val};\n")
+            else:
+                out.write(f"    memset(d->{col} + m, 0, (size_t)(n - m) * sizeof(d->{col}[0]));\n")
+        if "reorder" in e:
+            out.write("\n    // Handles: los de las eliminadas pasan, en orden, a los índices que quedan libres\n")
+            out.write("    // [m, n), así que un handle antiguo puede acabar en una instancia creada después\n")
+            out.write(f"    for (int32_t i = d->_handles_seen; i < n; i++) {{\n")
+            out.write("        d->_slot_handle[i] = i;\n")
+            out.write("        d->_handle_slot[i] = i;\n")
+            out.write("    }\n")
+            out.write("    if (d->_handles_seen < n) d->_handles_seen = n;\n")
+            out.write("    int32_t* handles = (int32_t*)g_compact.column;\n")
+            out.write("    parallel_gather(handles, d->_slot_handle, sizeof(int32_t), idx + first, m - first);\n")
+            out.write("    int32_t freed = m - first;\n")
+            out.write("    for (int32_t i = first; i < n; i++)\n")
+            out.write("        if (!g_compact.keep[i]) handles[freed++] = d->_slot_handle[i];\n")
+            out.write("    memcpy(d->_slot_handle + first, handles, (size_t)(n - first) * sizeof(int32_t));\n")
+            out.write("    for (int32_t i = first; i < n; i++) d->_handle_slot[d->_slot_handle[i]] = i;\n")
+        if "sleep" in e:
+            out.write("\n    // Lista de despiertos: sin las eliminadas y con los nuevos índices\n")
+            out.write("    int32_t listed = 0;\n")
+            out.write("    for (int32_t k = 0; k < d->_awake_count; k++) {\n")
+            out.write("        const int32_t j = inv[d->_awake[k]];\n")
+            out.write("        if (j >= 0) d->_awake[listed++] = j;\n")
+            out.write("    }\n")
+            out.write("    d->_awake_count = listed;\n")
+            out.write("    memset(d->_awake_listed + m, 0, (size_t)(n - m));\n")
+            out.write("    d->_awake_seen = d->_awake_seen < n ? compact_rank(idx, m, d->_awake_seen) : m;\n")
+            out.write("    d->_moves++;\n")
+        if "tracked" in e:
+            out.write("    // Las filas movidas y las que quedan libres se vuelven a sincronizar\n")
+            for col in e["tracked"]:
+                out.write(f"    engine_touch_range(d->_ver_{col}, d->_version, first, n);\n")
+        out.write("    d->_active = m;\n")
+        out.write("    return n - m;\n")
+        out.write("}\n\n")
+
     out.write("// Mundo con contextos separados\n")
     out.write("typedef struct {\n")
     out.write("    // Entidades (cada una con su propio contexto)\n")
@@ -678,50 +1582,99 @@ with open(OUT, "w") as out:
     out.write("    \n    // Variables globales automáticas\n")
     out.write("    struct {\n")
     out.write("        uint64_t start_time;\n")
+    out.write("        uint64_t frame_start;\n")
     out.write("        uint64_t frame_time;\n")
     out.write("        int32_t fps;\n")
     out.write("        float frame_times[120];\n")
     out.write("        int32_t frame_time_index;\n")
+    out.write("        int32_t steps;\n")
+    out.write("        double sim_time;\n")
     out.write("    } _engine;\n")
     
     out.write("} World;\n\n")
 
+    if profile_labels:
+        out.write("// Tabla del profiler: una entrada por sistema, despacho y etapa\n")
+        out.write("enum {\n")
+        for label in profile_labels:
+            out.write(f"    {profile_id(label)},\n")
+        out.write("    PROF_COUNT\n};\n")
+        out.write("static const char* const g_profile_names[PROF_COUNT] = {\n")
+        for label in profile_labels:
+            out.write(f'    "{label}",\n')
+        out.write("};\n")
+    if PROFILE:
+        out.write("static ProfileEntry g_profile_entries[PROF_COUNT];\n")
+        if profile_gauges:
+            out.write("enum {\n")
+            for label in profile_gauges:
+                out.write(f"    {profile_id(label)},\n")
+            out.write("    PROF_GAUGE_COUNT\n};\n")
+            out.write("static const char* const g_profile_gauge_names[PROF_GAUGE_COUNT] = {\n")
+            for label in profile_gauges:
+                out.write(f'    "{label}",\n')
+            out.write("};\n")
+            out.write("static ProfileGauge g_profile_gauges[PROF_GAUGE_COUNT];\n")
+            out.write("static Profiler g_profiler = { g_profile_names, PROF_COUNT, g_profile_entries, g_profile_gauge_names, PROF_GAUGE_COUNT, g_profile_gauges };\n")
+        else:
+            out.write("static Profiler g_profiler = { g_profile_names, PROF_COUNT, g_profile_entries, NULL, 0, NULL };\n")
+    if PERF_COUNTERS:
+        out.write("static PerfEntry g_perf_entries[PROF_COUNT];\n")
+        out.write("static PerfCounters g_perf;  // names/count/entries se asignan antes de perf_init\n")
+    if profile_labels:
+        out.write("\n")
+
+    if TRACE_FILE or PERF_COUNTERS:
+        out.write("// Hook por chunk de parallel_run (tracing / contadores por worker)\n")
+        out.write("static void engine_chunk_hook(int worker, int start, int end, int is_end) {\n")
+        if TRACE_FILE:
+            out.write("    trace_chunk_hook(worker, start, end, is_end);\n")
+        if PERF_COUNTERS:
+            out.write("    perf_chunk(&g_perf, worker, is_end);\n")
+        if not TRACE_FILE:
+            out.write("    (void)start; (void)end;\n")
+        out.write("}\n\n")
+
     if GSPEC and gspec_data['gcomponent']:
         out.write("// Datos de la escena para renderizado\n")
         out.write("SceneData s = {0};\n")
         out.write("SceneSyncState ss = {0};\n\n")
+        if PIPELINE:
+            out.write("// Con PIPELINE la escena vive en los dos buffers del pipeline, no en s/ss\n")
+            out.write("static RenderPipeline g_render;\n\n")
     
 # prototipos
     out.write("// Prototipos de sistemas\n")
+    multiversion = "ENGINE_MULTIVERSION " if MULTIVERSION_TARGETS else ""
     out.write("// Nota: Cada sistema recibe solo los datos que necesita\n")
     if GSPEC and gspec_data['gcomponent']:
-        gcomp_entity = gspec_data['entity']
-        out.write(f"void sys_sync_gcomponent_{gcomp_entity}_range(World* w, SceneData* s, SceneSyncState* ss, int start, int end);\n")
-        out.write(f"void sys_sync_gcomponent_{gcomp_entity}(World* w, SceneData* s, SceneSyncState* ss);\n")
+        for comp in gspec_data['components']:
+            if not comp['culling']:
+                out.write(f"{multiversion}void sys_sync_gcomponent_{comp['name']}_range(World* w, SceneData* s, SceneSyncState* ss, uint32_t base, int start, int end);\n")
+            out.write(f"uint32_t sys_sync_gcomponent_{comp['name']}(World* w, SceneData* s, SceneSyncState* ss, uint32_t base);\n")
+        out.write("void sys_sync_gspec(World* w, SceneData* s, SceneSyncState* ss);\n")
     out.write("//       No hay acceso accidental entre entidades\n\n")
 
     for mod, info in sorted(module_info.items()):
-        if info["mode"] == "PARALLEL":
+        if info["reqs"] or info["struct_reqs"]:
+            # Parámetros con const/restrict para que la definición del módulo los use tal cual
+            out.write(f"#define SYSTEM_PARAMS_{mod} {', '.join(req_params(info))}\n")
+            aligned = [r["alias"] for r in info["reqs"] if entities[r["entity"]]["kind"] == "GENERIC"
+                       and not r["is_shared"] and r["var"] not in ENTITY_SCALARS]
+            if aligned and mod not in entity_phase_modules:
+                hints = " ".join(f"{a} = __builtin_assume_aligned({a}, ENGINE_COLUMN_ALIGN);" for a in aligned)
+                out.write(f"#define SYSTEM_ALIGNED_{mod} do {{ {hints} }} while (0)\n")
+
+        if info["cols"]:
+            out.write(f"{multiversion}void system_{mod}_cols(int start, int end, SYSTEM_PARAMS_{mod});\n")
             out.write(f"void system_{mod}_range(World* w, int start, int end);\n")
+        elif info["mode"] == "PARALLEL" or info["rule_meta"]:
+            out.write(f"{multiversion}void system_{mod}_range(World* w, int start, int end);\n")
 
         if info["has_world_param"]:
             out.write(f"void system_{mod}(World* w);\n")
         else:
-            params = []
-
-            for req in info["reqs"]:
-                c_type = TYPE_MAP.get(req["data_type"], req["data_type"])
-                entity_kind = entities[req["entity"]]["kind"]
-
-                if entity_kind == "GENERIC" and not req['is_shared']:
-                    params.append(f"{c_type}* {req['alias']}")
-                else:
-                    params.append(f"{c_type}* {req['alias']}")
-
-            for req in info["struct_reqs"]:
-                params.append(f"{req['entity']}_Data* {req['alias']}")
-
-            out.write(f"void system_{mod}({', '.join(params)});\n")
+            out.write(f"void system_{mod}(SYSTEM_PARAMS_{mod});\n")
 
     out.write("\n")
     
@@ -732,108 +1685,429 @@ with open(OUT, "w") as out:
         if info["mode"] == "PARALLEL":
             all_modules_to_include.add(mod)
 
+    # Columnas que escriben los .rule: ENGINE_TRACK_<Entidad>_<col> marca el chunk si tiene CONFIG TRACK
+    rule_writes = sorted({col for info in module_info.values() if info["rule_meta"] for col in info["rule_meta"]["WRITES"]})
+    if rule_writes:
+        out.write("// Marcas de escritura de los .rule (CONFIG TRACK); en columnas sin TRACK no hacen nada\n")
+    for col in rule_writes:
+        ent_name, var_name = col.split(".", 1)
+        d = f"(w)->{ent_name.lower()}"
+        if var_name in entities[ent_name].get("tracked", []):
+            out.write(f"#define ENGINE_TRACK_{ent_name}_{var_name}(w, i) engine_touch({d}._ver_{var_name}, {d}._version, (i))\n")
+            out.write(f"#define ENGINE_TRACK_RANGE_{ent_name}_{var_name}(w, b, e) engine_touch_range({d}._ver_{var_name}, {d}._version, (b), (e))\n")
+        else:
+            out.write(f"#define ENGINE_TRACK_{ent_name}_{var_name}(w, i) ((void)0)\n")
+            out.write(f"#define ENGINE_TRACK_RANGE_{ent_name}_{var_name}(w, b, e) ((void)0)\n")
+    if rule_writes:
+        out.write("\n")
+
     for mod in sorted(all_modules_to_include):
         out.write(f'#include "{MODS}/{mod}.c"\n')
     if GSPEC and gspec_data['gcomponent']:
-        out.write('#include "backend/backend_raylib.c"\n')
+        # BACKEND manual: el renderizado lo hacen los módulos con las funciones de raylib
+        backend_source = "raylib" if SELECTED_BACKEND == "manual" else BACKEND_SOURCE
+        out.write(f'#include "backend/backend_{backend_source}.c"\n')
+    if needs_scriptsupport:
+        out.write('#include "ScriptSupport/scriptsupport.c"\n')
     out.write("\n")
 
-    if GSPEC and gspec_data['gcomponent']:
-        gcomp_entity = gspec_data['entity']
+    cols_modules = [mod for mod, info in sorted(module_info.items()) if info["cols"]]
+    if cols_modules:
+        out.write("// Adaptadores World* -> columnas (system_<mod>_cols)\n")
+    for mod in cols_modules:
+        out.write(f"void system_{mod}_range(World* w, int start, int end) {{\n")
+        out.write(f"    system_{mod}_cols(start, end, {', '.join(req_args(module_info[mod], 'w->'))});\n")
+        out.write("}\n\n")
+
+    gspec_components = gspec_data['components'] if GSPEC and gspec_data['gcomponent'] else []
+    if any(c['culling'] for c in gspec_components):
+        out.write("#define ENGINE_CULL_BLOCK_SHIFT 12  // Bloques de 4096 instancias para la suma de prefijos\n\n")
+    for comp in gspec_components:
+        gcomp = comp['name']
+        gcomp_entity = comp['entity']
         gcomp_entity_lower = gcomp_entity.lower()
         entity_count = entities[gcomp_entity]['count']
 
-        out.write(f"// Implementación de la función de sincronización GSPEC\n")
-        out.write(f"void sys_sync_gcomponent_{gcomp_entity}_range(World* w, SceneData* s, SceneSyncState* ss, int start, int end) {{\n")
-        out.write(f"    for (int i = start; i < end; i++) {{\n")
-
-        if gspec_data['visibility']:
-            vis_when_var = gspec_data['visibility']['when']
-            out.write(f"        // Visibilidad\n")
-            out.write(f"        bool is_visible = w->{gcomp_entity_lower}.{vis_when_var}[i];\n")
-            out.write(f"        uint8_t target_alpha = is_visible ? 255 : 0;\n")
-            out.write(f"        if (s->instances[i].color.a != target_alpha) {{\n")
-            out.write(f"            s->instances[i].color.a = target_alpha;\n")
-            out.write(f"            scene_sync_mark(ss, i);\n")
-            out.write(f"        }}\n")
-            out.write(f"        if (!is_visible) continue;\n")
-
-        if gspec_data['transform']:
-            trans_update_when = gspec_data['transform'].get('update_when')
-            if trans_update_when:
-                out.write(f"        // Actualizar Transformación solo si {trans_update_when} es verdadero\n")
-                out.write(f"        if (!w->{gcomp_entity_lower}.{trans_update_when}[i]) {{\n")
-                out.write(f"            // Si no está activo y la transformación no necesita actualizarse, solo marcar como dirty si la visibilidad cambió\n")
-                out.write(f"            // (la lógica de visibilidad ya manejó esto)\n")
-                out.write(f"        }} else {{\n")
-
-            trans_from_fields = [f.strip() for f in gspec_data['transform']['from'].split(',')]
+        if comp['culling']:
+            cull = comp['culling']
+            g = f"g_cull_{gcomp.lower()}"
+            ent = f"w->{gcomp_entity_lower}"
+            trans_from_fields = [f.strip() for f in comp['transform']['from'].split(',')]
+            trans_vars = [f"{f.split('.')[0]}_{f.split('.')[1]}" for f in trans_from_fields[:3]]
+
+            # Tres pasadas: marcar visibles (paralelo, cuenta por bloque fijo), suma de
+            # prefijos de los bloques y copia compacta (paralelo, cada hilo sabe dónde escribir)
+            out.write(f"// Culling GSPEC de {gcomp} ({gcomp_entity}): solo se copian, suben y dibujan las instancias dentro del frustum\n")
+            out.write(f"#define ENGINE_CULL_BLOCKS_{gcomp} (({entity_count} + (1 << ENGINE_CULL_BLOCK_SHIFT) - 1) >> ENGINE_CULL_BLOCK_SHIFT)\n")
+            out.write("static struct {\n")
+            out.write("    Frustum frustum;\n")
+            out.write("    SceneData* s;\n")
+            out.write("    SceneSyncState* ss;\n")
+            out.write("    uint32_t base;  // Primera instancia de la región en SceneData\n")
+            out.write("    int32_t visible_count;\n")
+            out.write(f"    uint8_t visible[{entity_count}];\n")
+            out.write(f"    int32_t block_count[ENGINE_CULL_BLOCKS_{gcomp}];\n")
+            out.write(f"    int32_t block_offset[ENGINE_CULL_BLOCKS_{gcomp}];  // Primera posición de salida de cada bloque\n")
+            out.write(f"}} {g};\n\n")
+
+            out.write(f"static {multiversion}void sys_cull_gcomponent_{gcomp}_range(World* w, int start, int end) {{\n")
+            out.write(f"    const Frustum* f = &{g}.frustum;\n")
+            out.write(f"    const float hx = {ent}.{cull['size'][0]} * 0.5f;\n")
+            out.write(f"    const float hy = {ent}.{cull['size'][1]} * 0.5f;\n")
+            out.write(f"    const float hz = {ent}.{cull['size'][2]} * 0.5f;\n")
+            out.write("    int32_t block = start >> ENGINE_CULL_BLOCK_SHIFT;\n")
+            out.write("    int32_t n = 0;\n")
+            out.write("    for (int i = start; i < end; i++) {\n")
+            out.write("        if ((i >> ENGINE_CULL_BLOCK_SHIFT) != block) {\n")
+            out.write("            // Un bloque puede quedar repartido entre dos hilos\n")
+            out.write(f"            if (n) __atomic_fetch_add(&{g}.block_count[block], n, __ATOMIC_RELAXED);\n")
+            out.write("            block = i >> ENGINE_CULL_BLOCK_SHIFT;\n")
+            out.write("            n = 0;\n")
+            out.write("        }\n")
+            test = f"frustum_test_aabb(f, {ent}.{trans_vars[0]}[i], {ent}.{trans_vars[1]}[i], {ent}.{trans_vars[2]}[i], hx, hy, hz)"
+            if comp['visibility']:
+                test = f"{ent}.{comp['visibility']['when']}[i] && {test}"
+            out.write(f"        const bool v = {test};\n")
+            out.write(f"        {g}.visible[i] = v;\n")
+            out.write("        n += v;\n")
+            out.write("    }\n")
+            out.write(f"    if (n) __atomic_fetch_add(&{g}.block_count[block], n, __ATOMIC_RELAXED);\n")
+            out.write("}\n\n")
+
+            out.write(f"static {multiversion}void sys_compact_gcomponent_{gcomp}_range(World* w, int start, int end) {{\n")
+            out.write(f"    SceneData* s = {g}.s;\n")
+            out.write(f"    const uint8_t* visible = {g}.visible;\n")
+            out.write("    // Posición de salida: base de la región, la del bloque y las visibles del bloque antes de start\n")
+            out.write(f"    uint32_t o = {g}.base + (uint32_t){g}.block_offset[start >> ENGINE_CULL_BLOCK_SHIFT];\n")
+            out.write("    for (int i = start & ~((1 << ENGINE_CULL_BLOCK_SHIFT) - 1); i < start; i++) o += visible[i];\n")
+            out.write("    uint32_t lo = UINT32_MAX, hi = 0;\n")
+            out.write("    for (int i = start; i < end; i++) {\n")
+            out.write("        if (!visible[i]) continue;\n")
+            out.write("        RenderInstance* r = &s->instances[o];\n")
+            out.write("        bool changed = false;\n")
+            out.write(f"        const float _px = {ent}.{trans_vars[0]}[i];\n")
+            out.write(f"        const float _py = {ent}.{trans_vars[1]}[i];\n")
+            out.write(f"        const float _pz = {ent}.{trans_vars[2]}[i];\n")
+            out.write("        if (r->transform.m[12] != _px || r->transform.m[13] != _py || r->transform.m[14] != _pz) {\n")
+            out.write("            r->transform.m[12] = _px;\n")
+            out.write("            r->transform.m[13] = _py;\n")
+            out.write("            r->transform.m[14] = _pz;\n")
+            out.write("            changed = true;\n")
+            out.write("        }\n")
+            if comp['color']:
+                out.write(f"        const uint32_t c = {ent}.{comp['color']['from']}[i];\n")
+                out.write("        const color_rgba8 _c = { (uint8_t)(c >> 16), (uint8_t)(c >> 8), (uint8_t)c, 255 };\n")
+            else:
+                out.write("        const color_rgba8 _c = { r->color.r, r->color.g, r->color.b, 255 };\n")
+            out.write("        if (r->color.r != _c.r || r->color.g != _c.g || r->color.b != _c.b || r->color.a != _c.a) {\n")
+            out.write("            r->color = _c;\n")
+            out.write("            changed = true;\n")
+            out.write("        }\n")
+            out.write("        if (changed) {\n")
+            out.write("            if (o < lo) lo = o;\n")
+            out.write("            hi = o;\n")
+            out.write("        }\n")
+            out.write("        o++;\n")
+            out.write("    }\n")
+            out.write(f"    if (lo <= hi) scene_sync_mark_range_atomic({g}.ss, lo, hi);\n")
+            out.write("}\n\n")
+
+            def c_floats(vals):
+                return ", ".join(f"{v!r}f" for v in vals)
+
+            out.write(f"// Wrapper de {gcomp} (con culling): devuelve las instancias escritas desde base\n")
+            out.write(f"uint32_t sys_sync_gcomponent_{gcomp}(World* w, SceneData* s, SceneSyncState* ss, uint32_t base) {{\n")
+            out.write(f"    const int32_t active_count = {ent}._active;\n")
+            out.write("    // Cámara del GSPEC; si algún módulo incluye camera_system.h, la compartida\n")
+            out.write(f"    Vector3 cam_position = {{ {c_floats(cull['position'])} }};\n")
+            out.write(f"    Vector3 cam_target = {{ {c_floats(cull['target'])} }};\n")
+            out.write(f"    Vector3 cam_up = {{ {c_floats(cull['up'])} }};\n")
+            out.write(f"    float cam_fovy = {cull['fovy']!r}f;\n")
+            out.write(f"    float cam_aspect = {cull['aspect']!r}f;\n")
+            out.write("#ifdef CAMERA_SYSTEM_H\n")
+            out.write("    const Camera3D* cam = get_current_camera();\n")
+            out.write("    cam_position = cam->position;\n")
+            out.write("    cam_target = cam->target;\n")
+            out.write("    cam_up = cam->up;\n")
+            out.write("    cam_fovy = cam->fovy;\n")
+            out.write("    if (GetScreenHeight() > 0) cam_aspect = (float)GetScreenWidth() / (float)GetScreenHeight();\n")
+            out.write("#endif\n")
+            out.write(f"    frustum_from_camera(&{g}.frustum, cam_position, cam_target, cam_up, cam_fovy, cam_aspect, {cull['near']!r}f, {cull['far']!r}f);\n")
+            out.write(f"    {g}.s = s;\n")
+            out.write(f"    {g}.ss = ss;\n")
+            out.write(f"    {g}.base = base;\n\n")
+            out.write("    const int32_t blocks = (active_count + (1 << ENGINE_CULL_BLOCK_SHIFT) - 1) >> ENGINE_CULL_BLOCK_SHIFT;\n")
+            out.write(f"    memset({g}.block_count, 0, (size_t)blocks * sizeof(int32_t));\n")
+            out.write(f"    {parallel_call('w', f'sys_cull_gcomponent_{gcomp}_range', 'active_count', gcomp_entity)};\n")
+            out.write("    // Suma de prefijos exclusiva de los bloques (active / 4096 entradas)\n")
+            out.write("    int32_t total = 0;\n")
+            out.write("    for (int32_t b = 0; b < blocks; b++) {\n")
+            out.write(f"        {g}.block_offset[b] = total;\n")
+            out.write(f"        total += {g}.block_count[b];\n")
+            out.write("    }\n")
+            out.write(f"    {parallel_call('w', f'sys_compact_gcomponent_{gcomp}_range', 'active_count', gcomp_entity)};\n")
+            out.write(f"    {g}.visible_count = total;\n")
+            out.write("    return (uint32_t)total;\n")
+            out.write("}\n\n")
+
+        else:
+
+            out.write(f"// Sincronización GSPEC de {gcomp} ({gcomp_entity}) en la región [base, base + _active)\n")
+            out.write(f"void sys_sync_gcomponent_{gcomp}_range(World* w, SceneData* s, SceneSyncState* ss, uint32_t base, int start, int end) {{\n")
+            out.write(f"    for (int i = start; i < end; i++) {{\n")
+
+            if comp['visibility']:
+                vis_when_var = comp['visibility']['when']
+                out.write(f"        // Visibilidad\n")
+                out.write(f"        bool is_visible = w->{gcomp_entity_lower}.{vis_when_var}[i];\n")
+                out.write(f"        uint8_t target_alpha = is_visible ? 255 : 0;\n")
+                out.write(f"        if (s->instances[base + i].color.a != target_alpha) {{\n")
+                out.write(f"            s->instances[base + i].color.a = target_alpha;\n")
+                out.write(f"            scene_sync_mark(ss, base + i);\n")
+                out.write(f"        }}\n")
+                out.write(f"        if (!is_visible) continue;\n")
+
+            # update_when = flag de CONFIG SLEEP: la traslación se sincroniza en el wrapper
+            # recorriendo solo la lista de despiertos
+            trans_awake = bool(comp['transform']) and "sleep" in entities[gcomp_entity] and \
+                comp['transform'].get('update_when') == entities[gcomp_entity]["sleep"]
+            if trans_awake:
+                trans_from_fields = [f.strip() for f in comp['transform']['from'].split(',')]
+                trans_vars = [f"{f.split('.')[0]}_{f.split('.')[1]}" for f in trans_from_fields[:3]]
+
+            if comp['transform'] and not trans_awake:
+                trans_update_when = comp['transform'].get('update_when')
+                if trans_update_when:
+                    out.write(f"        // Actualizar Transformación solo si {trans_update_when} es verdadero\n")
+                    out.write(f"        if (!w->{gcomp_entity_lower}.{trans_update_when}[i]) {{\n")
+                    out.write(f"            // Si no está activo y la transformación no necesita actualizarse, solo marcar como dirty si la visibilidad cambió\n")
+                    out.write(f"            // (la lógica de visibilidad ya manejó esto)\n")
+                    out.write(f"        }} else {{\n")
+
+                trans_from_fields = [f.strip() for f in comp['transform']['from'].split(',')]
             
-            actual_x_var = f"{trans_from_fields[0].split('.')[0]}_{trans_from_fields[0].split('.')[1]}"
-            actual_y_var = f"{trans_from_fields[1].split('.')[0]}_{trans_from_fields[1].split('.')[1]}"
-            actual_z_var = f"{trans_from_fields[2].split('.')[0]}_{trans_from_fields[2].split('.')[1]}"
-
-
-            out.write(f"        // Transformación (traslación)\n")
-            out.write(f"        float _px = w->{gcomp_entity_lower}.{actual_x_var}[i];\n")
-            out.write(f"        float _py = w->{gcomp_entity_lower}.{actual_y_var}[i];\n")
-            out.write(f"        float _pz = w->{gcomp_entity_lower}.{actual_z_var}[i];\n")
-            out.write(f"        if (s->instances[i].transform.m[12] != _px || s->instances[i].transform.m[13] != _py || s->instances[i].transform.m[14] != _pz) {{\n")
-            out.write(f"            s->instances[i].transform.m[12] = _px;\n")
-            out.write(f"            s->instances[i].transform.m[13] = _py;\n")
-            out.write(f"            s->instances[i].transform.m[14] = _pz;\n")
-            out.write(f"            scene_sync_mark(ss, i);\n")
-            out.write(f"        }}\n")
-
-            if trans_update_when:
+                actual_x_var = f"{trans_from_fields[0].split('.')[0]}_{trans_from_fields[0].split('.')[1]}"
+                actual_y_var = f"{trans_from_fields[1].split('.')[0]}_{trans_from_fields[1].split('.')[1]}"
+                actual_z_var = f"{trans_from_fields[2].split('.')[0]}_{trans_from_fields[2].split('.')[1]}"
+
+
+                out.write(f"        // Transformación (traslación)\n")
+                out.write(f"        float _px = w->{gcomp_entity_lower}.{actual_x_var}[i];\n")
+                out.write(f"        float _py = w->{gcomp_entity_lower}.{actual_y_var}[i];\n")
+                out.write(f"        float _pz = w->{gcomp_entity_lower}.{actual_z_var}[i];\n")
+                out.write(f"        if (s->instances[base + i].transform.m[12] != _px || s->instances[base + i].transform.m[13] != _py || s->instances[base + i].transform.m[14] != _pz) {{\n")
+                out.write(f"            s->instances[base + i].transform.m[12] = _px;\n")
+                out.write(f"            s->instances[base + i].transform.m[13] = _py;\n")
+                out.write(f"            s->instances[base + i].transform.m[14] = _pz;\n")
+                out.write(f"            scene_sync_mark(ss, base + i);\n")
                 out.write(f"        }}\n")
 
-        if gspec_data['color']:
-            color_from_var = gspec_data['color']['from']
-            out.write(f"        // Color\n")
-            out.write(f"        uint32_t current_w_color = w->{gcomp_entity_lower}.{color_from_var}[i];\n")
-            out.write(f"        uint8_t _r = (uint8_t)(current_w_color >> 16);\n")
-            out.write(f"        uint8_t _g = (uint8_t)(current_w_color >> 8);\n")
-            out.write(f"        uint8_t _b = (uint8_t)current_w_color;\n")
-            out.write(f"        if (s->instances[i].color.r != _r || s->instances[i].color.g != _g || s->instances[i].color.b != _b) {{\n")
-            out.write(f"            s->instances[i].color.r = _r;\n")
-            out.write(f"            s->instances[i].color.g = _g;\n")
-            out.write(f"            s->instances[i].color.b = _b;\n")
-            out.write(f"            scene_sync_mark(ss, i);\n")
-            out.write(f"        }}\n")
-
-        out.write(f"    }}\n")
-        out.write(f"}}\n\n")
-
-        out.write(f"// Wrapper para la función de sincronización GSPEC\n")
-        out.write(f"void sys_sync_gcomponent_{gcomp_entity}(World* w, SceneData* s, SceneSyncState* ss) {{\n")
-        out.write(f"    uint32_t active_count = w->{gcomp_entity_lower}._active;\n")
-        out.write(f"    scene_ensure_capacity(s, active_count);\n")
-        out.write(f"    s->count = active_count;\n")
-        out.write(f"    sys_sync_gcomponent_{gcomp_entity}_range(w, s, ss, 0, active_count);\n")
-        out.write(f"}}\n\n")
+                if trans_update_when:
+                    out.write(f"        }}\n")
+
+            if comp['color']:
+                color_from_var = comp['color']['from']
+                out.write(f"        // Color\n")
+                out.write(f"        uint32_t current_w_color = w->{gcomp_entity_lower}.{color_from_var}[i];\n")
+                out.write(f"        uint8_t _r = (uint8_t)(current_w_color >> 16);\n")
+                out.write(f"        uint8_t _g = (uint8_t)(current_w_color >> 8);\n")
+                out.write(f"        uint8_t _b = (uint8_t)current_w_color;\n")
+                out.write(f"        if (s->instances[base + i].color.r != _r || s->instances[base + i].color.g != _g || s->instances[base + i].color.b != _b) {{\n")
+                out.write(f"            s->instances[base + i].color.r = _r;\n")
+                out.write(f"            s->instances[base + i].color.g = _g;\n")
+                out.write(f"            s->instances[base + i].color.b = _b;\n")
+                out.write(f"            scene_sync_mark(ss, base + i);\n")
+                out.write(f"        }}\n")
+
+            out.write(f"    }}\n")
+            out.write(f"}}\n\n")
+
+            if comp['track']:
+                out.write(f"static SceneTrack g_track_{gcomp.lower()};  // Syncs anteriores de {gcomp} (CONFIG TRACK)\n\n")
+            if trans_awake:
+                out.write(f"// _moves de {gcomp_entity} en los syncs anteriores de cada buffer\n")
+                out.write(f"static struct {{ uint32_t moves[2]; int next; }} g_moved_{gcomp.lower()};\n\n")
+            out.write(f"// Wrapper de {gcomp}: devuelve las instancias escritas desde base\n")
+            out.write(f"uint32_t sys_sync_gcomponent_{gcomp}(World* w, SceneData* s, SceneSyncState* ss, uint32_t base) {{\n")
+            out.write(f"    uint32_t active_count = w->{gcomp_entity_lower}._active;\n")
+            if comp['track']:
+                ent = f"w->{gcomp_entity_lower}"
+                out.write("    // CONFIG TRACK: solo los chunks escritos desde el sync anterior de este buffer, los que\n")
+                out.write("    // tienen instancias nuevas y todos si la región ha cambiado de base\n")
+                out.write(f"    SceneTrack* t = &g_track_{gcomp.lower()};\n")
+                if PIPELINE:
+                    out.write("    // Con PIPELINE el buffer de atrás se sincronizó por última vez hace dos syncs\n")
+                    out.write("    const uint32_t since = t->version[0] < t->version[1] ? t->version[0] : t->version[1];\n")
+                    out.write("    const uint32_t fresh = t->count[0] < t->count[1] ? t->count[0] : t->count[1];\n")
+                    out.write("    const bool full = t->base[0] != base || t->base[1] != base;\n")
+                else:
+                    out.write("    const uint32_t since = t->version[0];\n")
+                    out.write("    const uint32_t fresh = t->count[0];\n")
+                    out.write("    const bool full = t->base[0] != base;\n")
+                clean = " && ".join(f"{ent}._ver_{c}[k] < since" for c in comp['track_sources']) or "true"
+                out.write("    t->visited = 0;\n")
+                out.write("    for (uint32_t c0 = 0; c0 < active_count; c0 += ENGINE_TRACK_CHUNK) {\n")
+                out.write("        const uint32_t c1 = active_count - c0 > ENGINE_TRACK_CHUNK ? c0 + ENGINE_TRACK_CHUNK : active_count;\n")
+                out.write("        const uint32_t k = c0 >> ENGINE_TRACK_SHIFT;\n")
+                out.write(f"        if (!full && c1 <= fresh && {clean}) continue;\n")
+                out.write(f"        sys_sync_gcomponent_{gcomp}_range(w, s, ss, base, (int)c0, (int)c1);\n")
+                out.write("        t->visited++;\n")
+                out.write("    }\n")
+                out.write(f"    t->version[t->next] = {ent}._version;\n")
+                out.write("    t->base[t->next] = base;\n")
+                out.write("    t->count[t->next] = active_count;\n")
+                if PIPELINE:
+                    out.write("    t->next ^= 1;\n")
+            else:
+                out.write(f"    sys_sync_gcomponent_{gcomp}_range(w, s, ss, base, 0, active_count);\n")
+            if trans_awake:
+                # Las dormidas conservan la última traslación sincronizada (siguen en la lista
+                # el frame en que se duermen); incluye las invisibles para no dejarla atrasada
+                out.write(f"    // Traslación solo de las instancias despiertas (CONFIG SLEEP). Si REORDER o\n")
+                out.write(f"    // {gcomp_entity_lower}_compact han movido filas desde el sync anterior de este buffer, la de todas\n")
+                out.write(f"    {gcomp_entity_lower}_awake_admit(&w->{gcomp_entity_lower});\n")
+                out.write(f"    const uint32_t moves = w->{gcomp_entity_lower}._moves;\n")
+                if PIPELINE:
+                    out.write(f"    const bool moved = g_moved_{gcomp.lower()}.moves[0] != moves || g_moved_{gcomp.lower()}.moves[1] != moves;\n")
+                    out.write(f"    g_moved_{gcomp.lower()}.moves[g_moved_{gcomp.lower()}.next] = moves;\n")
+                    out.write(f"    g_moved_{gcomp.lower()}.next ^= 1;\n")
+                else:
+                    out.write(f"    const bool moved = g_moved_{gcomp.lower()}.moves[0] != moves;\n")
+                    out.write(f"    g_moved_{gcomp.lower()}.moves[0] = moves;\n")
+                out.write(f"    const int32_t listed = moved ? (int32_t)active_count : w->{gcomp_entity_lower}._awake_count;\n")
+                out.write(f"    for (int32_t k = 0; k < listed; k++) {{\n")
+                out.write(f"        const int32_t i = moved ? k : w->{gcomp_entity_lower}._awake[k];\n")
+                out.write(f"        float _px = w->{gcomp_entity_lower}.{trans_vars[0]}[i];\n")
+                out.write(f"        float _py = w->{gcomp_entity_lower}.{trans_vars[1]}[i];\n")
+                out.write(f"        float _pz = w->{gcomp_entity_lower}.{trans_vars[2]}[i];\n")
+                out.write(f"        if (s->instances[base + i].transform.m[12] != _px || s->instances[base + i].transform.m[13] != _py || s->instances[base + i].transform.m[14] != _pz) {{\n")
+                out.write(f"            s->instances[base + i].transform.m[12] = _px;\n")
+                out.write(f"            s->instances[base + i].transform.m[13] = _py;\n")
+                out.write(f"            s->instances[base + i].transform.m[14] = _pz;\n")
+                out.write(f"            scene_sync_mark(ss, base + i);\n")
+                out.write(f"        }}\n")
+                out.write(f"    }}\n")
+            out.write(f"    return active_count;\n")
+            out.write(f"}}\n\n")
+
+    if gspec_components:
+        # Regiones contiguas en el orden del GSPEC: el stream se sube en una pasada y se
+        # dibuja con una llamada instanciada
+        out.write("// Sincronización GSPEC: cada gcomponent escribe en su región del buffer de instancias\n")
+        out.write(f"SceneRegion g_gspec_regions[{len(gspec_components)}] = {{\n")
+        for comp in gspec_components:
+            out.write(f'    {{ .name = "{comp["name"]}" }},\n')
+        out.write("};\n\n")
+        out.write("void sys_sync_gspec(World* w, SceneData* s, SceneSyncState* ss) {\n")
+        total = " + ".join(f"(uint32_t)w->{c['entity'].lower()}._active" for c in gspec_components)
+        out.write(f"    scene_ensure_capacity(s, {total});\n")
+        out.write("    uint32_t base = 0;\n")
+        for k, comp in enumerate(gspec_components):
+            r = f"g_gspec_regions[{k}]"
+            out.write(f"    // {comp['name']} ({comp['entity']})\n")
+            out.write(f"    scene_sync_reset(&{r}.sync);\n")
+            out.write(f"    {r}.base = base;\n")
+            out.write(f"    {r}.count = sys_sync_gcomponent_{comp['name']}(w, s, &{r}.sync, base);\n")
+            out.write(f"    scene_sync_merge(ss, &{r}.sync);\n")
+            out.write(f"    base += {r}.count;\n")
+        out.write("    s->count = base;\n")
+        out.write("}\n\n")
+
+    if PIPELINE:
+        # Sin PERF_CALL ni trace: ambos cuentan solo en el hilo principal
+        out.write("// Presentación en el hilo de render (CONFIG PIPELINE ON)\n")
+        out.write("static void engine_present(const SceneData* s, const SceneSyncState* ss, void* user) {\n")
+        if BACKEND_SOURCE == "null":
+            out.write("    (void)user;\n")
+        else:
+            out.write("    World* w = (World*)user;\n")
+        present_calls = list(zip(("gspec.upload", "gspec.draw"), backend_calls("w->", "s", "ss")))
+        for label, call in present_calls:
+            if PROFILE:
+                call = f"PROFILE_CALL(g_profiler, {profile_id(label)}, {call})"
+            out.write(f"    {call};\n")
+        out.write("}\n\n")
+
+    if EXPORT:
+        layout_file = f"{EXPORT['name'][1:]}.layout.json"
+        out.write(f"// Exportación a {EXPORT['name']} (CONFIG EXPORT); offsets en {layout_file}\n")
+        out.write("static ShmExport g_export;\n\n")
+        for ent_name, ent_layout in export_layout["entities"].items():
+            cols = [c for c in export_layout["columns"] if c["entity"] == ent_name]
+            d = f"w->{ent_name.lower()}"
+            out.write(f"static void engine_export_{ent_name.lower()}_range(World* w, int start, int end) {{\n")
+            out.write("    uint8_t* slot = g_export.slot;\n")
+            for c in cols:
+                out.write(f"    memcpy(slot + {c['offset']} + (size_t)start * {c['itemsize']}, &{d}.{c['column']}[start], (size_t)(end - start) * {c['itemsize']});\n")
+            out.write("}\n\n")
+        out.write("static void engine_export(World* w) {\n")
+        for c in export_layout["columns"]:
+            out.write(f"    _Static_assert(sizeof(w->{c['entity'].lower()}.{c['column']}[0]) == {c['itemsize']}, \"EXPORT: tamaño de {c['name']} distinto del descriptor\");\n")
+        out.write("    uint8_t* slot = shm_export_begin(&g_export);\n")
+        out.write("    if (!slot) return;\n")
+        for ent_name, ent_layout in export_layout["entities"].items():
+            d = f"w->{ent_name.lower()}"
+            out.write(f"    *(int64_t*)(slot + {ent_layout['active_offset']}) = {d}._active;\n")
+            out.write(f"    {parallel_call('w', f'engine_export_{ent_name.lower()}_range', f'{d}._active', ent_name)};\n")
+        out.write("    shm_export_end(&g_export, w->frame);\n")
+        out.write("}\n\n")
 
     out.write("// Wrappers para sistemas paralelos\n")
     for mod, info in sorted(module_info.items()):
-        if info["mode"] == "PARALLEL":
-            generic_entity_name = None
-            for entity_name, entity_data in entities.items():
-                if entity_data["kind"] == "GENERIC":
-                    generic_entity_name = entity_name
-                    break
+        if info["mode"] == "PARALLEL" or info["rule_meta"] or info["cols"]:
+            range_entity = info["range_entity"]
 
-            if generic_entity_name:
+            if range_entity:
+                # ITERATE AWAKE: [start, end) son posiciones en la lista de despiertos
+                count = f"w->{range_entity.lower()}." + ("_awake_count" if info["iterate"] == "AWAKE" else "_active")
                 out.write(f"void system_{mod}(World* w) {{\n")
-                out.write(f"    parallel_run(w, (SystemRangeFn)system_{mod}_range, w->{generic_entity_name.lower()}._active);\n")
+                if info["mode"] == "PARALLEL":
+                    write_span_begin(out, "    ", f"{mod}.dispatch", perf=False)
+                    # ITERATE AWAKE recorre posiciones de la lista, no índices: sin tramos fijos
+                    owner = range_entity if info["iterate"] != "AWAKE" else None
+                    out.write(f"    {parallel_call('w', f'system_{mod}_range', count, owner)};\n")
+                    write_span_end(out, "    ", f"{mod}.dispatch", perf=False)
+                else:
+                    out.write(f"    system_{mod}_range(w, 0, {count});\n")
+                if info["staged"]:
+                    out.write(f"    scriptsupport_commit_staged();\n")
                 out.write(f"}}\n\n")
             else:
                 out.write(f"void system_{mod}(World* w) {{\n")
                 out.write(f"    // No GENERIC entity found for parallel execution\n")
                 out.write(f"}}\n\n")
     
+    if NUMA:
+        # Primer acceso a las columnas desde el worker dueño de cada tramo: con la política
+        # de primer acceso de Linux, sus páginas quedan en el nodo de ese worker
+        for name, e in entities.items():
+            if e["kind"] != "GENERIC": continue
+            name_l = name.lower()
+            arrays = [v for v in sorted(e["vars"]) if v not in ("_active", "_capacity")]
+            if "sleep" in e:
+                arrays += ["_awake", "_awake_listed"]
+            if "reorder" in e:
+                arrays += ["_handle_slot", "_slot_handle"]
+            out.write(f"// {name}: cada worker pone a cero su tramo y escribe los valores iniciales (CONFIG NUMA)\n")
+            out.write(f"static void engine_first_touch_{name_l}_range(World* w, int start, int end) {{\n")
+            for col in arrays:
+                info = e["vars"].get(col)
+                if info and info["default"] is not None and not is_zero_val(info["default"]):
+                    val = info["default"].strip()
+                    c_type = TYPE_MAP.get(info["type"], info["type"])
+                    if val.startswith('{'): val = f"({c_type}){val}"
+                    out.write(f"    for (int i = start; i < end; i++) w->{name_l}.{col}[i] = {val};\n")
+                else:
+                    out.write(f"    memset(&w->{name_l}.{col}[start], 0, (size_t)(end - start) * sizeof(w->{name_l}.{col}[0]));\n")
+            out.write("}\n\n")
+
     out.write("// Inicialización del mundo automática (Procedural)\n")
     out.write("static void init_world(World* w) {\n")
-    out.write("    memset(w, 0, sizeof(World));\n")
+    if NUMA:
+        out.write("    // CONFIG NUMA: w es estático y ya está a cero. Sin memset, las columnas se tocan\n")
+        out.write("    // por primera vez desde sus workers (engine_first_touch_*)\n")
+    else:
+        out.write("    memset(w, 0, sizeof(World));\n")
     out.write("    w->running = true;\n")
     out.write("    w->frame = 0;\n")
     out.write("    w->delta_time = 0.016f;\n")
@@ -866,28 +2140,18 @@ with open(OUT, "w") as out:
         if "_active" in e["vars"] and e["vars"]["_active"]["default"] is not None:
             active_val = e["vars"]["_active"]["default"]
         out.write(f"    w->{name_l}._active = {active_val};\n")
-        
+        if NUMA:
+            out.write(f"    {parallel_call('w', f'engine_first_touch_{name_l}_range', e['count'], name)};\n")
+
         vars_to_init = []
         for var_name, info in sorted(e["vars"].items()):
             if var_name == "_active": continue
             if info["default"] is not None:
                 val = info["default"].strip()
-                
-                def is_zero_val(v):
-                    v = v.strip()
-                    if v in ["0", "0.0", "0.0f", "0.00f", "false", "NULL"]: return True
-                    if v.startswith("{") and v.endswith("}"):
-                        content = v[1:-1]
-                        parts = content.split(",")
-                        for p in parts:
-                            if not is_zero_val(p): return False
-                        return True
-                    return False
-
                 if not is_zero_val(val):
                     vars_to_init.append((var_name, info))
         
-        if vars_to_init:
+        if vars_to_init and not NUMA:
             out.write(f"    for(int i=0; i<{e['count']}; i++) {{\n")
             for var_name, info in vars_to_init:
                 val = info["default"]
@@ -909,7 +2173,7 @@ with open(OUT, "w") as out:
     out.write("// Garantiza que cada entidad acceda solo a sus propios datos\n")
     out.write("static void build_system_args_entity(World* w, int32_t entity_index, ")
     out.write("const char* entity_name, const char* system_name, ")
-    out.write("void (*system_func)(...)) {\n")
+    out.write("void (*system_func)(void)) {\n")
     out.write("    // Esta función asegura el cableado correcto\n")
     out.write("    // Cada entidad tiene su propio índice y contexto\n")
     out.write("    (void)w; (void)entity_index; (void)entity_name;\n")
@@ -918,14 +2182,44 @@ with open(OUT, "w") as out:
 
     out.write("int main(void) {\n")
     out.write("    static World w;\n")
+    if AFFINITY == "ON":
+        out.write("    // Workers fijos a las CPUs del proceso, en orden (CONFIG AFFINITY)\n")
+        out.write("    int cpus[GENERATED_MAX_THREADS];\n")
+        out.write("    parallel_set_affinity(cpus, parallel_default_cpus(cpus, GENERATED_MAX_THREADS));\n")
+    elif AFFINITY:
+        out.write(f"    // Workers fijos a las CPUs {','.join(map(str, AFFINITY))} (CONFIG AFFINITY)\n")
+        out.write(f"    static const int cpus[] = {{ {', '.join(map(str, AFFINITY))} }};\n")
+        out.write(f"    parallel_set_affinity(cpus, {len(AFFINITY)});\n")
     out.write("    init_world(&w);\n\n")
+    out.write("    static FrameTimer timer;\n")
+    out.write(f"    frame_timer_init(&timer, {FIXED_DT!r}, {TARGET_FPS});\n")
+    if simd_types:
+        out.write('    printf("[SIMD] isa=%s\\n", simd_init());\n')
+    out.write("    w._engine.start_time = timer.start_ns;\n\n")
+    if TRACE_FILE:
+        out.write("    trace_init();\n")
+    if PERF_COUNTERS:
+        out.write("    g_perf.names = g_profile_names;\n")
+        out.write("    g_perf.count = PROF_COUNT;\n")
+        out.write("    g_perf.entries = g_perf_entries;\n")
+        out.write("    perf_init(&g_perf);\n")
+    if STATS_FILE:
+        out.write("    static StatsWriter stats;\n")
+        out.write(f'    stats_open(&stats, &g_profiler, "{STATS_FILE}", STATS_{STATS_FORMAT});\n\n')
+    if EXPORT:
+        out.write(f'    shm_export_open(&g_export, "{EXPORT["name"]}", 0x{export_layout["layout_hash"]}ull, '
+                  f'{export_layout["slot_bytes"]}, {export_layout["data_offset"]});\n\n')
+    if TRACE_FILE or PERF_COUNTERS:
+        out.write("    parallel_set_chunk_hook(engine_chunk_hook);\n\n")
     if GSPEC:
-        initial_capacity = 256
-        for e in entities.values():
-            if e['kind'] == 'GENERIC':
-                initial_capacity = e['count']
-                break
-        out.write(f"    scene_init(&s, {initial_capacity});\n\n")
+        # Todas las regiones del GSPEC caben sin crecer
+        initial_capacity = sum(entities[c['entity']]['count'] for c in gspec_data['components']) or 256
+        if PIPELINE:
+            out.write(f"    render_pipeline_init(&g_render, {initial_capacity}, engine_present, &w);\n\n")
+        else:
+            out.write(f"    scene_init(&s, {initial_capacity});\n\n")
+    if GSPEC and gspec_data['gcomponent'] and RECORD_FILE:
+        out.write(f'    backend_null_record_open("{RECORD_FILE}");\n\n')
     
     # PRE_START
     if globals["PRE_START"]:
@@ -933,7 +2227,7 @@ with open(OUT, "w") as out:
         for mod in globals["PRE_START"]:
             info = module_info[mod]
             if info["has_world_param"]:
-                out.write(f"    system_{mod}(&w);\n")
+                write_system_call(out, "    ", mod, f"system_{mod}(&w)")
             else:
                 args = []
                 for req in info["reqs"]:
@@ -943,7 +2237,7 @@ with open(OUT, "w") as out:
                     is_shared = req.get("is_shared", False)
                     
                     if ent["kind"] == "GENERIC" and not is_shared:
-                        if var_name in ["_active", "_capacity"]:
+                        if var_name in ENTITY_SCALARS:
                             args.append(f"&w.{ent_name.lower()}.{var_name}")
                         else:
                             args.append(f"&w.{ent_name.lower()}.{var_name}[0]")
@@ -953,7 +2247,7 @@ with open(OUT, "w") as out:
                 for req in info["struct_reqs"]:
                     args.append(f"&w.{req['entity'].lower()}")
                 
-                out.write(f"    system_{mod}({', '.join(args)});\n")
+                write_system_call(out, "    ", mod, f"system_{mod}({', '.join(args)})")
         out.write("\n")
     
     # START
@@ -962,7 +2256,7 @@ with open(OUT, "w") as out:
     for mod in globals["START"]:
         info = module_info[mod]
         if info["has_world_param"]:
-            out.write(f"    system_{mod}(&w);\n")
+            write_system_call(out, "    ", mod, f"system_{mod}(&w)")
         else:
             args = []
             for req in info["reqs"]:
@@ -972,7 +2266,7 @@ with open(OUT, "w") as out:
                 is_shared = req.get("is_shared", False)
 
                 if ent["kind"] == "GENERIC" and not is_shared:
-                    if var_name in ["_active", "_capacity"]:
+                    if var_name in ENTITY_SCALARS:
                         args.append(f"&w.{ent_name.lower()}.{var_name}")
                     else:
                         args.append(f"&w.{ent_name.lower()}.{var_name}[0]")
@@ -982,13 +2276,14 @@ with open(OUT, "w") as out:
             for req in info["struct_reqs"]:
                 args.append(f"&w.{req['entity'].lower()}")
             
-            out.write(f"    system_{mod}({', '.join(args)});\n")
+            write_system_call(out, "    ", mod, f"system_{mod}({', '.join(args)})")
         
     for name, e in entities.items():
         if e["phases"]["START"]:
             out.write(f"\n    // --- {name}.START (Contexto específico) ---\n")
             
             if e["kind"] == "GENERIC":
+                write_span_begin(out, "    ", f"{name}.START")
                 out.write(f"    for (int32_t i = 0; i < w.{name.lower()}._active; i++) {{\n")
                 out.write(f"        // Instancia {name}[i] se inicializa\n")
                 
@@ -1008,7 +2303,7 @@ with open(OUT, "w") as out:
                             if ent2["kind"] == "GENERIC" and not is_shared:
                                 if ent_name == name:
                                     # Misma entidad: usa índice actual
-                                    if var_name in ["_active", "_capacity"]:
+                                    if var_name in ENTITY_SCALARS:
                                         args.append(f"&w.{ent_name.lower()}.{var_name}")
                                     else:
                                         args.append(f"&w.{ent_name.lower()}.{var_name}[i]")
@@ -1020,7 +2315,7 @@ with open(OUT, "w") as out:
                                     if has_struct:
                                         args.append(f"&w.{ent_name.lower()}")
                                     else:
-                                        if var_name in ["_active", "_capacity"]:
+                                        if var_name in ENTITY_SCALARS:
                                             args.append(f"&w.{ent_name.lower()}.{var_name}")
                                         else:
                                             args.append(f"&w.{ent_name.lower()}.{var_name}[0]")
@@ -1034,12 +2329,13 @@ with open(OUT, "w") as out:
                         out.write(f"        system_{mod}({', '.join(args)});\n")
                 
                 out.write("    }\n")
+                write_span_end(out, "    ", f"{name}.START")
             else:
 
                 for mod in e["phases"]["START"]:
                     info = module_info[mod]
                     if info["has_world_param"]:
-                        out.write(f"    system_{mod}(&w);\n")
+                        write_system_call(out, "    ", mod, f"system_{mod}(&w)")
                     else:
                         args = []
                         for req in info["reqs"]:
@@ -1060,21 +2356,70 @@ with open(OUT, "w") as out:
                         for req in info["struct_reqs"]:
                             args.append(f"&w.{req['entity'].lower()}")
                         
-                        out.write(f"    system_{mod}({', '.join(args)});\n")
+                        write_system_call(out, "    ", mod, f"system_{mod}({', '.join(args)})")
     
     out.write("\n    // ========== LOOP PRINCIPAL ==========\n")
+    if PROFILE_EVERY > 0 and (PROFILE or PERF_COUNTERS):
+        out.write("    uint64_t _dumped_frame = UINT64_MAX;  // Último frame del resumen periódico\n")
     out.write("    while (w.running) {\n")
     out.write("        w.frame++;\n")
-    if GSPEC and gspec_data['gcomponent']:
+    out.write("        const double _real_dt = frame_timer_begin(&timer, &w._engine.frame_start, &w._engine.frame_time);\n")
+    out.write("        w.delta_time = (float)_real_dt;\n")
+    out.write("        w._engine.fps = w._engine.frame_time ? (int32_t)(1000000000ull / w._engine.frame_time) : 0;\n")
+    out.write("        w._engine.frame_times[w._engine.frame_time_index] = (float)clock_ns_to_ms(w._engine.frame_time);\n")
+    out.write("        w._engine.frame_time_index = (w._engine.frame_time_index + 1) % 120;\n")
+    write_span_begin(out, "        ", "frame", perf=False)
+    if GSPEC and gspec_data['gcomponent'] and not PIPELINE:
         out.write("        scene_sync_reset(&ss);\n\n")
-    
+    tracked_entities = [name for name, e in entities.items() if "tracked" in e]
+    if tracked_entities:
+        out.write("        // Versión de las escrituras de este frame (CONFIG TRACK)\n")
+        for name in tracked_entities:
+            out.write(f"        w.{name.lower()}._version = (uint32_t)w.frame;\n")
+        out.write("\n")
+    for name, e in entities.items():
+        if "compact" in e:
+            # Las eliminadas en el frame anterior ya tuvieron su último sync
+            out.write(f"        // --- {name}: compactación cada {e['compact']['every']} frames (CONFIG COMPACT) ---\n")
+            out.write(f"        if (w.frame % {e['compact']['every']} == 0) {{\n")
+            write_span_begin(out, "            ", f"{name}.compact", perf=False)
+            out.write(f"            {name.lower()}_compact(&w.{name.lower()}, compact_keep_u8, w.{name.lower()}.{e['compact']['flag']});\n")
+            write_span_end(out, "            ", f"{name}.compact", perf=False)
+            out.write("        }\n\n")
+        if "sleep" in e:
+            # Las instancias dormidas en el frame anterior salen aquí, después de su último sync
+            out.write(f"        // --- {name}: lista de despiertos (CONFIG SLEEP) ---\n")
+            write_span_begin(out, "        ", f"{name}.sleep")
+            out.write(f"        {name.lower()}_sleep_update(&w.{name.lower()});\n")
+            write_span_end(out, "        ", f"{name}.sleep")
+            out.write("\n")
+        if "reorder" in e:
+            # Después de la lista de despiertos: todas las instancias ya están admitidas
+            out.write(f"        // --- {name}: orden Morton cada {e['reorder']['every']} frames (CONFIG REORDER) ---\n")
+            out.write(f"        if (w.frame % {e['reorder']['every']} == 0) {{\n")
+            write_span_begin(out, "            ", f"{name}.reorder", perf=False)
+            out.write(f"            {name.lower()}_reorder(&w.{name.lower()});\n")
+            write_span_end(out, "            ", f"{name}.reorder", perf=False)
+            out.write("        }\n\n")
+
+    frame_out = out
+    if FIXED_DT:
+        # Paso fijo: las fases LOOP (global y por entidad) se repiten steps veces
+        out.write("        // --- Paso fijo (CONFIG FIXED_DT) ---\n")
+        out.write("        w._engine.steps = frame_timer_steps(&timer, _real_dt);\n")
+        out.write(f"        w.delta_time = {FIXED_DT!r}f;\n")
+        out.write("        for (int32_t _step = 0; _step < w._engine.steps; _step++) {\n")
+        out = IndentedOut(frame_out)
+    else:
+        out.write("        w._engine.steps = 1;\n")
+
     # Global LOOP
     if globals["LOOP"]:
         out.write("        // --- Global.LOOP ---\n")
         for mod in globals["LOOP"]:
             info = module_info[mod]
             if info["has_world_param"]:
-                out.write(f"        system_{mod}(&w);\n")
+                write_system_call(out, "        ", mod, f"system_{mod}(&w)")
             else:
                 args = []
                 for req in info["reqs"]:
@@ -1084,7 +2429,7 @@ with open(OUT, "w") as out:
                     is_shared = req.get("is_shared", False)
                     
                     if ent["kind"] == "GENERIC" and not is_shared:
-                        if var_name in ["_active", "_capacity"]:
+                        if var_name in ENTITY_SCALARS:
                             args.append(f"&w.{ent_name.lower()}.{var_name}")
                         else:
                             args.append(f"&w.{ent_name.lower()}.{var_name}[0]")
@@ -1094,27 +2439,37 @@ with open(OUT, "w") as out:
                 for req in info["struct_reqs"]:
                     args.append(f"&w.{req['entity'].lower()}")
                 
-                out.write(f"        system_{mod}({', '.join(args)});\n")
+                write_system_call(out, "        ", mod, f"system_{mod}({', '.join(args)})")
         out.write("\n")
     
-    if GSPEC and gspec_data['gcomponent'] and SELECTED_BACKEND != "manual":
-        gcomp_entity = gspec_data['entity']
-        gcomp_entity_lower = gcomp_entity.lower()
-        
+    def write_gspec_stage(out):
         out.write(f"        // Sincronización GSPEC Automática ({SELECTED_BACKEND})\n")
-        out.write(f"        sys_sync_gcomponent_{gcomp_entity}(&w, &s, &ss);\n")
+        if PIPELINE:
+            # Sync en el buffer de atrás; el render sube y dibuja el frame en su hilo
+            write_system_call(out, "        ", "gspec.sync", "sys_sync_gspec(&w, render_pipeline_scene(&g_render), render_pipeline_sync(&g_render))")
+            out.write("        // Valla: espera al frame anterior e intercambia los buffers\n")
+            write_system_call(out, "        ", "gspec.submit", "render_pipeline_submit(&g_render)")
+            out.write("\n")
+            return
+        write_system_call(out, "        ", "gspec.sync", "sys_sync_gspec(&w, &s, &ss)")
 
         out.write(f"        // Actualizar búfer de GPU y Dibujar\n")
-        out.write(f"        backend_{SELECTED_BACKEND}_update_gpu(&w.world.vbo_id, &s, &ss);\n")
+        upload_call, draw_call = backend_calls("w.", "&s", "&ss")
+        write_system_call(out, "        ", "gspec.upload", upload_call)
 
-        out.write(f"        backend_{SELECTED_BACKEND}_draw_instanced(w.world.cube_model, &s);\n") 
+        write_system_call(out, "        ", "gspec.draw", draw_call)
         out.write("\n")
 
+    has_gspec_stage = GSPEC and gspec_data['gcomponent'] and SELECTED_BACKEND != "manual"
+    if has_gspec_stage and not FIXED_DT:
+        write_gspec_stage(out)
+
     for name, e in entities.items():
         if e["phases"]["LOOP"]:
             out.write(f"        // --- {name}.LOOP (Contexto propio) ---\n")
             
             if e["kind"] == "GENERIC":
+                write_span_begin(out, "        ", f"{name}.LOOP")
                 out.write(f"        for (int32_t i_{name} = 0; i_{name} < w.{name.lower()}._active; i_{name}++) {{\n")
                 out.write(f"            // Procesando {name}[i_{name}]\n")
                 
@@ -1150,11 +2505,12 @@ with open(OUT, "w") as out:
                         out.write(f"            system_{mod}({', '.join(args)});\n")
                 
                 out.write("        }\n")
+                write_span_end(out, "        ", f"{name}.LOOP")
             else:
                 for mod in e["phases"]["LOOP"]:
                     info = module_info[mod]
                     if info["has_world_param"]:
-                        out.write(f"        system_{mod}(&w);\n")
+                        write_system_call(out, "        ", mod, f"system_{mod}(&w)")
                     else:
                         args = []
                         for req in info["reqs"]:
@@ -1176,15 +2532,25 @@ with open(OUT, "w") as out:
                         for req in info["struct_reqs"]:
                             args.append(f"&w.{req['entity'].lower()}")
                         
-                        out.write(f"        system_{mod}({', '.join(args)});\n")
+                        write_system_call(out, "        ", mod, f"system_{mod}({', '.join(args)})")
             out.write("\n")
+
+    if FIXED_DT:
+        # Fin del paso fijo: se renderiza una vez por frame con el último estado
+        out = frame_out
+        out.write("            w._engine.sim_time += w.delta_time;\n")
+        out.write("        }\n\n")
+        if has_gspec_stage:
+            write_gspec_stage(out)
+    else:
+        out.write("        w._engine.sim_time += w.delta_time;\n\n")
     
     if globals["POST_LOOP"]:
         out.write("        // --- Global.POST_LOOP ---\n")
         for mod in globals["POST_LOOP"]:
             info = module_info[mod]
             if info["has_world_param"]:
-                out.write(f"        system_{mod}(&w);\n")
+                write_system_call(out, "        ", mod, f"system_{mod}(&w)")
             else:
                 args = []
                 for req in info["reqs"]:
@@ -1194,7 +2560,7 @@ with open(OUT, "w") as out:
                     is_shared = req.get("is_shared", False)
                     
                     if ent["kind"] == "GENERIC" and not is_shared:
-                        if var_name in ["_active", "_capacity"]:
+                        if var_name in ENTITY_SCALARS:
                             args.append(f"&w.{ent_name.lower()}.{var_name}")
                         else:
                             args.append(f"&w.{ent_name.lower()}.{var_name}[0]")
@@ -1204,8 +2570,47 @@ with open(OUT, "w") as out:
                 for req in info["struct_reqs"]:
                     args.append(f"&w.{req['entity'].lower()}")
                 
-                out.write(f"        system_{mod}({', '.join(args)});\n")
+                write_system_call(out, "        ", mod, f"system_{mod}({', '.join(args)})")
+        out.write("\n")
+
+    if EXPORT:
+        out.write(f"        // --- Exportación a {EXPORT['name']} (CONFIG EXPORT) ---\n")
+        indent = "        "
+        if EXPORT["every"] > 1:
+            out.write(f"        if (w.frame % {EXPORT['every']} == 0) {{\n")
+            indent = "            "
+        write_span_begin(out, indent, "export", perf=False)
+        out.write(f"{indent}engine_export(&w);\n")
+        write_span_end(out, indent, "export", perf=False)
+        if EXPORT["every"] > 1:
+            out.write("        }\n")
         out.write("\n")
+    if TRACE_FILE:
+        out.write("        trace_end();\n")
+    if PROFILE:
+        out.write("        // --- Profiler ---\n")
+        out.write("        const uint64_t _frame_ns = clock_now_ns() - _t_PROF_frame;\n")
+        out.write("        profile_record(&g_profiler, PROF_frame, _frame_ns);\n")
+        for label in profile_gauges:
+            out.write(f"        profile_gauge(&g_profiler, {profile_id(label)}, {gauge_exprs[label]});\n")
+    if STATS_FILE:
+        out.write("        stats_frame(&stats, &g_profiler, w.frame, w._engine.frame_start, w.delta_time);\n")
+    if PROFILE_EVERY > 0 and (PROFILE or PERF_COUNTERS):
+        dumps = (["profile_dump(&g_profiler, w.frame, stdout);"] if PROFILE else []) + (["perf_dump(&g_perf, w.frame, stdout);"] if PERF_COUNTERS else [])
+        out.write(f"        if (w.frame % {PROFILE_EVERY} == 0) {{ {' '.join(dumps)} _dumped_frame = w.frame; }}\n")
+    if PROFILE and PROFILE_WARMUP > 0:
+        out.write(f"        if (w.frame == {PROFILE_WARMUP}) profile_reset(&g_profiler); // fin del calentamiento\n")
+    if MAX_FRAMES > 0:
+        out.write(f"        if (w.frame >= {MAX_FRAMES}) w.running = false;\n")
+    for cond, text in stop_conditions:
+        out.write(f"        if ({cond}) {{\n")
+        out.write(f'            printf("[STOP] frame=%llu {text}\\n", (unsigned long long)w.frame);\n')
+        out.write("            w.running = false;\n")
+        out.write("        }\n")
+
+    if TARGET_FPS > 0:
+        out.write(f"        // Limitador a {TARGET_FPS} FPS (sleep + espera activa)\n")
+        out.write("        frame_timer_limit(&timer);\n")
     
     out.write("    }\n\n")
     
@@ -1217,6 +2622,7 @@ with open(OUT, "w") as out:
             out.write(f"\n    // --- {name}.END ---\n")
             
             if e["kind"] == "GENERIC":
+                write_span_begin(out, "    ", f"{name}.END")
                 out.write(f"    for (int32_t i = 0; i < w.{name.lower()}._active; i++) {{\n")
                 for mod in e["phases"]["END"]:
                     info = module_info[mod]
@@ -1247,11 +2653,12 @@ with open(OUT, "w") as out:
                         
                         out.write(f"        system_{mod}({', '.join(args)});\n")
                 out.write("    }\n")
+                write_span_end(out, "    ", f"{name}.END")
             else:
                 for mod in e["phases"]["END"]:
                     info = module_info[mod]
                     if info["has_world_param"]:
-                        out.write(f"    system_{mod}(&w);\n")
+                        write_system_call(out, "    ", mod, f"system_{mod}(&w)")
                     else:
                         args = []
                         for req in info["reqs"]:
@@ -1272,14 +2679,14 @@ with open(OUT, "w") as out:
                         for req in info["struct_reqs"]:
                             args.append(f"&w.{req['entity'].lower()}")
                         
-                        out.write(f"        system_{mod}({', '.join(args)});\n")
+                        write_system_call(out, "        ", mod, f"system_{mod}({', '.join(args)})")
     
     if globals["END"]:
         out.write("\n    // --- Global.END ---\n")
         for mod in globals["END"]:
             info = module_info[mod]
             if info["has_world_param"]:
-                out.write(f"    system_{mod}(&w);\n")
+                write_system_call(out, "    ", mod, f"system_{mod}(&w)")
             else:
                 args = []
                 for req in info["reqs"]:
@@ -1289,7 +2696,7 @@ with open(OUT, "w") as out:
                     is_shared = req.get("is_shared", False)
                     
                     if ent["kind"] == "GENERIC" and not is_shared:
-                        if var_name in ["_active", "_capacity"]:
+                        if var_name in ENTITY_SCALARS:
                             args.append(f"&w.{ent_name.lower()}.{var_name}")
                         else:
                             args.append(f"&w.{ent_name.lower()}.{var_name}[0]")
@@ -1299,11 +2706,38 @@ with open(OUT, "w") as out:
                 for req in info["struct_reqs"]:
                     args.append(f"&w.{req['entity'].lower()}")
                 
-                out.write(f"        system_{mod}({', '.join(args)});\n")
-
-    if GSPEC:
+                write_system_call(out, "        ", mod, f"system_{mod}({', '.join(args)})")
+
+    final_dumps = (["profile_dump(&g_profiler, w.frame, stdout);"] if PROFILE else []) + (["perf_dump(&g_perf, w.frame, stdout);"] if PERF_COUNTERS else [])
+    if final_dumps:
+        out.write("\n    // Resumen final del profiler\n")
+        after_loop = globals["END"] or any(e["phases"]["END"] for e in entities.values())
+        if PROFILE_EVERY > 0 and not after_loop:
+            # Sin fase END nada cambia tras el último frame: si ya se imprimió, no se repite
+            out.write(f"    if (_dumped_frame != w.frame) {{ {' '.join(final_dumps)} }}\n")
+        else:
+            for dump in final_dumps: out.write(f"    {dump}\n")
+    if STATS_FILE:
+        out.write("    stats_close(&stats);\n")
+    if EXPORT:
+        out.write("    shm_export_close(&g_export);\n")
+
+    if TRACE_FILE:
+        out.write("\n    // Trace de los últimos eventos por hilo\n")
+        out.write(f'    if (trace_write("{TRACE_FILE}") == 0) printf("[TRACE] {TRACE_FILE}\\n");\n')
+
+    if GSPEC and PIPELINE:
+        out.write("    render_pipeline_shutdown(&g_render);\n")
+    elif GSPEC:
         out.write("    scene_free(&s);\n")
+    if GSPEC and gspec_data['gcomponent'] and BACKEND_SOURCE == "null":
+        out.write("    backend_null_shutdown();\n")
 
     out.write("\n    return 0;\n")
     out.write("}\n")
-    print("Builder: código generado con éxito")
+
+if EXPORT:
+    with open(os.path.join(os.path.dirname(OUT), layout_file), "w") as f:
+        json.dump(export_layout, f, indent=1)
+        f.write("\n")
+print("Builder: código generado con éxito")
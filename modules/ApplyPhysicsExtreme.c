@@ -6,23 +6,31 @@
  */
 
 
+// REQ: Cube.position as pos
+// REQ: Cube.velocity as vel
+// REQ: Cube.has_physics as phys READ
+// REQ: World.gravity as gravity READ
+// REQ: World.delta_time as delta_time READ
+
 #include <math.h>
 
-void system_ApplyPhysicsExtreme_range(World* w, int start, int end) {
-    float g = w->world.gravity;
-    float dt = w->world.delta_time;
-    
-    if (end > w->cube._active) end = w->cube._active;
+// Recibe las columnas (restrict, alineadas) en lugar de World*: sin aliasing
+// posible no hay recargas tras cada escritura. El builder genera el adaptador
+// system_ApplyPhysicsExtreme_range(World*, start, end) para parallel_run.
+void system_ApplyPhysicsExtreme_cols(int start, int end, SYSTEM_PARAMS_ApplyPhysicsExtreme) {
+    SYSTEM_ALIGNED_ApplyPhysicsExtreme;
+    const float g = *gravity;
+    const float dt = *delta_time;
 
     for (int i = start; i < end; i++) {
-        if (w->cube.has_physics[i]) {
-            w->cube.velocity_y[i] -= g * dt;
-            w->cube.position_y[i] += w->cube.velocity_y[i] * dt;
-            
-            if (w->cube.position_y[i] < 0.0f) {
-                w->cube.position_y[i] = 0.0f;
-                w->cube.velocity_y[i] *= -0.2f;
-            }
-        }
+        // Sin saltos: se calcula siempre y se selecciona según has_physics
+        const float v = vel_y[i] - g * dt;
+        const float p = pos_y[i] + v * dt;
+        const bool bounce = p < 0.0f;
+        const float new_p = bounce ? 0.0f : p;
+        const float new_v = bounce ? v * -0.2f : v;
+
+        pos_y[i] = phys[i] ? new_p : pos_y[i];
+        vel_y[i] = phys[i] ? new_v : vel_y[i];
     }
 }
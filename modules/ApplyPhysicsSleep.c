@@ -0,0 +1,50 @@
+
+
+/* This Source Code Form is subject to the terms of the Mozilla Public
+ * License, v. 2.0. If a copy of the MPL was not distributed with this
+ * file, You can obtain one at https://mozilla.org/MPL/2.0/.
+ */
+
+
+// REQ: Cube.position as pos
+// REQ: Cube.velocity as vel
+// REQ: Cube.has_physics as phys READ
+// REQ: Cube.is_awake as awake
+// REQ: Cube._awake as awake_list READ
+// REQ: World.gravity as gravity READ
+// REQ: World.delta_time as delta_time READ
+
+#include <math.h>
+
+// Recibe las columnas (restrict, alineadas) en lugar de World*: sin aliasing
+// posible no hay recargas tras cada escritura. El builder genera el adaptador
+// system_ApplyPhysicsSleep_range(World*, start, end) para parallel_run.
+//
+// Variante de ApplyPhysicsExtreme que duerme los cubos en reposo. Necesita
+// CONFIG SLEEP Cube.is_awake e ITERATE AWAKE: [start, end) son posiciones en la
+// lista de despiertos y los cubos dormidos no se recorren.
+void system_ApplyPhysicsSleep_cols(int start, int end, SYSTEM_PARAMS_ApplyPhysicsSleep) {
+    SYSTEM_ALIGNED_ApplyPhysicsSleep;
+    const float g = *gravity;
+    const float dt = *delta_time;
+
+    for (int k = start; k < end; k++) {
+        const int32_t i = awake_list[k];
+        // Dormido en este mismo frame: sigue en la lista hasta el siguiente
+        if (!phys[i] || !awake[i]) continue;
+
+        float v = vel_y[i] - g * dt;
+        float p = pos_y[i] + v * dt;
+        if (p < 0.0f) {
+            p = 0.0f;
+            v = v * -0.2f;
+            // El rebote ya no lo separa del suelo: en reposo hasta que algo lo despierte
+            if (fabsf(v) < g * dt) {
+                v = 0.0f;
+                awake[i] = false;
+            }
+        }
+        pos_y[i] = p;
+        vel_y[i] = v;
+    }
+}
@@ -15,11 +15,6 @@ void system_HeadlessStats(World* w) {
                w->frame, w->cube._active, w->world.delta_time);
         fflush(stdout);
     }
-    
-    if (w->cube._active >= 3000000) {
-        printf("\nBENCHMARK COMPLETADO: 3,000,000 de cubos procesados\n");
-        fflush(stdout);
-        w->running = false; // Finalizar el benchmark automáticamente
-    }
+    // La parada la decide el spec (CONFIG STOP_WHEN / MAX_FRAMES)
 }
 
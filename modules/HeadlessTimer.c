@@ -6,24 +6,14 @@
  */
 
 
-#include <time.h>
-
+// El builder mide el frame con reloj monotónico (tiempo real, no tiempo de CPU
+// sumado de todos los hilos como clock()) y deja el resultado en w->delta_time:
+// tiempo real del frame, o el paso fijo con CONFIG FIXED_DT.
 void system_HeadlessTimer(World* w) {
-    static clock_t last;
-    static int first = 1;
-    clock_t now = clock();
-    
-    if (first) {
-        last = now;
-        first = 0;
-        w->world.delta_time = 0.016f;
-        return;
-    }
-    
-    float elapsed = (float)(now - last) / CLOCKS_PER_SEC;
-    
-    if (elapsed <= 0.0f) elapsed = 0.000001f;
-    
-    w->world.delta_time = elapsed;
-    last = now;
+    float dt = w->delta_time;
+
+    // Primer frame: no hay frame anterior con el que comparar
+    if (w->frame <= 1 || dt <= 0.0f) dt = 0.016f;
+
+    w->world.delta_time = dt;
 }
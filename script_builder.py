@@ -4,13 +4,27 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+import argparse
+import hashlib
+import json
+import math
 import os
 import re
-from dataclasses import dataclass, field
+import struct
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
 from typing import List, Dict, Set
 
 RULES_DIR = "rules"
 OUT_DIR = "modules"
+CACHE_FILE = os.path.join(OUT_DIR, ".rule_cache.json")
+
+# Funciones sin efectos secundarios: sus llamadas se pueden evaluar una sola vez
+PURE_FUNCS = {
+    "sin", "cos", "tan", "sqrt", "pow", "fabs", "fmin", "fmax", "floor", "ceil",
+    "clamp", "lerp", "abs"
+}
 
 KEYWORDS = {
     "sin", "cos", "tan", "sqrt", "pow", "fabs", "fmin", "fmax", "floor", "ceil",
@@ -44,6 +58,10 @@ class ModuleSpec:
     entity: str
     reqs: Dict[str, Variable] = field(default_factory=dict)
     rules: List[Rule] = field(default_factory=list)
+    strategy: str = "AUTO"  # AUTO | TWO_PHASE
+
+class RuleError(ValueError):
+    """Error en un .rule; el mensaje empieza por <fichero>:<línea>."""
 
 class RuleParser:
     def __init__(self, filepath):
@@ -62,35 +80,46 @@ class RuleParser:
             lines = [l.strip() for l in f.readlines()]
 
         mode = "HEADER"
-        for line in lines:
+        for num, line in enumerate(lines, 1):
             if not line or line.startswith(("#", "//")): continue
+            try:
+                mode = self._parse_line(line, mode)
+            except ValueError as e:
+                raise RuleError(f"{self.filepath}:{num}: {e}") from None
 
-            if line.upper() == "CONDITIONS:": mode = "CONDITIONS"; continue
-            if line.upper() == "ACTIONS:": mode = "ACTIONS"; continue
-            if line.upper().startswith("RULE:"):
-                self._finalize_rule()
-                self.current_rule = Rule(name=line.split(":", 1)[1].strip())
-                mode = "HEADER"
-                continue
+        self._finalize_rule()
+        return self.module
 
-            if mode == "HEADER":
-                parts = line.split()
-                if not parts: continue
-                cmd = parts[0].upper()
-                if cmd == "MODULE_ENTITY:":
-                    self.module.entity = parts[1]
-                elif cmd == "REQ:":
-                    self._parse_req(line)
+    def _parse_line(self, line: str, mode: str) -> str:
+        if line.upper() == "CONDITIONS:": return "CONDITIONS"
+        if line.upper() == "ACTIONS:": return "ACTIONS"
+        if line.upper().startswith("RULE:"):
+            self._finalize_rule()
+            self.current_rule = Rule(name=line.split(":", 1)[1].strip())
+            return "HEADER"
 
-            elif mode == "CONDITIONS" and self.current_rule:
-                clean = re.sub(r'^(WHEN|AND|OR|NOT)\s+', '', line, flags=re.I)
-                self.current_rule.conditions.append(clean)
+        if mode == "HEADER":
+            parts = line.split()
+            cmd = parts[0].upper()
+            if cmd == "MODULE_ENTITY:":
+                self.module.entity = parts[1]
+            elif cmd == "MODULE_STRATEGY:":
+                strategy = parts[1].upper() if len(parts) > 1 else ""
+                if strategy not in ("AUTO", "TWO_PHASE"):
+                    raise ValueError(f"Estrategia desconocida '{strategy}', debe ser AUTO o TWO_PHASE")
+                self.module.strategy = strategy
+            elif cmd == "REQ:":
+                self._parse_req(line)
 
-            elif mode == "ACTIONS" and self.current_rule:
-                self.current_rule.actions.append(line)
+        elif mode == "CONDITIONS" and self.current_rule:
+            # Se conserva el prefijo (WHEN/AND/OR/NOT): CGenerator lo combina
+            check_literals(line)
+            self.current_rule.conditions.append(line)
 
-        self._finalize_rule()
-        return self.module
+        elif mode == "ACTIONS" and self.current_rule:
+            check_literals(line)
+            self.current_rule.actions.append(line)
+        return mode
 
     def _finalize_rule(self):
         if self.current_rule:
@@ -99,7 +128,7 @@ class RuleParser:
 
     def _parse_req(self, line):
         # Nuevo formato: REQ: Entity.prop as alias [ARRAY|SINGLE] [READ|WRITE|READ_WRITE]
-        m = re.search(r'REQ:\s+(\w+)\.(\w+)\s+as\s+(\w+)(?:\s+(ARRAY|SINGLE))?(?:\s+(READ|WRITE|READ_WRITE))?', line, re.I)
+        m = re.search(r'REQ:\s+(\w+)\.(\w+)\s+as\s+(\w+)(?:\s+(ARRAY|SINGLE))?(?:\s+(READ_WRITE|READ|WRITE)\b)?', line, re.I)
         if not m: raise ValueError(f"Error sintáctico en REQ: {line}")
 
         ent, prop, alias, mode, access = m.groups()
@@ -115,82 +144,944 @@ class RuleParser:
             access=(access or "READ").upper()
         )
 
+# EXPRESIONES
+# Árbol sintáctico inmutable (hashable): dos subexpresiones iguales son el mismo
+# valor, lo que permite plegado de constantes, hoisting y CSE estructural.
+
+@dataclass(frozen=True)
+class Num:
+    text: str
+    kind: str  # i | f32 | f64
+
+@dataclass(frozen=True)
+class Name:
+    name: str
+
+@dataclass(frozen=True)
+class Str:
+    text: str
+
+@dataclass(frozen=True)
+class Raw:
+    text: str  # C que el parser no entiende: se transpila token a token
+
+@dataclass(frozen=True)
+class Temp:
+    name: str
+
+@dataclass(frozen=True)
+class Call:
+    fn: str
+    args: tuple
+
+@dataclass(frozen=True)
+class Unary:
+    op: str
+    operand: object
+
+@dataclass(frozen=True)
+class Binary:
+    op: str
+    left: object
+    right: object
+
+BINARY_PREC = {
+    "||": 1, "&&": 2, "==": 3, "!=": 3,
+    "<": 4, ">": 4, "<=": 4, ">=": 4,
+    "+": 5, "-": 5, "*": 6, "/": 6, "%": 6,
+}
+UNARY_PREC = 7
+WORD_OPS = {"AND": "&&", "OR": "||", "NOT": "!"}
+
+NUM_PATTERN = r"""0[xX][0-9a-fA-F]+[uUlL]*
+           |(?:\d+\.\d*|\.\d+)(?:[eE][+-]?\d+)?[fF]?
+           |\d+[eE][+-]?\d+[fF]?
+           |\d+[uUlL]*"""
+NUM_RE = re.compile(NUM_PATTERN, re.X)
+
+TOKEN_RE = re.compile(r"""\s*(?:
+    (?P<num>""" + NUM_PATTERN + r""")
+  | (?P<name>[A-Za-z_]\w*)
+  | (?P<str>"(?:[^"\\]|\\.)*")
+  | (?P<op>&&|\|\||==|!=|<=|>=|[-+*/%<>!(),])
+)""", re.X)
+
+class ExprError(ValueError):
+    pass
+
+# Literal numérico hasta el primer carácter que no puede seguir a un número (1e, 08, 3x)
+LITERAL_RE = re.compile(r'(?<![\w.])\.?\d(?:[eE][+-]\d|[\w.])*')
+
+def check_literal(text: str):
+    if not NUM_RE.fullmatch(text) or re.fullmatch(r"0\d*[89]\d*[uUlL]*", text):
+        raise ExprError(f"Literal numérico inválido '{text}'")
+
+def check_literals(line: str):
+    # Los literales que el parser no entiende irían tal cual al C (o romperían el plegado)
+    for m in LITERAL_RE.finditer(re.sub(r'"(?:[^"\\]|\\.)*"', '""', line)):
+        check_literal(m.group())
+
+def tokenize(text: str) -> List[tuple]:
+    tokens, pos = [], 0
+    text = text.rstrip()
+    while pos < len(text):
+        m = TOKEN_RE.match(text, pos)
+        if not m or m.end() == pos: raise ExprError(f"Token inesperado en '{text[pos:]}'")
+        kind = m.lastgroup
+        tok = m.group(kind)
+        if kind == "num": check_literal(tok)
+        if kind == "name" and tok in WORD_OPS: kind, tok = "op", WORD_OPS[tok]
+        tokens.append((kind, tok))
+        pos = m.end()
+    return tokens
+
+class ExprParser:
+    """Precedence climbing con la precedencia de C (sin asignaciones ni ternario)."""
+
+    def __init__(self, text: str):
+        self.tokens = tokenize(text)
+        self.pos = 0
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _next(self):
+        tok = self._peek()
+        self.pos += 1
+        return tok
+
+    def _expect(self, op):
+        kind, tok = self._next()
+        if tok != op: raise ExprError(f"Se esperaba '{op}'")
+
+    def parse(self):
+        node = self._binary(1)
+        if self.pos != len(self.tokens): raise ExprError(f"Sobra '{self._peek()[1]}'")
+        return node
+
+    def _binary(self, min_prec):
+        left = self._unary()
+        while True:
+            kind, tok = self._peek()
+            prec = BINARY_PREC.get(tok) if kind == "op" else None
+            if prec is None or prec < min_prec: return left
+            self._next()
+            left = Binary(tok, left, self._binary(prec + 1))
+
+    def _unary(self):
+        kind, tok = self._peek()
+        if kind == "op" and tok in ("-", "+", "!"):
+            self._next()
+            return Unary(tok, self._unary())
+        return self._primary()
+
+    def _primary(self):
+        kind, tok = self._next()
+        if kind == "num":
+            if tok[:2].lower() == "0x" or not any(c in tok for c in ".eE"): return Num(tok, "i")
+            return Num(tok, "f32" if tok[-1] in "fF" else "f64")
+        if kind == "str": return Str(tok)
+        if kind == "name":
+            if self._peek()[1] == "(":
+                self._next()
+                args = []
+                if self._peek()[1] != ")":
+                    args.append(self._binary(1))
+                    while self._peek()[1] == ",":
+                        self._next()
+                        args.append(self._binary(1))
+                self._expect(")")
+                return Call(tok, tuple(args))
+            return Name(tok)
+        if tok == "(":
+            node = self._binary(1)
+            self._expect(")")
+            return node
+        raise ExprError(f"Expresión incompleta")
+
+def children(node) -> tuple:
+    if isinstance(node, Binary): return (node.left, node.right)
+    if isinstance(node, Unary): return (node.operand,)
+    if isinstance(node, Call): return node.args
+    return ()
+
+def is_compound(node) -> bool:
+    return isinstance(node, (Binary, Unary, Call))
+
+def node_size(node) -> int:
+    return 1 + sum(node_size(c) for c in children(node))
+
+def node_names(node) -> Set[str]:
+    if isinstance(node, Name): return {node.name}
+    out = set()
+    for c in children(node): out |= node_names(c)
+    return out
+
+# Plegado de constantes con la semántica de C (int trunca hacia cero, float se
+# redondea a 32 bits tras cada operación). Solo se pliegan enteros int con signo: los
+# unsigned/long o lo que desborde 32 bits se dejan al compilador
+
+INT_MIN, INT_MAX = -2**31, 2**31 - 1
+
+def _f32(value):
+    return struct.unpack("f", struct.pack("f", value))[0]
+
+def _num_value(n: Num):
+    if n.kind == "i":
+        text = n.text.rstrip("uUlL")
+        return int(text, 8) if re.fullmatch(r"0\d+", text) else int(text, 0)
+    value = float(n.text.rstrip("fF"))
+    return _f32(value) if n.kind == "f32" else value
+
+def _is_int(n: Num) -> bool:
+    # Literal de tipo int: sin sufijo u/l y dentro de rango (0xFFFFFFFF ya es unsigned)
+    return n.kind == "i" and n.text.rstrip("uUlL") == n.text and _num_value(n) <= INT_MAX
+
+def _make_num(value, kind):
+    if kind == "i":
+        return Num(str(int(value)), "i") if INT_MIN <= value <= INT_MAX else None
+    if math.isnan(value) or math.isinf(value): return None
+    if kind == "f32":
+        value = _f32(value)
+        text = "%.9g" % value
+    else:
+        text = repr(value)
+    if not any(c in text for c in ".e"): text += ".0"
+    return Num(text + ("f" if kind == "f32" else ""), kind)
+
+def _c_div(a, b):
+    q = abs(a) // abs(b)
+    return q if (a >= 0) == (b >= 0) else -q
+
+def fold(node):
+    if isinstance(node, Unary):
+        inner = fold(node.operand)
+        if isinstance(inner, Num):
+            v = _num_value(inner)
+            if node.op == "-" and (inner.kind != "i" or _is_int(inner)):
+                return _make_num(-v, inner.kind) or Unary(node.op, inner)
+            if node.op == "+": return inner
+            if node.op == "!": return Num("0" if v else "1", "i")
+        return Unary(node.op, inner)
+    if isinstance(node, Binary):
+        left, right = fold(node.left), fold(node.right)
+        if isinstance(left, Num) and isinstance(right, Num):
+            folded = _fold_binary(node.op, left, right)
+            if folded is not None: return folded
+        return Binary(node.op, left, right)
+    if isinstance(node, Call):
+        return Call(node.fn, tuple(fold(a) for a in node.args))
+    return node
+
+def _fold_binary(op, left: Num, right: Num):
+    a, b = _num_value(left), _num_value(right)
+    kinds = ("i", "f32", "f64")
+    kind = kinds[max(kinds.index(left.kind), kinds.index(right.kind))]
+    if op in ("&&", "||"):
+        return Num("1" if (a and b if op == "&&" else a or b) else "0", "i")
+    if kind == "i" and not (_is_int(left) and _is_int(right)): return None
+    if kind == "f32": a, b = _f32(a), _f32(b)
+    if op in ("==", "!=", "<", ">", "<=", ">="):
+        res = {"==": a == b, "!=": a != b, "<": a < b, ">": a > b, "<=": a <= b, ">=": a >= b}[op]
+        return Num("1" if res else "0", "i")
+    if kind == "i":
+        if op in ("/", "%") and b == 0: return None
+        if op == "/": return _make_num(_c_div(a, b), kind)
+        if op == "%": return _make_num(a - _c_div(a, b) * b, kind)
+        return _make_num({"+": a + b, "-": a - b, "*": a * b}[op], kind)
+    if op == "%" or (op == "/" and b == 0): return None
+    return _make_num({"+": a + b, "-": a - b, "*": a * b, "/": a / b if op == "/" else 0}[op], kind)
+
+def emit_c(node, sub) -> str:
+    """Imprime node con paréntesis mínimos; sub(hijo) devuelve el C de cada hijo."""
+    def wrap(child, text, prec, right=False):
+        child_prec = BINARY_PREC.get(child.op, 0) if isinstance(child, Binary) else 99
+        if re.fullmatch(r'[\w\[\]]+', text): return text
+        # && dentro de || lleva paréntesis aunque no haga falta (evita -Wparentheses)
+        if child_prec < prec or (right and child_prec == prec) or (prec == 1 and child_prec == 2): return f"({text})"
+        return text
+
+    if isinstance(node, Binary):
+        prec = BINARY_PREC[node.op]
+        left = wrap(node.left, sub(node.left), prec)
+        right = wrap(node.right, sub(node.right), prec, right=True)
+        return f"{left} {node.op} {right}"
+    if isinstance(node, Unary):
+        text = sub(node.operand)
+        if isinstance(node.operand, (Binary, Unary)) and not re.fullmatch(r'[\w\[\]]+', text): text = f"({text})"
+        return f"{node.op}{text}"
+    if isinstance(node, Call):
+        return f"{node.fn}({', '.join(sub(a) for a in node.args)})"
+    return sub(node)
+
+class CSE:
+    """Numeración de valores sobre el cuerpo del bucle por entidad.
+
+    El generador recorre el cuerpo dos veces con el mismo código: la primera
+    (plan=None) cuenta cuántas veces aparece cada subexpresión con la misma
+    versión de sus variables; la segunda declara un temporal en el primer
+    punto de uso de las que aparecen más de una vez y las sustituye. Escribir
+    una variable crea una versión nueva; dentro de un bloque condicional la
+    versión nueva solo es visible al salir del bloque.
+    """
+
+    def __init__(self, render_leaf, speculable, plan=None):
+        self.render_leaf = render_leaf
+        self.speculable = speculable
+        self.plan = plan
+        self.versions = {}
+        self.dirty = set()
+        self.pending = set()
+        self.in_block = False
+        self.point_id = -1
+        self.uses = {}
+        self.declared = {}
+
+    def _key(self, node):
+        return (node, tuple(sorted((v, self.versions.get(v, 0)) for v in node_names(node))))
+
+    def point(self) -> List[str]:
+        # Llamar antes de cada sentencia de nivel superior: los temporales se declaran aquí
+        self.point_id += 1
+        if self.plan is None: return []
+        lines = []
+        for key in self.plan.get(self.point_id, []):
+            text = self._render(key[0])
+            name = f"_cse{len(self.declared)}"
+            lines.append(f"const __typeof__({text}) {name} = {text};")
+            self.declared[key] = name
+        return lines
+
+    def expr(self, node) -> str:
+        if self.plan is None:
+            self._record(node)
+            return ""
+        return self._render(node)
+
+    def _record(self, node):
+        if is_compound(node) and self.speculable(node) and not (node_names(node) & self.dirty):
+            entry = self.uses.setdefault(self._key(node), [0, self.point_id, node_size(node)])
+            entry[0] += 1
+        for c in children(node): self._record(c)
+
+    def _render(self, node) -> str:
+        if is_compound(node) and not (node_names(node) & self.dirty):
+            name = self.declared.get(self._key(node))
+            if name: return name
+        if is_compound(node): return emit_c(node, self._render)
+        return self.render_leaf(node)
+
+    def write(self, var: str):
+        if self.in_block:
+            self.dirty.add(var)
+            self.pending.add(var)
+        else:
+            self.versions[var] = self.versions.get(var, 0) + 1
+
+    def enter_block(self):
+        self.in_block = True
+
+    def exit_block(self):
+        for v in self.pending: self.versions[v] = self.versions.get(v, 0) + 1
+        self.pending.clear()
+        self.dirty.clear()
+        self.in_block = False
+
+    def finish(self) -> Dict[int, list]:
+        plan = {}
+        for key, (count, point, size) in self.uses.items():
+            if count > 1: plan.setdefault(point, []).append((size, key))
+        return {p: [k for _, k in sorted(v, key=lambda t: t[0])] for p, v in plan.items()}
+
+@dataclass
+class Action:
+    kind: str  # SET | EMIT | DESTROY | RAW
+    target: str = ""
+    expr: object = None
+    args: tuple = ()
+    text: str = ""
+
+
 class CGenerator:
     def __init__(self, module: ModuleSpec):
         self.m = module
+        self.hoist_singles = False
+        self.invariants = {}
+        self._analyse()
 
     def transpile_expr(self, expr: str) -> str:
+        # Transpilación token a token: solo para C crudo que el parser no entiende
         def repl(match):
             tok = match.group(0)
             if tok.isdigit() or tok in KEYWORDS: return tok
             if tok in self.m.reqs:
                 v = self.m.reqs[tok]
-                return f"{tok}[i]" if v.is_array else f"(*{tok})"
+                if v.is_array: return f"{tok}[i]"
+                return tok if self._single_is_value(tok) else f"(*{tok})"
             return tok
         return re.sub(r'\b[a-zA-Z_]\w*\b', repl, expr)
 
-    def generate_action(self, line: str) -> str:
-        if line.upper().startswith("SET "):
-            content = line[4:].strip()
-            if '=' not in content: return f"// ERROR: SET sin '='"
-            tgt, expr_raw = content.split('=', 1)
-            tgt = tgt.strip()
-            expr = self.transpile_expr(expr_raw.strip())
+    # Análisis
 
-            if tgt not in self.m.reqs: return f"{tgt} = {expr};"
-            v = self.m.reqs[tgt]
-            if "WRITE" not in v.access: return f'#error "Intento de escritura en variable READ: {tgt}"'
+    def parse_expr(self, text: str):
+        try:
+            return fold(ExprParser(text).parse())
+        except ExprError:
+            return Raw(text)
 
-            return f"{tgt}[i] = {expr};" if v.is_array else f"(*{tgt}) = {expr};"
+    def _parse_conditions(self, lines: List[str]):
+        # AND liga más fuerte que OR: "a / OR b / AND NOT c" -> a || (b && !c)
+        groups = []
+        for line in lines:
+            m = re.match(r'^(?:(WHEN|AND|OR)\s+)?(?:(NOT)\s+)?(.*)$', line, re.I)
+            conn, neg, body = m.groups()
+            node = self.parse_expr(body)
+            if neg: node = fold(Unary("!", node))
+            if conn and conn.upper() == "OR" and groups: groups.append([node])
+            elif groups: groups[-1].append(node)
+            else: groups.append([node])
+        if not groups: return None
+        ors = []
+        for g in groups:
+            node = g[0]
+            for c in g[1:]: node = Binary("&&", node, c)
+            ors.append(node)
+        node = ors[0]
+        for o in ors[1:]: node = Binary("||", node, o)
+        return fold(node)
 
+    def _parse_action(self, line: str) -> Action:
+        if line.upper().startswith("SET "):
+            parts = self._set_parts(line)
+            if not parts: return Action("RAW", text=line)
+            return Action("SET", target=parts[0], expr=self.parse_expr(parts[1]))
         if line.upper().startswith("EMIT "):
             tokens = line.split()
-            name = tokens[1]
-            args = [self.transpile_expr(a) for a in tokens[2:]]
+            return Action("EMIT", target=tokens[1], args=tuple(self.parse_expr(a) for a in tokens[2:]))
+        if line.upper() == "DESTROY": return Action("DESTROY")
+        return Action("RAW", text=line)
+
+    def _analyse(self):
+        self.conds = {r.name: self._parse_conditions(r.conditions) for r in self.m.rules}
+        self.acts = {r.name: [self._parse_action(a) for a in r.actions] for r in self.m.rules}
+        all_acts = [a for acts in self.acts.values() for a in acts]
+        self.has_raw = any(a.kind == "RAW" for a in all_acts) or any(
+            isinstance(n, Raw) for n in self._all_exprs() for n in self._walk(n))
+        self.written = {a.target for a in all_acts if a.kind == "SET"}
+
+    def _all_exprs(self):
+        for r in self.m.rules:
+            if self.conds[r.name] is not None: yield self.conds[r.name]
+            for a in self.acts[r.name]:
+                if a.expr is not None: yield a.expr
+                yield from a.args
+
+    def _walk(self, node):
+        yield node
+        for c in children(node): yield from self._walk(c)
+
+    def _single_is_value(self, alias: str) -> bool:
+        # SINGLE que nadie escribe: se lee una vez antes del bucle
+        return not self.has_raw and alias not in self.written
+
+    def _expr_type(self, node) -> str:
+        if isinstance(node, Num): return "f" if node.kind != "i" else "i"
+        if isinstance(node, Name):
+            v = self.m.reqs.get(node.name)
+            return "f" if v and v.c_type in ("float", "double") else "i"
+        if isinstance(node, Call): return "i" if node.fn == "abs" else "f"
+        if isinstance(node, Unary): return "i" if node.op == "!" else self._expr_type(node.operand)
+        if isinstance(node, Binary):
+            if BINARY_PREC[node.op] <= 4: return "i"
+            return "f" if "f" in (self._expr_type(node.left), self._expr_type(node.right)) else "i"
+        return "i"
+
+    def speculable(self, node) -> bool:
+        # Evaluar antes de tiempo no debe poder fallar (div/mod entero por cero) ni tener efectos
+        for n in self._walk(node):
+            if isinstance(n, Raw): return False
+            if isinstance(n, Call) and n.fn not in PURE_FUNCS: return False
+            if isinstance(n, Binary) and n.op in ("/", "%"):
+                divisor_safe = isinstance(n.right, Num) and _num_value(n.right) != 0
+                if not divisor_safe and (n.op == "%" or self._expr_type(n) == "i"): return False
+        return True
+
+    def _invariant(self, node) -> bool:
+        if isinstance(node, (Num, Str, Temp)): return True
+        if isinstance(node, Name):
+            v = self.m.reqs.get(node.name)
+            if v: return not v.is_array and self._single_is_value(node.name)
+            return node.name in ("true", "false", "NULL")
+        if isinstance(node, Raw): return False
+        return all(self._invariant(c) for c in children(node))
+
+    def _hoist(self, node):
+        # Sustituye las subexpresiones invariantes máximas por temporales fuera del bucle
+        if is_compound(node) and self._invariant(node) and self.speculable(node):
+            if node not in self.invariants: self.invariants[node] = f"_inv{len(self.invariants)}"
+            return Temp(self.invariants[node])
+        if isinstance(node, Binary): return Binary(node.op, self._hoist(node.left), self._hoist(node.right))
+        if isinstance(node, Unary): return Unary(node.op, self._hoist(node.operand))
+        if isinstance(node, Call): return Call(node.fn, tuple(self._hoist(a) for a in node.args))
+        return node
+
+    def _hoist_all(self):
+        # Copias: las condiciones y acciones analizadas no cambian (generate es repetible)
+        self.invariants = {}
+        self.conds = {name: self._hoist(c) if c is not None else None for name, c in self.conds.items()}
+        self.acts = {name: [replace(a, expr=self._hoist(a.expr) if a.expr is not None else None,
+                                    args=tuple(self._hoist(x) for x in a.args)) for a in acts]
+                     for name, acts in self.acts.items()}
+
+    # Emisión
+
+    def render_leaf(self, node) -> str:
+        if isinstance(node, Name):
+            v = self.m.reqs.get(node.name)
+            if v is None: return node.name
+            if v.is_array: return f"{node.name}[i]"
+            return node.name if self._single_is_value(node.name) else f"(*{node.name})"
+        if isinstance(node, (Num, Str, Temp)): return node.text if not isinstance(node, Temp) else node.name
+        if isinstance(node, Raw): return self.transpile_expr(node.text)
+        return emit_c(node, self.render_leaf)
+
+    def render(self, node) -> str:
+        if node is None: return "true"
+        return emit_c(node, self.render_leaf) if is_compound(node) else self.render_leaf(node)
+
+    def generate_action(self, a: Action, cse: CSE = None) -> str:
+        expr = cse.expr if cse else self.render
+        if a.kind == "SET":
+            tgt = a.target
+            val = expr(a.expr)
+            if tgt not in self.m.reqs: return f"{tgt} = {val};"
+            v = self.m.reqs[tgt]
+            if "WRITE" not in v.access: return f'#error "Intento de escritura en variable READ: {tgt}"'
+            if cse: cse.write(tgt)
+            if v.is_array:
+                return f"{tgt}[i] = {val}; {self._track(v)}(w, i);"
+            return f"(*{tgt}) = {val};"
+
+        if a.kind == "EMIT":
+            args = [expr(x) for x in a.args]
             while len(args) < 3: args.append("0")
-            return f"emit_custom_event({name}, {args[0]}, {args[1]}, {args[2]});"
+            return f"emit_custom_event({a.target}, {args[0]}, {args[1]}, {args[2]});"
 
-        if line.upper() == "DESTROY": return "script_destroy_self(i);"
+        if a.kind == "DESTROY": return "script_destroy_self(i);"
 
-        return self.transpile_expr(line) + ";"
+        if cse:
+            # C crudo: puede escribir cualquier cosa
+            for v in self.m.reqs: cse.write(v)
+        return self.transpile_expr(a.text) + ";"
 
-    def generate(self) -> str:
-        out = [f"// MODULE: sys_{self.m.name}", "#include <math.h>", "#include <stdbool.h>", '#include "GraphicSystem/graphics_types.h"', '#include "ScriptSupport/scriptsupport.h"', ""]
-        out.append(f"void system_sys_{self.m.name}_range(World* w, int start, int end) {{")
+    def _track(self, v: Variable, suffix: str = "") -> str:
+        # Macro de builder.py: marca el chunk de la columna si tiene CONFIG TRACK
+        return f"ENGINE_TRACK{suffix}_{v.source_entity}_{v.source_prop}"
+
+    def _set_parts(self, line: str):
+        content = line[4:].strip()
+        if '=' not in content: return None
+        tgt, expr_raw = content.split('=', 1)
+        return tgt.strip(), expr_raw.strip()
+
+    def _is_array_set(self, a: Action) -> bool:
+        if a.kind != "SET": return False
+        v = self.m.reqs.get(a.target)
+        return v is not None and v.is_array and "WRITE" in v.access
+
+    def classify_rule(self, rule: Rule) -> str:
+        # SELECT: solo SET sobre ARRAY -> select enmascarado sin saltos
+        # COMPACT: SET ARRAY + EMIT/DESTROY -> pasada sobre índices compactados
+        # SCALAR: cualquier otra cosa (SET sobre SINGLE, C crudo...)
+        acts = self.acts[rule.name]
+        if any(isinstance(n, Raw) for e in self._rule_exprs(rule) for n in self._walk(e)): return "SCALAR"
+        if all(self._is_array_set(a) for a in acts): return "SELECT"
+        if all(self._is_array_set(a) or a.kind in ("EMIT", "DESTROY") for a in acts): return "COMPACT"
+        return "SCALAR"
+
+    def _rule_exprs(self, rule: Rule):
+        if self.conds[rule.name] is not None: yield self.conds[rule.name]
+        for a in self.acts[rule.name]:
+            if a.expr is not None: yield a.expr
+            yield from a.args
+
+    def _rule_writes(self, r: Rule) -> Set[str]:
+        return {a.target for a in self.acts[r.name] if self._is_array_set(a)}
+
+    def _unique_arrays(self) -> Set[str]:
+        # restrict solo es válido si ninguna otra REQ apunta a la misma columna
+        seen = {}
+        for v in self.m.reqs.values():
+            if v.is_array: seen.setdefault((v.source_entity, v.source_prop), []).append(v.alias)
+        return {aliases[0] for aliases in seen.values() if len(aliases) == 1}
+
+    def _used_names(self) -> Set[str]:
+        used = set()
+        for r in self.m.rules:
+            for e in self._rule_exprs(r): used |= node_names(e) | self._raw_names(e)
+            for a in self.acts[r.name]: used |= {a.target} | set(re.findall(r'[A-Za-z_]\w*', a.text))
+        return used
 
-        # Unpacking
+    def _unpack(self, use_restrict: bool) -> List[str]:
+        out = []
+        unique = self._unique_arrays() if use_restrict else set()
+        used = self._used_names()
         for v in self.m.reqs.values():
             src = "world" if v.source_entity == "World" else v.source_entity.lower()
+            if use_restrict and self._is_active(v) and v.alias not in used:
+                continue  # Por bloques se lee como _alive
+            if v.is_array and use_restrict:
+                prefix = "const " if "WRITE" not in v.access else ""
+                qual = " restrict" if v.alias in unique else ""
+                out.append(f"    {prefix}{v.c_type}*{qual} {v.alias} = w->{src}.{v.source_prop};")
+                continue
+            if not v.is_array and self._single_is_value(v.alias):
+                # Invariante del bucle: se lee una sola vez (la carga vía puntero impide vectorizar)
+                out.append(f"    const {v.c_type} {v.alias} = w->{src}.{v.source_prop};")
+                continue
             prefix = "const " if "WRITE" not in v.access and not v.is_array else ""
             if v.source_entity == "World":
                 out.append(f"    {prefix}{v.c_type}* {v.alias} = &w->world.{v.source_prop};")
             else:
                 out.append(f"    {prefix}{v.c_type}* {v.alias} = w->{src}.{v.source_prop};")
+        for node, name in self.invariants.items():
+            text = self.render(node)
+            out.append(f"    const __typeof__({text}) {name} = {text};")
+        return out
+
+    def _raw_names(self, node) -> Set[str]:
+        # Identificadores dentro de C crudo que el parser no pudo analizar
+        if isinstance(node, Raw): return set(re.findall(r'[A-Za-z_]\w*', node.text))
+        out = set()
+        for c in children(node): out |= self._raw_names(c)
+        return out
+
+    def _is_active(self, v) -> bool:
+        return v.source_prop == "active" and v.source_entity == self.m.entity
+
+    def _has_active(self) -> bool:
+        return any(self._is_active(v) for v in self.m.reqs.values())
+
+    def _writes_active(self) -> bool:
+        return any(a.kind == "SET" and a.target in self.m.reqs and self._is_active(self.m.reqs[a.target])
+                   for acts in self.acts.values() for a in acts)
+
+    def _alive(self, out: List[str]):
+        # Por bloques active se lee una vez por regla: vale porque ninguna regla lo escribe.
+        # Si una regla lo nombra ya está desempaquetado; no se crea otro puntero restrict
+        active = next((v for v in self.m.reqs.values() if self._is_active(v)), None)
+        if active is None: return None
+        if active.alias in self._used_names(): return f"{active.alias}[i]"
+        # bool no se vectoriza bien como máscara; se lee como bytes
+        out.append(f"    const uint8_t* restrict _alive = (const uint8_t*)w->{self.m.entity.lower()}.active;")
+        return "_alive[i]"
+
+    def _with_cse(self, body):
+        # body(cse) -> líneas; se ejecuta una vez para planificar y otra para emitir
+        planner = CSE(self.render_leaf, self.speculable)
+        body(planner)
+        return body(CSE(self.render_leaf, self.speculable, plan=planner.finish()))
 
+    def _mask(self, node, alive: str = None) -> str:
+        parts = ([alive] if alive else []) + ([self.render(node)] if node is not None else [])
+        if len(parts) > 1 and node is not None and isinstance(node, Binary) and node.op == "||":
+            parts[-1] = f"({parts[-1]})"
+        return " && ".join(parts) or "true"
+
+    def _generate_scalar(self) -> List[str]:
+        out = self._unpack(use_restrict=False)
         out.append("\n    for (int i = start; i < end; i++) {")
 
         # El fix del active: solo si la entidad tiene active registrado
-        has_active = any(v.source_prop == "active" and v.source_entity == self.m.entity for v in self.m.reqs.values())
-        if has_active:
+        if self._has_active():
             out.append(f"        if (!w->{self.m.entity.lower()}.active[i]) continue;")
 
+        def body(cse):
+            lines = []
+            for r in self.m.rules:
+                lines += [f"        {d}" for d in cse.point()]
+                cond = cse.expr(self.conds[r.name]) if self.conds[r.name] is not None else "true"
+                lines.append(f"        if ({cond}) {{")
+                cse.enter_block()
+                for a in self.acts[r.name]:
+                    lines.append(f"            {self.generate_action(a, cse)}")
+                cse.exit_block()
+                lines.append("        }")
+            return lines
+        out += self._with_cse(body)
+
+        out.append("    }")
+        return out
+
+    def _select_pass(self, r: Rule, alive: str) -> List[str]:
+        # _any: alguna i del bloque cumple la máscara; solo entonces se marcan sus chunks
+        out = [f"        // RULE: {r.name} (select sin saltos)", "        _any = 0;",
+               "#ifdef _OPENMP", "        #pragma omp simd reduction(|:_any)", "#endif", "        for (int i = _b; i < _e; i++) {"]
+
+        def body(cse):
+            lines = [f"            {d}" for d in cse.point()]
+            cond = cse.expr(self.conds[r.name]) if self.conds[r.name] is not None else None
+            lines.append(f"            const bool _m = {self._mask_text(cond, self.conds[r.name], alive)};")
+            lines.append("            _any |= _m;")
+            for a in self.acts[r.name]:
+                lines += [f"            {d}" for d in cse.point()]
+                val = cse.expr(a.expr)
+                lines.append(f"            {a.target}[i] = _m ? {self._paren(val)} : {a.target}[i];")
+                cse.write(a.target)
+            return lines
+        out += self._with_cse(body)
+        out.append("        }")
+        for target in dict.fromkeys(a.target for a in self.acts[r.name]):
+            out.append(f"        if (_any) {self._track(self.m.reqs[target], '_RANGE')}(w, _b, _e);")
+        return out
+
+    def _paren(self, text: str) -> str:
+        return text if re.fullmatch(r'[\w\[\]\.]+', text) else f"({text})"
+
+    def _mask_text(self, text, node, alive):
+        if node is None: return alive or "true"
+        if not alive: return text
+        if isinstance(node, Binary) and node.op == "||": text = f"({text})"
+        return f"{alive} && {text}"
+
+    def _compact_pass(self, r: Rule, alive: str) -> List[str]:
+        out = [f"        // RULE: {r.name} (índices compactados)", "        {", "            int _idx[RULE_BLOCK_SIZE];", "            int _n = 0;"]
+        out.append("            for (int i = _b; i < _e; i++) {")
+        out.append("                _idx[_n] = i;")
+        out.append(f"                _n += ({self._mask(self.conds[r.name], alive)});")
+        out.append("            }")
+        out.append("            for (int _k = 0; _k < _n; _k++) {")
+        out.append("                const int i = _idx[_k];")
+
+        def body(cse):
+            lines = []
+            for a in self.acts[r.name]:
+                lines += [f"                {d}" for d in cse.point()]
+                lines.append(f"                {self.generate_action(a, cse)}")
+            return lines
+        out += self._with_cse(body)
+        out.append("            }")
+        out.append("        }")
+        return out
+
+    def _generate_blocked(self) -> List[str]:
+        out = self._unpack(use_restrict=True)
+        alive = self._alive(out)
+
+        out.append("\n    for (int _b = start; _b < end; _b += RULE_BLOCK_SIZE) {")
+        out.append("        const int _e = (end - _b > RULE_BLOCK_SIZE) ? _b + RULE_BLOCK_SIZE : end;")
+        if any(self.classify_rule(r) == "SELECT" for r in self.m.rules):
+            out.append("        uint8_t _any;")
         for r in self.m.rules:
-            cond = " && ".join(f"({self.transpile_expr(c)})" for c in r.conditions) or "true"
-            out.append(f"        if ({cond}) {{")
-            for a in r.actions:
-                out.append(f"            {self.generate_action(a)}")
-            out.append("        }")
+            out.append("")
+            if self.classify_rule(r) == "SELECT":
+                out.extend(self._select_pass(r, alive))
+            else:
+                out.extend(self._compact_pass(r, alive))
+        out.append("    }")
+        return out
+
+    def _conjuncts(self, node) -> List[object]:
+        if node is None: return []
+        if isinstance(node, Binary) and node.op == "&&":
+            return self._conjuncts(node.left) + self._conjuncts(node.right)
+        return [node]
+
+    def _generate_two_phase(self) -> List[str]:
+        out = self._unpack(use_restrict=True)
+        alive = self._alive(out)
+
+        # Condiciones compartidas: presentes en todas las reglas (en el orden de la primera)
+        rule_conj = [self._conjuncts(self.conds[r.name]) for r in self.m.rules]
+        shared = [c for c in dict.fromkeys(rule_conj[0]) if all(c in conj for conj in rule_conj[1:])]
+
+        # Una condición compartida deja de valer en cuanto una regla anterior escribe sus variables
+        written, residual = set(), []
+        for r, conj in zip(self.m.rules, rule_conj):
+            residual.append([c for c in dict.fromkeys(conj) if c not in shared or node_names(c) & written])
+            written |= self._rule_writes(r)
+
+        pred = " && ".join(([alive] if alive else []) + [self._paren(self.render(c)) for c in shared]) or "1"
+        out.append("\n    for (int _b = start; _b < end; _b += RULE_BLOCK_SIZE) {")
+        out.append("        const int _e = (end - _b > RULE_BLOCK_SIZE) ? _b + RULE_BLOCK_SIZE : end;")
+        out.append("")
+        out.append("        // Fase 1: predicado compartido (vectorizable) y lista de índices activos")
+        out.append("        uint8_t _pass[RULE_BLOCK_SIZE];")
+        out.append("#ifdef _OPENMP")
+        out.append("        #pragma omp simd")
+        out.append("#endif")
+        out.append("        for (int i = _b; i < _e; i++) {")
+        out.append(f"            _pass[i - _b] = ({pred});")
+        out.append("        }")
+        out.append("        int _idx[RULE_BLOCK_SIZE];")
+        out.append("        int _n = 0;")
+        out.append("        for (int i = _b; i < _e; i++) {")
+        out.append("            _idx[_n] = i;")
+        out.append("            _n += _pass[i - _b];")
+        out.append("        }")
+        out.append("")
+        out.append("        // Fase 2: acciones solo sobre los índices que pasaron el filtro")
+        out.append("        for (int _k = 0; _k < _n; _k++) {")
+        out.append("            const int i = _idx[_k];")
+
+        def body(cse):
+            lines = []
+            for r, res in zip(self.m.rules, residual):
+                lines += [f"            {d}" for d in cse.point()]
+                conds = [self._paren(cse.expr(c)) if len(res) > 1 else cse.expr(c) for c in res]
+                lines.append(f"            // RULE: {r.name}")
+                lines.append(f"            if ({' && '.join(conds) or 'true'}) {{")
+                cse.enter_block()
+                for a in self.acts[r.name]:
+                    lines.append(f"                {self.generate_action(a, cse)}")
+                cse.exit_block()
+                lines.append("            }")
+            return lines
+        out += self._with_cse(body)
+        out.append("        }")
+        out.append("    }")
+        return out
+
+    def effects(self) -> List[str]:
+        kinds = {a.kind for acts in self.acts.values() for a in acts}
+        if self.has_raw: kinds.add("RAW")
+        return [k for k in ("EMIT", "DESTROY", "RAW") if k in kinds]
+
+    def metadata(self) -> List[str]:
+        # Leído por builder.py: entidad del rango, accesos y efectos fuera de la entidad i
+        def cols(aliases):
+            return " ".join(sorted({f"{self.m.reqs[a].source_entity}.{self.m.reqs[a].source_prop}" for a in aliases})) or "NONE"
+        reads = [a for a, v in self.m.reqs.items() if "READ" in v.access]
+        writes = [a for a in self.written if a in self.m.reqs]
+        return [
+            f"// RULE_META: ENTITY {self.m.entity}",
+            f"// RULE_META: READS {cols(reads)}",
+            f"// RULE_META: WRITES {cols(writes)}",
+            f"// RULE_META: EFFECTS {' '.join(self.effects()) or 'NONE'}",
+        ]
 
-        out.append("    }\n}")
+    def generate(self) -> str:
+        out = [f"// MODULE: sys_{self.m.name}"] + self.metadata()
+        out += ["#include <math.h>", "#include <stdbool.h>", "#include <stdint.h>", '#include "../GraphicSystem/graphics_types.h"', '#include "../ScriptSupport/scriptsupport.h"', ""]
+        out += ["#ifndef RULE_BLOCK_SIZE", "#define RULE_BLOCK_SIZE 256", "#endif", ""]
+        out.append(f"void system_sys_{self.m.name}_range(World* w, int start, int end) {{")
+
+        # EMIT/DESTROY van a un lote propio del rango: el wrapper los publica en orden de start
+        staged = any(k in ("EMIT", "DESTROY") for k in self.effects())
+        if staged:
+            out.append("    scriptsupport_stage_begin(start);")
+
+        parsed = self.conds, self.acts
+        self._hoist_all()
+        # Por bloques solo si cada regla toca únicamente su índice i: así el orden
+        # regla-a-regla dentro de un bloque equivale al bucle escalar original.
+        # Si alguna escribe active, el escalar (que lo comprueba una vez por entidad) manda.
+        blockable = self.m.rules and not self._writes_active() and all(self.classify_rule(r) != "SCALAR" for r in self.m.rules)
+        # Por bloques se emite regla a regla: con dos reglas que emiten, el orden de los
+        # comandos dependería de dónde empiezan los bloques (y con ello de MAX_THREADS).
+        # TWO_PHASE recorre las reglas de cada entidad seguidas y no tiene ese problema
+        emitters = sum(1 for r in self.m.rules if any(a.kind in ("EMIT", "DESTROY") for a in self.acts[r.name]))
+        if blockable and self.m.strategy == "TWO_PHASE":
+            out.extend(self._generate_two_phase())
+        elif blockable and emitters <= 1:
+            out.extend(self._generate_blocked())
+        else:
+            out.extend(self._generate_scalar())
+
+        if staged:
+            out.append("    scriptsupport_stage_end();")
+        out.append("}")
+        self.conds, self.acts = parsed
         return "\n".join(out)
 
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+# Cambia con cualquier edición del generador: invalida toda la caché
+GENERATOR_VERSION = _sha256(open(__file__, "rb").read())[:16]
+
+def load_cache() -> dict:
+    # Se devuelve aunque sea de otra versión: sus salidas sirven para limpiar
+    try:
+        with open(CACHE_FILE) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+def write_if_changed(path: str, content: str) -> bool:
+    # No tocar el mtime si el contenido es idéntico (builder/gcc no recompilan)
+    try:
+        with open(path) as f:
+            if f.read() == content: return False
+    except OSError:
+        pass
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as o:
+        o.write(content)
+    os.replace(tmp, path)
+    return True
+
+def transpile(path: str):
+    spec = RuleParser(path).parse()
+    return spec.name, CGenerator(spec).generate()
+
 def main():
+    ap = argparse.ArgumentParser(description="Transpila rules/*.rule a modules/sys_*.c")
+    ap.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="procesos en paralelo")
+    ap.add_argument("-f", "--force", action="store_true", help="ignorar la caché y regenerar todo")
+    args = ap.parse_args()
+
     os.makedirs(OUT_DIR, exist_ok=True)
-    for f in os.listdir(RULES_DIR):
-        if f.endswith(".rule"):
-            spec = RuleParser(os.path.join(RULES_DIR, f)).parse()
-            with open(os.path.join(OUT_DIR, f"sys_{spec.name}.c"), "w") as o:
-                o.write(CGenerator(spec).generate())
-            print(f"[OK] {f}")
+    cache = load_cache()
+    previous = cache.get("rules", {})
+    entries = dict(previous) if cache.get("generator") == GENERATOR_VERSION and not args.force else {}
+
+    # Pendientes: regla nueva o modificada, o salida ausente/editada a mano
+    rules, pending = {}, []
+    for f in sorted(os.listdir(RULES_DIR)):
+        if not f.endswith(".rule"): continue
+        with open(os.path.join(RULES_DIR, f), "rb") as src:
+            rules[f] = _sha256(src.read())
+        entry = entries.get(f)
+        fresh = entry and entry["source"] == rules[f]
+        if fresh:
+            try:
+                with open(os.path.join(OUT_DIR, entry["output"]), "rb") as out:
+                    fresh = _sha256(out.read()) == entry["output_hash"]
+            except OSError:
+                fresh = False
+        if not fresh: pending.append(f)
+
+    results = {}
+    try:
+        if len(pending) > 1 and args.jobs > 1:
+            with ProcessPoolExecutor(max_workers=min(args.jobs, len(pending))) as pool:
+                futures = {f: pool.submit(transpile, os.path.join(RULES_DIR, f)) for f in pending}
+                results = {f: fut.result() for f, fut in futures.items()}
+        else:
+            results = {f: transpile(os.path.join(RULES_DIR, f)) for f in pending}
+    except RuleError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+
+    for f in pending:
+        name, code = results[f]
+        output = f"sys_{name}.c"
+        changed = write_if_changed(os.path.join(OUT_DIR, output), code)
+        entries[f] = {"source": rules[f], "output": output, "output_hash": _sha256(code.encode())}
+        print(f"[OK] {f}" if changed else f"[=] {f} (sin cambios)")
+
+    # Reglas eliminadas: borrar solo las salidas que generamos nosotros (también las de
+    # una caché de otra versión o ignorada con --force)
+    for f in sorted(set(previous) - set(rules)):
+        entries.pop(f, None)
+        stale = os.path.join(OUT_DIR, previous[f]["output"])
+        if os.path.exists(stale):
+            os.remove(stale)
+            print(f"[DEL] {stale}")
+
+    print(f"{len(pending)} transpilados, {len(rules) - len(pending)} en caché")
+    write_if_changed(CACHE_FILE, json.dumps({"generator": GENERATOR_VERSION, "rules": entries}, indent=1, sort_keys=True) + "\n")
 
 if __name__ == "__main__": main()
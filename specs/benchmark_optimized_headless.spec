@@ -1,6 +1,8 @@
 SOA Vector3 float x y z
 
 CONFIG MAX_THREADS 8
+CONFIG STOP_WHEN Cube._active >= 3000000
+CONFIG TRACK Cube.active Cube.color
 
 UNIQUE World:
 @@gravity float = 9.8f
@@ -12,6 +14,7 @@ GENERIC Cube count=3000000:
 @@velocity Vector3 = {0.0f, 0.0f, 0.0f}
 @@active bool = false
 @@has_physics bool = false
+@@is_awake bool = true
 @@color int = 0
 
 SHARED Cube:
@@ -0,0 +1,311 @@
+import os
+import re
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import script_builder as sb
+
+
+def folded(text):
+    return sb.fold(sb.ExprParser(text).parse())
+
+
+def generate(tmp_path, name, text):
+    path = tmp_path / f"{name}.rule"
+    path.write_text(text, encoding="utf-8")
+    return sb.CGenerator(sb.RuleParser(str(path)).parse()).generate()
+
+
+# Plegado de constantes
+
+def test_fold_hex_keeps_digits():
+    assert folded("0x00FF00 + 0x0F") == sb.Num("65295", "i")
+    assert folded("0x0F + 1") == sb.Num("16", "i")
+    assert folded("-0xFF") == sb.Num("-255", "i")
+    assert folded("0xfF % 0xF") == sb.Num("0", "i")
+
+
+def test_fold_octal_and_c_division():
+    assert folded("010 + 1") == sb.Num("9", "i")
+    assert folded("7 / -2") == sb.Num("-3", "i")
+    assert folded("-7 % 3") == sb.Num("-1", "i")
+
+
+def test_hex_in_expression_does_not_fall_back_to_raw():
+    gen = sb.CGenerator(sb.ModuleSpec(name="T", entity="Cube"))
+    assert isinstance(gen.parse_expr("col % 0xF"), sb.Binary)
+
+
+def test_unsigned_and_overflow_are_not_folded():
+    assert isinstance(folded("1u - 2u"), sb.Binary)
+    assert isinstance(folded("-1 < 1u"), sb.Binary)
+    assert isinstance(folded("0xFFFFFFFF + 1"), sb.Binary)
+    assert isinstance(folded("2147483647 + 1"), sb.Binary)
+    assert isinstance(folded("-1L"), sb.Unary)
+
+
+def test_fold_mixed_precision_rounds_f32():
+    assert folded("0.1f == 0.1") == sb.Num("0", "i")
+    assert folded("0.1f == 0.1f") == sb.Num("1", "i")
+    assert folded("0.1f + 0.2f") == sb.Num("0.300000012f", "f32")
+    assert folded("0.1f * 1.0") == sb.Num(repr(0.10000000149011612), "f64")
+    assert folded("16777217 == 16777216.0f") == sb.Num("1", "i")
+
+
+# Hoisting de invariantes y CSE
+
+LICM_RULE = """MODULE_ENTITY: Cube
+REQ: Cube.position_x as px READ_WRITE
+REQ: Cube.position_y as py READ
+REQ: World.gravity as g SINGLE READ
+
+RULE: Move
+CONDITIONS:
+    WHEN px * py > sqrt(g * 2.0f)
+ACTIONS:
+    SET px = px * py + 1.0f
+"""
+
+
+def test_invariant_is_hoisted_out_of_the_loop(tmp_path):
+    code = generate(tmp_path, "Move", LICM_RULE)
+    assert "const __typeof__(sqrt(g * 2.0f)) _inv0 = sqrt(g * 2.0f);" in code
+    assert code.index("_inv0 =") < code.index("for (")
+    assert "> _inv0" in code
+
+
+def test_common_subexpression_is_computed_once(tmp_path):
+    code = generate(tmp_path, "Move", LICM_RULE)
+    assert code.count("px[i] * py[i]") == 2  # __typeof__ y la definición de _cse0
+    assert "_cse0 > _inv0" in code
+    assert "(_cse0 + 1.0f)" in code
+
+
+# SINGLE de World y de otras entidades
+
+SINGLE_RULE = """MODULE_ENTITY: Cube
+REQ: Cube.position_x as px READ_WRITE
+REQ: World.gravity as g SINGLE READ
+REQ: Player.speed as spd SINGLE READ
+
+RULE: Push
+CONDITIONS:
+    WHEN px > g
+ACTIONS:
+    SET px = px + spd
+"""
+
+
+def test_single_values_are_read_once(tmp_path):
+    code = generate(tmp_path, "Push", SINGLE_RULE)
+    assert "const float g = w->world.gravity;" in code
+    assert "const float spd = w->player.speed;" in code
+    assert "speed[0]" not in code
+
+
+def test_written_single_stays_a_pointer(tmp_path):
+    code = generate(tmp_path, "Count", """MODULE_ENTITY: Cube
+REQ: Cube.health as hp READ_WRITE
+REQ: World.score as score SINGLE READ_WRITE
+REQ: Player.hits as hits SINGLE READ_WRITE
+
+RULE: Count
+CONDITIONS:
+    hp > 0
+ACTIONS:
+    SET score = score + 1
+    SET hits = hits + 1
+""")
+    assert "float* score = &w->world.score;" in code
+    assert "float* hits = w->player.hits;" in code
+    assert "(*score) = (*score) + 1;" in code
+
+
+def test_blocked_path_reads_active_only_through_alive(tmp_path):
+    code = generate(tmp_path, "Paint", """MODULE_ENTITY: Cube
+REQ: Cube.color as col ARRAY READ_WRITE
+REQ: Cube.position_y as py ARRAY READ
+REQ: Cube.active as active ARRAY READ
+
+RULE: ground
+CONDITIONS:
+WHEN py <= 0.0f
+ACTIONS:
+SET col = 16711680
+""")
+    assert "_alive = (const uint8_t*)w->cube.active;" in code
+    assert "bool* restrict active" not in code
+    assert "#ifdef _OPENMP\n        #pragma omp simd" in code
+
+
+def test_condition_keywords_are_whole_words(tmp_path):
+    code = generate(tmp_path, "Words", """MODULE_ENTITY: Cube
+REQ: Cube.origin_x as origin_x READ
+REQ: Cube.android as android READ
+REQ: Cube.whence as whence READ
+REQ: Cube.notch as notch READ
+REQ: Cube.health as hp READ_WRITE
+
+RULE: Words
+CONDITIONS:
+    origin_x > 100
+    AND android > 0
+    OR whence < 3
+    AND NOT notch
+ACTIONS:
+    SET hp = 0
+""")
+    assert "origin_x[i] > 100" in code
+    assert "android[i] > 0" in code
+    assert "whence[i] < 3" in code
+    assert "!notch[i]" in code
+
+
+ACTIVE_RULE = """MODULE_ENTITY: Cube
+REQ: Cube.color as col ARRAY READ_WRITE
+REQ: Cube.position_y as py ARRAY READ
+REQ: Cube.active as alive ARRAY {access}
+
+RULE: first
+CONDITIONS:
+WHEN py <= 0.0f
+ACTIONS:
+{action}
+
+RULE: second
+CONDITIONS:
+WHEN py <= 0.0f
+ACTIONS:
+SET col = 255
+"""
+
+
+def test_blocked_path_reuses_named_active(tmp_path):
+    code = generate(tmp_path, "Named", ACTIVE_RULE.format(access="READ", action="SET col = alive * 2"))
+    assert "_alive" not in code
+    assert code.count("w->cube.active") == 1
+    assert "alive[i] && py[i] <= 0.0f" in code
+
+
+def test_writing_active_falls_back_to_scalar(tmp_path):
+    code = generate(tmp_path, "Kill", ACTIVE_RULE.format(access="READ_WRITE", action="SET alive = false"))
+    assert "RULE_BLOCK_SIZE) {" not in code
+    assert "_alive" not in code
+    assert "if (!w->cube.active[i]) continue;" in code
+
+
+# Orden de EMIT/DESTROY con distintos repartos del rango
+
+ORDER_RULE = """MODULE_ENTITY: Cube
+{strategy}
+REQ: Cube.health as hp READ
+REQ: Cube.active as act READ
+
+RULE: low
+CONDITIONS:
+    hp < 3
+ACTIONS:
+    EMIT "low" i hp
+
+RULE: even
+CONDITIONS:
+    hp < 5
+ACTIONS:
+    EMIT "even" i hp
+"""
+
+ORDER_HARNESS = r"""
+#include <stdbool.h>
+#include <stdint.h>
+#include <stdio.h>
+#include "modules/sys_Order.c"
+
+#define N 50
+
+int main(void) {
+    int hp[N];
+    bool act[N];
+    for (int i = 0; i < N; i++) { hp[i] = (i * 7) % 6; act[i] = i % 4 != 1; }
+    World w = { { hp, act } };
+    for (int threads = 1; threads <= 4; threads++) {
+        const int chunk = (N + threads - 1) / threads;
+        // Rangos en orden inverso: commit_staged debe reordenarlos
+        for (int s = (threads - 1) * chunk; s >= 0; s -= chunk)
+            system_sys_Order_range(&w, s, s + chunk < N ? s + chunk : N);
+        scriptsupport_commit_staged();
+        for (int k = 0; k < scriptsupport_get_command_count(); k++) {
+            GameCommand* c = scriptsupport_get_command(k);
+            printf("%s:%u ", c->event.custom_name, c->source_id);
+        }
+        printf("\n");
+        scriptsupport_clear_commands();
+    }
+    return 0;
+}
+"""
+
+
+@pytest.mark.skipif(shutil.which("gcc") is None, reason="hace falta gcc")
+@pytest.mark.parametrize("strategy", ["", "MODULE_STRATEGY: TWO_PHASE"])
+def test_emit_order_matches_sequential_loop(tmp_path, strategy):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for d in ("modules", "GraphicSystem"):
+        (tmp_path / d).mkdir()
+    shutil.copytree(os.path.join(root, "ScriptSupport"), tmp_path / "ScriptSupport")
+    (tmp_path / "GraphicSystem" / "graphics_types.h").write_text(
+        "typedef struct { int* health; bool* active; } CubeColumns;\n"
+        "typedef struct { CubeColumns cube; } World;\n")
+    (tmp_path / "modules" / "sys_Order.c").write_text(generate(tmp_path, "Order", ORDER_RULE.format(strategy=strategy)))
+    (tmp_path / "main.c").write_text(ORDER_HARNESS)
+    subprocess.run(["gcc", "-O2", "-DRULE_BLOCK_SIZE=4", "main.c", "ScriptSupport/scriptsupport.c",
+                    "-o", "order", "-lpthread"], cwd=tmp_path, check=True)
+    lines = subprocess.run(["./order"], cwd=tmp_path, check=True, stdout=subprocess.PIPE,
+                           text=True).stdout.splitlines()
+
+    expected = []
+    for i in range(50):
+        hp = (i * 7) % 6
+        if i % 4 == 1: continue
+        if hp < 3: expected.append(f"low:{i}")
+        if hp < 5: expected.append(f"even:{i}")
+    assert lines == [" ".join(expected) + " "] * 4
+
+
+# Caché de main(): las salidas de reglas eliminadas se borran aunque la caché no valga
+
+@pytest.mark.parametrize("argv", [["--force"], []])
+def test_deleted_rule_output_is_removed(tmp_path, monkeypatch, argv):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "rules").mkdir()
+    for name in ("Push", "Move"):
+        (tmp_path / "rules" / f"{name}.rule").write_text(SINGLE_RULE if name == "Push" else LICM_RULE)
+    monkeypatch.setattr(sys, "argv", ["script_builder.py", "-j", "1"])
+    sb.main()
+    assert (tmp_path / "modules" / "sys_Move.c").exists()
+
+    (tmp_path / "rules" / "Move.rule").unlink()
+    monkeypatch.setattr(sb, "GENERATOR_VERSION", "otra")  # Generador editado: la caché no vale
+    monkeypatch.setattr(sys, "argv", ["script_builder.py", "-j", "1"] + argv)
+    sb.main()
+    assert not (tmp_path / "modules" / "sys_Move.c").exists()
+    assert (tmp_path / "modules" / "sys_Push.c").exists()
+
+
+def test_generate_is_repeatable(tmp_path):
+    path = tmp_path / "Move.rule"
+    path.write_text(LICM_RULE)
+    gen = sb.CGenerator(sb.RuleParser(str(path)).parse())
+    assert gen.generate() == gen.generate()
+
+
+@pytest.mark.parametrize("literal", ["08", "1e", "3x", "1.5.3"])
+def test_bad_literal_reports_rule_and_line(tmp_path, literal):
+    path = tmp_path / "Bad.rule"
+    path.write_text(f"MODULE_ENTITY: Cube\nREQ: Cube.health as hp READ_WRITE\n\nRULE: A\nCONDITIONS:\n    hp > {literal}\nACTIONS:\n    SET hp = 0\n")
+    with pytest.raises(sb.RuleError, match=rf"Bad.rule:6: .*'{re.escape(literal)}'"):
+        sb.RuleParser(str(path)).parse()